@@ -0,0 +1,535 @@
+"""Benchmarks for the Weighted Energy Cost calculation.
+
+Run from the repository root:
+
+    python benchmarks/benchmark.py [--quick]
+
+Covers a single event-driven update, one million calculation steps, a day
+of 1 Hz data for every kind of source, the number of state writes per hour
+for a range of write settings, the projection over 48 hours of 15-minute
+forecast slots, the layered battery cost basis over growing numbers of
+charge cycles and the offline replay of sample files. The event update and
+the write volume run the sensor itself on a stub hass and a simulated
+clock; they are skipped unless Home Assistant is installed, which the other
+benchmarks do not need.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import heapq
+import math
+import random
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from itertools import groupby
+from operator import itemgetter
+from pathlib import Path
+from types import SimpleNamespace
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "tools"))
+
+from _bootstrap import register_package  # noqa: E402
+
+register_package()
+
+from custom_components.weighted_energy_cost.const import (  # noqa: E402
+    CONF_BATTERY_ENERGY_SOURCE_TYPE,
+    CONF_BATTERY_ENERGY_SOURCE_VALUE,
+    CONF_BATTERY_POWER_SOURCE_TYPE,
+    CONF_BATTERY_POWER_SOURCE_VALUE,
+    CONF_GRID_IMPORT_PRICE_TYPE,
+    CONF_GRID_IMPORT_PRICE_VALUE,
+    CONF_GRID_IMPORT_SOURCE_TYPE,
+    CONF_GRID_IMPORT_SOURCE_VALUE,
+    CONF_MIN_WRITE_INTERVAL,
+    CONF_NAME,
+    CONF_SOLAR_PRICE_TYPE,
+    CONF_SOLAR_PRICE_VALUE,
+    CONF_SOLAR_SOURCE_TYPE,
+    CONF_SOLAR_SOURCE_VALUE,
+    CONF_WRITE_THRESHOLD,
+    SOURCE_TYPE_ENTITY,
+    SOURCE_TYPE_FIXED,
+)
+from custom_components.weighted_energy_cost.engine import (  # noqa: E402
+    EngineState,
+    StepInputs,
+    advance,
+    step,
+)
+from custom_components.weighted_energy_cost.lots import BatteryLots  # noqa: E402
+from custom_components.weighted_energy_cost.replay import HistoryReplay  # noqa: E402
+
+DAY = 86400
+# Wall-clock time of the simulated clock's zero
+EPOCH = 1_767_225_600.0
+POWER_ENTITIES = ("sensor.grid", "sensor.solar", "sensor.battery")
+
+# Unit and scale of each kind of power source, None for a fixed value
+SOURCE_KINDS = {
+    "fixed": None,
+    "power_w": ("W", 1000.0),
+    "power_kw": ("kW", 1.0),
+    "energy_kwh": ("kWh", 1.0),
+    "energy_mwh": ("MWh", 0.001),
+}
+
+# (minimum write interval in s, threshold in €/kWh) pairs
+WRITE_SETTINGS = ((0, 0.0), (10, 0.0), (60, 0.0), (0, 0.001), (60, 0.001))
+
+
+def _config(kind: str) -> dict:
+    """Return a configuration with all power sources of one kind."""
+    if SOURCE_KINDS[kind] is None:
+        power = {"type": SOURCE_TYPE_FIXED, "values": (1.2, 0.8, -0.4)}
+    else:
+        power = {"type": SOURCE_TYPE_ENTITY, "values": POWER_ENTITIES}
+    return {
+        CONF_NAME: "Benchmark",
+        CONF_GRID_IMPORT_SOURCE_TYPE: power["type"],
+        CONF_GRID_IMPORT_SOURCE_VALUE: power["values"][0],
+        CONF_GRID_IMPORT_PRICE_TYPE: SOURCE_TYPE_ENTITY,
+        CONF_GRID_IMPORT_PRICE_VALUE: "sensor.grid_price",
+        CONF_SOLAR_SOURCE_TYPE: power["type"],
+        CONF_SOLAR_SOURCE_VALUE: power["values"][1],
+        CONF_SOLAR_PRICE_TYPE: SOURCE_TYPE_FIXED,
+        CONF_SOLAR_PRICE_VALUE: 0.08,
+        CONF_BATTERY_POWER_SOURCE_TYPE: power["type"],
+        CONF_BATTERY_POWER_SOURCE_VALUE: power["values"][2],
+        CONF_BATTERY_ENERGY_SOURCE_TYPE: SOURCE_TYPE_ENTITY,
+        CONF_BATTERY_ENERGY_SOURCE_VALUE: "sensor.battery_energy",
+    }
+
+
+def _state(value: float, attributes: dict) -> SimpleNamespace:
+    """Return a minimal stand-in for a Home Assistant state object."""
+    return SimpleNamespace(state=f"{value:.6f}", attributes=attributes)
+
+
+def _day_events(kind: str, seconds: int, seed: int = 1):
+    """Generate 1 Hz state changes of every entity source for ``seconds``."""
+    rng = random.Random(seed)
+    spec = SOURCE_KINDS[kind]
+    counter = spec is not None and spec[0] in ("kWh", "MWh")
+    power_attrs = {} if spec is None else {"unit_of_measurement": spec[0]}
+    if counter:
+        power_attrs["device_class"] = "energy"
+    price_attrs = {"unit_of_measurement": "€/kWh"}
+    energy_attrs = {"unit_of_measurement": "kWh"}
+
+    totals = [0.0, 0.0, 0.0]
+    stored = 5.0
+    events = []
+    for t in range(seconds):
+        solar = max(0.0, 4.0 * math.sin(math.pi * (t % DAY) / DAY)) + rng.random()
+        load = 0.5 + rng.random()
+        battery = max(-2.0, min(2.0, load - solar))
+        grid = max(0.0, load - solar - battery)
+        stored = max(0.0, stored - battery / 3600.0)
+        events.append(
+            (t, "sensor.grid_price", _state(0.25 + 0.1 * rng.random(), price_attrs))
+        )
+        events.append((t, "sensor.battery_energy", _state(stored, energy_attrs)))
+        if spec is None:
+            continue
+        scale = spec[1]
+        for i, (entity_id, kw) in enumerate(
+            zip(POWER_ENTITIES, (grid, solar, battery))
+        ):
+            if counter:
+                # Counters only run forward; the battery counter meters discharge
+                totals[i] += max(kw, 0.0) / 3600.0
+                value = totals[i] * scale
+            else:
+                value = kw * scale
+            events.append((t, entity_id, _state(value, power_attrs)))
+    return events
+
+
+def _timed(func, *args):
+    """Return the result of ``func`` and its duration in seconds."""
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+class _Loop:
+    """A simulated monotonic clock and the timers scheduled on it."""
+
+    def __init__(self) -> None:
+        """Start the clock at zero without timers."""
+        self.now = 0.0
+        self._timers: list[tuple[float, int, object]] = []
+        self._seq = 0
+
+    def call_later(self, _hass, delay: float, action):
+        """Schedule ``action`` like ``async_call_later`` and return a cancel."""
+        timer = (self.now + delay, self._seq, action)
+        self._seq += 1
+        heapq.heappush(self._timers, timer)
+
+        def cancel() -> None:
+            self._timers.remove(timer)
+            heapq.heapify(self._timers)
+
+        return cancel
+
+    def run(self, until: float) -> None:
+        """Fire the timers due up to ``until`` and move the clock there."""
+        timers = self._timers
+        while timers and timers[0][0] <= until:
+            self.now, _, action = heapq.heappop(timers)
+            action(None)
+        self.now = until
+
+
+@contextmanager
+def _sensor_module():
+    """Yield the sensor module on a simulated clock, None without HA."""
+    try:
+        from custom_components.weighted_energy_cost import sensor
+    except ImportError:
+        yield None, None
+        return
+
+    loop = _Loop()
+    saved = sensor.time, sensor.async_call_later
+    sensor.time = SimpleNamespace(
+        monotonic=lambda: loop.now,
+        time=lambda: EPOCH + loop.now,
+        perf_counter=time.perf_counter,
+    )
+    sensor.async_call_later = loop.call_later
+    try:
+        yield sensor, loop
+    finally:
+        sensor.time, sensor.async_call_later = saved
+
+
+def _setup_sensor(module, config: dict, initial: dict) -> tuple[object, list[int]]:
+    """Set up the sensor and its companions on a stub hass.
+
+    Returns the sensor and the number of state writes of it and of all its
+    companions. ``initial`` are the states ``hass.states`` holds.
+    """
+    hass = SimpleNamespace(data={}, states=SimpleNamespace(get=initial.get))
+    entry = SimpleNamespace(entry_id="benchmark", data=config, options={})
+    entities = []
+    asyncio.run(module.async_setup_entry(hass, entry, entities.extend))
+    sensor, *companions = entities
+    writes = [0, 0]
+
+    def counter(i):
+        def write() -> None:
+            writes[i] += 1
+
+        return write
+
+    sensor.async_write_ha_state = counter(0)
+    for companion in companions:
+        companion.async_write_ha_state = counter(1)
+        # As after async_added_to_hass
+        companion._added = True
+    return sensor, writes
+
+
+def _event(entity_id: str, state: SimpleNamespace, timestamp: float):
+    """Return a state change event reported at ``timestamp``."""
+    state.last_updated = datetime.fromtimestamp(EPOCH + timestamp, timezone.utc)
+    return SimpleNamespace(data={"entity_id": entity_id, "new_state": state})
+
+
+def bench_event_update(updates: int) -> float:
+    """Return the mean time of one event-driven update in microseconds.
+
+    A state change of the grid power is handled by the sensor once a second
+    and the recalculation it schedules runs, up to the state write.
+    """
+    with _sensor_module() as (module, loop):
+        if module is None:
+            return math.nan
+        events = _day_events("power_w", 1)
+        sensor, _ = _setup_sensor(
+            module, _config("power_w"), {e[1]: e[2] for e in events}
+        )
+        for _, entity_id, state in events:
+            sensor._handle_state_change(_event(entity_id, state, 0.0))
+        loop.run(0.0)
+        attrs = events[2][2].attributes
+        changes = [
+            _event("sensor.grid", _state(1000.0 + i % 100, attrs), float(i))
+            for i in range(1, updates + 1)
+        ]
+
+        def run():
+            handle = sensor._handle_state_change
+            for i, event in enumerate(changes, 1):
+                loop.now = float(i)
+                handle(event)
+                loop.run(float(i))
+
+        _, elapsed = _timed(run)
+    return elapsed / updates * 1e6
+
+
+def bench_engine_steps(steps: int) -> dict[str, float]:
+    """Return the time of ``steps`` calculation steps per engine in seconds."""
+    rng = random.Random(2)
+    inputs = [
+        StepInputs(
+            rng.random() * 3,
+            0.2 + rng.random() * 0.2,
+            rng.random() * 4,
+            0.08,
+            rng.uniform(-2, 2),
+            1 + rng.random() * 9,
+        )
+        for _ in range(1000)
+    ]
+    dt = 1 / 3600
+
+    def run_engine():
+        engine = EngineState()
+        for i in range(steps):
+            step(engine, inputs[i % 1000], dt)
+
+    results = {"engine.step": _timed(run_engine)[1]}
+
+    try:
+        import numpy as np
+
+        from custom_components.weighted_energy_cost.batch import run_batch
+    except ImportError:
+        return results
+
+    # The inputs leave export and feed-in at their defaults of zero
+    columns = np.resize(np.array(inputs, dtype=np.float64)[:, :6], (steps, 6))
+    timestamps = np.arange(steps + 1, dtype=np.float64)
+    columns = np.vstack([columns[:1], columns])
+    results["batch.run_batch"] = _timed(
+        run_batch, EngineState(), timestamps, *columns.T
+    )[1]
+    return results
+
+
+def bench_replay_day(seconds: int) -> dict[str, tuple[int, float]]:
+    """Return events and replay time of ``seconds`` of 1 Hz data per kind."""
+    results = {}
+    for kind in SOURCE_KINDS:
+        events = _day_events(kind, seconds)
+        replay = HistoryReplay(_config(kind))
+        _, elapsed = _timed(replay.feed, events)
+        results[kind] = (len(events), elapsed)
+    return results
+
+
+def bench_write_volume(seconds: int) -> dict[tuple[int, float], tuple[float, float]]:
+    """Return state writes per hour of ``seconds`` of 1 Hz data per setting.
+
+    The writes are those of the sensor and of all its companions together.
+    """
+    results = {}
+    events = _day_events("power_kw", seconds)
+    for interval, threshold in WRITE_SETTINGS:
+        with _sensor_module() as (module, loop):
+            if module is None:
+                return results
+            config = {
+                **_config("power_kw"),
+                CONF_MIN_WRITE_INTERVAL: interval,
+                CONF_WRITE_THRESHOLD: threshold,
+            }
+            sensor, writes = _setup_sensor(
+                module, config, {e[1]: e[2] for e in events[:5]}
+            )
+            for timestamp, group in groupby(events, itemgetter(0)):
+                loop.run(float(timestamp))
+                for _, entity_id, state in group:
+                    sensor._handle_state_change(_event(entity_id, state, timestamp))
+            loop.run(float(seconds))
+        hours = seconds / 3600
+        results[interval, threshold] = (writes[0] / hours, writes[1] / hours)
+    return results
+
+
+def bench_projection(runs: int) -> float:
+    """Return the mean time of parsing and projecting 48 h of 15-minute slots.
+
+    Mirrors a price update of the sensor: both forecasts are parsed from
+    their attributes and the weighted cost is projected over every slot.
+    """
+    try:
+        from custom_components.weighted_energy_cost.forecast import (
+            parse_forecast,
+            project,
+            resample,
+        )
+    except ImportError:
+        return math.nan
+
+    rng = random.Random(3)
+    midnight = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    slots = [midnight + timedelta(minutes=15 * i) for i in range(193)]
+    prices = {
+        "raw_today": [
+            {"start": start, "end": end, "value": 0.2 + 0.2 * rng.random()}
+            for start, end in zip(slots, slots[1:])
+        ]
+    }
+    solar = {
+        "watts": {
+            start.isoformat(): max(0.0, 4000 * math.sin(math.pi * (i % 96 - 24) / 48))
+            for i, start in enumerate(slots[:-1])
+        }
+    }
+
+    def run():
+        for _ in range(runs):
+            forecast = parse_forecast(prices)
+            solar_kw = resample(parse_forecast(solar), forecast.start, forecast.end)
+            project(
+                forecast,
+                solar_kw,
+                load_kw=0.8,
+                solar_price=0.08,
+                battery_kwh=5.0,
+                total_battery_cost=1.0,
+            )
+
+    _, elapsed = _timed(run)
+    return elapsed / runs * 1e3
+
+
+def bench_lots(steps: int) -> dict[int, tuple[float, int]]:
+    """Return the time per step (µs) and lot count of the layered cost basis.
+
+    The battery charges for 600 and discharges for 400 of every 1000 steps
+    while the price changes on every step, so every charge step opens a
+    new lot and old lots stay stored. The time per step stays flat as the
+    history grows because the lots are bounded and merged.
+    """
+    rng = random.Random(4)
+    prices = [0.1 + rng.random() * 0.3 for _ in range(1000)]
+    dt = 1 / 3600
+
+    def inputs(i: int) -> StepInputs:
+        charging = i % 1000 < 600
+        stored = (
+            1.0 + i // 1000 * 0.2 + (i % 1000 if charging else 1200 - i % 1000) * 0.001
+        )
+        return StepInputs(
+            4.0, prices[i % 1000], 1.0, 0.08, -3.6 if charging else 3.6, stored
+        )
+
+    samples = [inputs(i) for i in range(steps)]
+
+    results = {}
+    for size in (steps // 100, steps // 10, steps):
+        engine = EngineState(lots=BatteryLots())
+
+        def run():
+            for i in range(size):
+                step(engine, samples[i], dt)
+
+        _, elapsed = _timed(run)
+        results[size] = (elapsed / size * 1e6, len(engine.lots))
+    return results
+
+
+def bench_offline(rows: int, path: Path) -> dict[str, float]:
+    """Return the rows per second of the offline replay of samples.
+
+    The samples are replayed from memory in chunks, and from a CSV file
+    written to ``path`` first, which is limited by parsing the text.
+    """
+    try:
+        import numpy as np
+
+        from custom_components.weighted_energy_cost.offline import (
+            read_csv_samples,
+            replay_samples,
+        )
+    except ImportError:
+        return {}
+
+    rng = np.random.default_rng(5)
+    chunk = 262144
+    chunks = []
+    for start in range(0, rows, chunk):
+        size = min(chunk, rows - start)
+        chunks.append(
+            {
+                "timestamp": 1.7e9 + 10.0 * np.arange(start, start + size),
+                "grid_kw": rng.uniform(0, 3, size),
+                "grid_price": rng.uniform(0.1, 0.4, size),
+                "solar_kw": rng.uniform(0, 4, size),
+                "solar_price": np.full(size, 0.08),
+                "battery_kw": rng.uniform(-2, 2, size),
+                "battery_kwh": rng.uniform(1, 8, size),
+            }
+        )
+    config = _config("power_kw")
+    _, in_memory = _timed(replay_samples, config, chunks)
+
+    with open(path, "w", encoding="utf-8") as file:
+        file.write(",".join(chunks[0]) + "\n")
+        for columns in chunks:
+            np.savetxt(
+                file, np.column_stack(list(columns.values())), "%.10g", delimiter=","
+            )
+    _, from_csv = _timed(lambda: replay_samples(config, read_csv_samples(path)))
+    path.unlink()
+    return {"in memory": rows / in_memory, "csv": rows / from_csv}
+
+
+def main() -> None:
+    """Run all benchmarks and print the results."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--quick", action="store_true", help="run a tenth of the default sizes"
+    )
+    args = parser.parse_args()
+    scale = 10 if args.quick else 1
+
+    updates = 100_000 // scale
+    if math.isnan(per_update := bench_event_update(updates)):
+        print("event update          skipped, needs Home Assistant")
+    else:
+        print(f"event update          {per_update:8.2f} µs")
+
+    steps = 1_000_000 // scale
+    for name, elapsed in bench_engine_steps(steps).items():
+        print(f"{name:<21} {elapsed:8.3f} s for {steps} steps")
+
+    seconds = DAY // scale
+    for kind, (events, elapsed) in bench_replay_day(seconds).items():
+        print(f"replay {kind:<14} {elapsed:8.3f} s for {events} events")
+
+    if not (volumes := bench_write_volume(seconds)):
+        print("writes                skipped, needs Home Assistant")
+    for (interval, threshold), (rate, companions) in volumes.items():
+        print(
+            f"writes interval={interval:>3}s threshold={threshold:<6} "
+            f"{rate:8.1f} per hour, companions {companions:8.1f} per hour"
+        )
+
+    runs = 1000 // scale
+    print(f"projection 48h x 15min {bench_projection(runs):7.3f} ms")
+
+    for size, (per_step, lots) in bench_lots(steps).items():
+        print(f"fifo lots {size:>8} steps {per_step:6.2f} µs/step {lots:3} lots")
+
+    rows = 4_000_000 // scale
+    with tempfile.TemporaryDirectory() as directory:
+        results = bench_offline(rows, Path(directory) / "samples.csv")
+    for source, rate in results.items():
+        print(f"offline {source:<13} {rate / 1e6:8.2f} M rows/s")
+
+
+if __name__ == "__main__":
+    main()
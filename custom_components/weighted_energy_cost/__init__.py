@@ -1,9 +1,70 @@
 """The Weighted Energy Cost Sensor integration."""
 
+from datetime import timedelta
+
+import voluptuous as vol
+
+from homeassistant.components.recorder import get_instance
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.core import HomeAssistant
+from homeassistant.core import (
+    HomeAssistant,
+    ServiceCall,
+    ServiceResponse,
+    SupportsResponse,
+)
+from homeassistant.exceptions import ServiceValidationError
+from homeassistant.helpers import config_validation as cv
+from homeassistant.helpers.typing import ConfigType
+from homeassistant.util import dt as dt_util
+
+from .const import (
+    DOMAIN,
+    ATTR_CONFIG_ENTRY_ID,
+    ATTR_INITIAL_BATTERY_COST,
+    ATTR_START,
+    SERVICE_RECOMPUTE,
+)
+from .recompute import async_recompute
+
+CONFIG_SCHEMA = cv.config_entry_only_config_schema(DOMAIN)
+
+RECOMPUTE_SCHEMA = vol.Schema(
+    {
+        vol.Required(ATTR_CONFIG_ENTRY_ID): cv.string,
+        vol.Optional(ATTR_START): cv.datetime,
+        vol.Optional(ATTR_INITIAL_BATTERY_COST, default=0.0): vol.Coerce(float),
+    }
+)
+
 
-from .const import DOMAIN
+async def async_setup(hass: HomeAssistant, config: ConfigType) -> bool:
+    """Set up the Weighted Energy Cost Sensor services."""
+
+    async def async_handle_recompute(call: ServiceCall) -> ServiceResponse:
+        """Rebuild a sensor's battery cost basis from recorder history."""
+        entry_id = call.data[ATTR_CONFIG_ENTRY_ID]
+        sensor = hass.data.get(DOMAIN, {}).get(entry_id)
+        if sensor is None:
+            raise ServiceValidationError(f"No loaded sensor for entry {entry_id}")
+
+        start = call.data.get(ATTR_START)
+        if start is None:
+            start = dt_util.utcnow() - timedelta(days=get_instance(hass).keep_days)
+        else:
+            start = dt_util.as_utc(start)
+
+        return await async_recompute(
+            hass, sensor, start, call.data[ATTR_INITIAL_BATTERY_COST]
+        )
+
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_RECOMPUTE,
+        async_handle_recompute,
+        schema=RECOMPUTE_SCHEMA,
+        supports_response=SupportsResponse.OPTIONAL,
+    )
+    return True
 
 
 async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
@@ -22,4 +83,7 @@ async def update_listener(hass: HomeAssistant, entry: ConfigEntry) -> None:
 
 async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     """Unload a config entry."""
-    return await hass.config_entries.async_unload_platforms(entry, ["sensor"])
+    unloaded = await hass.config_entries.async_unload_platforms(entry, ["sensor"])
+    if unloaded:
+        hass.data.get(DOMAIN, {}).pop(entry.entry_id, None)
+    return unloaded
@@ -0,0 +1,370 @@
+"""Vectorized batch engine for the Weighted Energy Cost Sensor.
+
+Replays aligned sample arrays through the same math as ``engine.step`` with
+NumPy. The battery cost basis is a first-order recurrence
+
+    cost[i] = keep[i] * (cost[i - 1] + added[i])
+
+(charging adds cost, discharging keeps a fraction of it) which is evaluated
+as a blocked associative scan instead of a Python loop over every sample.
+"""
+
+from __future__ import annotations
+
+from typing import NamedTuple
+
+import numpy as np
+
+from .const import INTEGRATION_METHOD_RIGHT
+from .engine import (
+    INTEGRATION_WEIGHTS,
+    MIN_BATTERY_KWH,
+    MIN_DT_HOURS,
+    MIN_SUPPLY_KW,
+    EngineState,
+    StepInputs,
+    charge_cost_rate,
+    solar_used_kw,
+    source_cost_rate,
+)
+
+DEFAULT_BLOCK_SIZE = 256
+
+# Smallest cumulative keep factor within a block that is solved by division.
+MIN_BLOCK_PRODUCT = 1e-6
+
+
+class BatchResult(NamedTuple):
+    """Per-sample outputs of a batch run.
+
+    Samples that did not produce a step (the first sample of a fresh state,
+    or samples closer than ``MIN_DT_HOURS`` to the previous step) carry the
+    previous values forward, like the sensor state does.
+    """
+
+    weighted_cost: np.ndarray
+    battery_unit_price: np.ndarray
+    total_battery_cost: np.ndarray
+    stepped: np.ndarray
+
+
+def run_batch(
+    state: EngineState,
+    timestamps,
+    grid_kw,
+    grid_price,
+    solar_kw,
+    solar_price,
+    battery_kw,
+    battery_kwh,
+    initial_cost: float = 0.0,
+    method: str = INTEGRATION_METHOD_RIGHT,
+    block_size: int = DEFAULT_BLOCK_SIZE,
+    export_kw=None,
+    feed_in_price=None,
+) -> BatchResult:
+    """Run aligned sample arrays through the engine.
+
+    ``timestamps`` are in seconds, powers in kW, prices in €/kWh and the
+    stored battery energy in kWh. ``state`` is advanced to the end of the
+    batch, so consecutive chunks of a long series can be fed one after the
+    other. ``initial_cost`` is the weighted cost held before the first step
+    and ``method`` selects the integration rule as in ``engine.step``. The
+    grid export power and feed-in price default to zero. Only the average
+    battery cost basis over the given stored energy is vectorized; layered
+    lots and the integrated stored energy are run with ``engine.step``.
+    """
+    if state.lots is not None or state.soe is not None:
+        raise ValueError(
+            "The batch engine does not support battery lots or integrated energy"
+        )
+    ts = np.asarray(timestamps, dtype=np.float64)
+    n = ts.size
+    stepped, dt = _step_mask(ts, state.last_update)
+
+    idx = np.flatnonzero(stepped)
+    # Regular series step on every sample, which allows views over copies
+    sel = (
+        slice(idx[0], idx[-1] + 1)
+        if idx.size and idx[-1] - idx[0] + 1 == idx.size
+        else idx
+    )
+    dt = dt[sel]
+    g = np.asarray(grid_kw, dtype=np.float64)[sel]
+    gp = np.asarray(grid_price, dtype=np.float64)[sel]
+    s = np.asarray(solar_kw, dtype=np.float64)[sel]
+    sp = np.asarray(solar_price, dtype=np.float64)[sel]
+    b = np.asarray(battery_kw, dtype=np.float64)[sel]
+    e = np.asarray(battery_kwh, dtype=np.float64)[sel]
+    x = np.broadcast_to(
+        np.asarray(0.0 if export_kw is None else export_kw, dtype=np.float64), n
+    )[sel]
+    fp = np.broadcast_to(
+        np.asarray(0.0 if feed_in_price is None else feed_in_price, dtype=np.float64), n
+    )[sel]
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        # Solar used on site costs at least the feed-in it could earn, and
+        # charging takes solar first and grid for the rest
+        s_used = np.maximum(s - x, 0.0)
+        s_price = np.maximum(sp, fp)
+        charge = np.maximum(-b, 0.0)
+        solar_charge = np.minimum(charge, s_used)
+        grid_charge = charge - solar_charge
+        source_cost = g * gp + s_used * s_price
+        charge_rate = np.where(
+            g + s_used > MIN_SUPPLY_KW, solar_charge * s_price + grid_charge * gp, 0.0
+        )
+        bat_discharge = np.maximum(b, 0.0)
+
+        # Integrate the battery flows from the previous and current samples
+        w_prev, w_cur = INTEGRATION_WEIGHTS[method]
+        last = state.last_inputs
+        if w_prev:
+            prev_charge = _previous(
+                charge_rate, charge_cost_rate(last) if last else None
+            )
+            prev_discharge = _previous(
+                bat_discharge, max(last.battery_kw, 0.0) if last else None
+            )
+            added = (w_prev * prev_charge + w_cur * charge_rate) * dt
+            energy_removed = (w_prev * prev_discharge + w_cur * bat_discharge) * dt
+        else:
+            added = charge_rate * dt
+            energy_removed = bat_discharge * dt
+
+        # Discharging removes the energy at the current unit price
+        has_energy = e > MIN_BATTERY_KWH
+        discharging = energy_removed > 0
+        removed = np.where(discharging & has_energy, energy_removed / e, 0.0)
+        keep = np.where(discharging, np.maximum(1.0 - removed, 0.0), 1.0)
+
+        cost = _cost_scan(
+            keep, added, removed, discharging, state.total_battery_cost, block_size
+        )
+        cost_before = np.empty_like(cost)
+        cost_before[:1] = state.total_battery_cost
+        cost_before[1:] = cost[:-1]
+        battery_price = np.where(has_energy, (cost_before + added) / e, 0.0)
+
+        # Accumulate energy per source and the cost of the energy used
+        export_revenue = x * fp
+        if w_prev:
+            grid_energy = (
+                w_prev * _previous(g, last.grid_kw if last else None) + w_cur * g
+            ) * dt
+            solar_energy = (
+                w_prev * _previous(s_used, solar_used_kw(last) if last else None)
+                + w_cur * s_used
+            ) * dt
+            prev_source_cost = _previous(
+                source_cost, source_cost_rate(last) if last else None
+            )
+            supplied_cost = (w_prev * prev_source_cost + w_cur * source_cost) * dt
+            export_energy = (
+                w_prev * _previous(x, last.export_kw if last else None) + w_cur * x
+            ) * dt
+            prev_revenue = _previous(
+                export_revenue, last.export_kw * last.feed_in_price if last else None
+            )
+            export_revenue = (w_prev * prev_revenue + w_cur * export_revenue) * dt
+        else:
+            grid_energy = g * dt
+            solar_energy = s_used * dt
+            supplied_cost = source_cost * dt
+            export_energy = x * dt
+            export_revenue = export_revenue * dt
+        cost_in = float(added.sum())
+        cost_out = float((cost_before + added - cost).sum())
+        totals = state.totals
+        totals.grid_kwh += float(np.maximum(grid_energy, 0.0).sum())
+        totals.solar_kwh += float(np.maximum(solar_energy, 0.0).sum())
+        totals.battery_kwh += float(energy_removed.sum())
+        totals.battery_cost_in += cost_in
+        totals.battery_cost_out += cost_out
+        totals.cost += float(supplied_cost.sum()) - cost_in + cost_out
+        totals.export_kwh += float(export_energy.sum())
+        totals.export_revenue += float(export_revenue.sum())
+
+        # The home uses what is neither charged nor exported
+        home_grid = np.maximum(g - grid_charge, 0.0)
+        home_solar = s_used - solar_charge
+        home_battery = np.maximum(bat_discharge - np.maximum(x - s, 0.0), 0.0)
+        supply = home_grid + home_solar + home_battery
+        weighted = np.where(
+            supply > MIN_SUPPLY_KW,
+            (home_grid * gp + home_solar * s_price + home_battery * battery_price)
+            / supply,
+            np.where(gp > 0, gp, np.nan),
+        )
+
+    result = BatchResult(
+        weighted_cost=_hold(weighted, sel, idx, n, initial_cost),
+        battery_unit_price=_hold(battery_price, sel, idx, n, 0.0),
+        total_battery_cost=_hold(cost, sel, idx, n, state.total_battery_cost),
+        stepped=stepped,
+    )
+
+    if state.last_update is None and n:
+        state.last_update = float(ts[0])
+    if idx.size:
+        state.total_battery_cost = float(cost[-1])
+        state.last_update = float(ts[idx[-1]])
+        state.last_inputs = StepInputs(
+            float(g[-1]),
+            float(gp[-1]),
+            float(s[-1]),
+            float(sp[-1]),
+            float(b[-1]),
+            float(e[-1]),
+            float(x[-1]),
+            float(fp[-1]),
+        )
+    return result
+
+
+def _previous(values: np.ndarray, first: float | None) -> np.ndarray:
+    """Shift per-step values by one, starting from ``first`` if known."""
+    out = np.empty_like(values)
+    out[:1] = values[:1] if first is None else first
+    out[1:] = values[:-1]
+    return out
+
+
+def _step_mask(ts: np.ndarray, last_update: float | None):
+    """Return which samples produce a step and their elapsed hours.
+
+    Mirrors ``engine.advance``: a sample closer than ``MIN_DT_HOURS`` to the
+    last step is skipped and the next sample is measured from that step.
+    """
+    n = ts.size
+    stepped = np.zeros(n, dtype=bool)
+    dt = np.zeros(n, dtype=np.float64)
+    if n == 0:
+        return stepped, dt
+
+    start = 0
+    if last_update is None:
+        # The first sample only starts the clock
+        last_update = ts[0]
+        start = 1
+
+    prev = np.empty(n - start, dtype=np.float64)
+    prev[:1] = last_update
+    prev[1:] = ts[start:-1]
+    dt[start:] = (ts[start:] - prev) / 3600.0
+    stepped[start:] = dt[start:] >= MIN_DT_HOURS
+
+    # Every sample following a skipped one must be measured from the last
+    # step instead of its direct predecessor. Walk only those runs.
+    skipped = np.flatnonzero(~stepped[start:]) + start
+    k = 0
+    while k < skipped.size:
+        i = skipped[k]
+        ref = ts[i - 1] if i > start else last_update
+        i += 1
+        while i < n:
+            dt[i] = (ts[i] - ref) / 3600.0
+            if dt[i] >= MIN_DT_HOURS:
+                stepped[i] = True
+                break
+            stepped[i] = False
+            i += 1
+        k = np.searchsorted(skipped, i + 1)
+
+    return stepped, dt
+
+
+def _cost_scan(keep, added, removed, discharging, initial, block_size):
+    """Evaluate the battery cost recurrence, clamping at zero on discharge.
+
+    Within a step the charge is added before the discharge is removed.
+    """
+    cost = _affine_scan(keep, keep * added, initial, block_size)
+
+    # The recurrence is exact while the pool is non-negative. Only negative
+    # prices can drive it below zero, in which case the next discharge step
+    # is evaluated exactly and the scan restarts from there.
+    offset = 0
+    while True:
+        charged = np.empty_like(cost)
+        charged[:1] = initial
+        charged[1:] = cost[:-1]
+        charged += added
+        bad = np.flatnonzero(discharging[offset:] & (charged[offset:] < 0))
+        if not bad.size:
+            return cost
+        i = offset + bad[0]
+        cost[i] = max(0.0, charged[i] * (1.0 - removed[i]))
+        cost[i + 1 :] = _affine_scan(
+            keep[i + 1 :], keep[i + 1 :] * added[i + 1 :], cost[i], block_size
+        )
+        offset = i + 1
+
+
+def _affine_scan(m: np.ndarray, a: np.ndarray, c0: float, block_size: int):
+    """Return ``c`` with ``c[i] = m[i] * c[i - 1] + a[i]`` and ``c[-1] = c0``.
+
+    Within a block the recurrence is solved from cumulative products, and
+    the block results are chained with an associative scan over the block
+    totals. All factors are in [0, 1]; blocks whose product decays too far
+    for the division to stay accurate are scanned pairwise instead.
+    """
+    n = m.size
+    if n == 0:
+        return np.empty(0, dtype=np.float64)
+
+    block_size = min(block_size, n)
+    blocks = -(-n // block_size)
+    mul = np.ones(blocks * block_size, dtype=np.float64)
+    add = np.zeros(blocks * block_size, dtype=np.float64)
+    mul[:n] = m
+    add[:n] = a
+    mul = mul.reshape(blocks, block_size)
+    add = add.reshape(blocks, block_size)
+
+    prod = np.multiply.accumulate(mul, axis=1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        acc = prod * np.cumsum(add / prod, axis=1)
+
+    rows = np.flatnonzero(prod[:, -1] <= MIN_BLOCK_PRODUCT)
+    if rows.size:
+        rows_mul = mul[rows]
+        rows_add = add[rows]
+        _scan_rows(rows_mul, rows_add)
+        prod[rows] = rows_mul
+        acc[rows] = rows_add
+
+    block_mul = prod[:, -1].copy()
+    block_add = acc[:, -1].copy()
+    _scan_rows(block_mul[None, :], block_add[None, :])
+
+    carry = np.empty(blocks, dtype=np.float64)
+    carry[0] = c0
+    carry[1:] = block_mul[:-1] * c0 + block_add[:-1]
+    return (prod * carry[:, None] + acc).ravel()[:n]
+
+
+def _scan_rows(mul: np.ndarray, add: np.ndarray) -> None:
+    """Inclusive in-place scan of affine maps along the last axis."""
+    shift = 1
+    width = mul.shape[-1]
+    while shift < width:
+        add[:, shift:] = mul[:, shift:] * add[:, :-shift] + add[:, shift:]
+        mul[:, shift:] = mul[:, shift:] * mul[:, :-shift]
+        shift *= 2
+
+
+def _hold(values: np.ndarray, sel, idx: np.ndarray, n: int, initial: float):
+    """Spread per-step values over all samples, holding the last valid one."""
+    out = np.full(n, np.nan, dtype=np.float64)
+    out[: idx[0] if idx.size else n] = initial
+    out[sel] = values
+    valid = ~np.isnan(out)
+    if valid.all():
+        return out
+    pos = np.where(valid, np.arange(n), -1)
+    np.maximum.accumulate(pos, out=pos)
+    held = out[np.maximum(pos, 0)]
+    held[pos < 0] = initial
+    return held
@@ -22,6 +22,10 @@ from .const import (
     CONF_SOLAR_SOURCE_VALUE,
     CONF_SOLAR_PRICE_TYPE,
     CONF_SOLAR_PRICE_VALUE,
+    CONF_GRID_EXPORT_SOURCE_TYPE,
+    CONF_GRID_EXPORT_SOURCE_VALUE,
+    CONF_FEED_IN_PRICE_TYPE,
+    CONF_FEED_IN_PRICE_VALUE,
     CONF_BATTERY_POWER_SOURCE_TYPE,
     CONF_BATTERY_POWER_SOURCE_VALUE,
     CONF_BATTERY_ENERGY_SOURCE_TYPE,
@@ -29,8 +33,237 @@ from .const import (
     SOURCE_TYPE_ENTITY,
     SOURCE_TYPE_FIXED,
     SOURCE_TYPE_DASHBOARD,
+    SOURCE_TYPE_SCHEDULE,
+    CONF_INTEGRATION_METHOD,
+    CONF_COST_BASIS,
+    CONF_INTEGRATE_ENERGY,
+    CONF_CHARGE_EFFICIENCY,
+    CONF_DISCHARGE_EFFICIENCY,
+    CONF_SELF_DISCHARGE,
+    CONF_UPDATE_MODE,
+    CONF_UPDATE_INTERVAL,
+    CONF_COALESCE_WINDOW,
+    CONF_REORDER_WINDOW,
+    CONF_MIN_WRITE_INTERVAL,
+    CONF_WRITE_THRESHOLD,
+    CONF_CONSUMERS,
+    CONF_DEBUG_SENSORS,
+    CONF_GRID_CO2_INTENSITY,
+    CONF_SOLAR_CO2_INTENSITY,
+    CONF_PRICE_FORECAST,
+    CONF_SOLAR_FORECAST,
+    INTEGRATION_METHOD_RIGHT,
+    INTEGRATION_METHOD_LEFT,
+    INTEGRATION_METHOD_TRAPEZOIDAL,
+    COST_BASIS_AVERAGE,
+    COST_BASIS_FIFO,
+    COST_BASIS_LIFO,
+    UPDATE_MODE_EVENT,
+    UPDATE_MODE_INTERVAL,
+    UPDATE_MODE_BOTH,
     DEFAULT_NAME,
+    DEFAULT_INTEGRATION_METHOD,
+    DEFAULT_COST_BASIS,
+    DEFAULT_CHARGE_EFFICIENCY,
+    DEFAULT_DISCHARGE_EFFICIENCY,
+    DEFAULT_SELF_DISCHARGE,
+    DEFAULT_UPDATE_MODE,
+    DEFAULT_UPDATE_INTERVAL,
+    DEFAULT_COALESCE_WINDOW,
+    DEFAULT_REORDER_WINDOW,
+    DEFAULT_MIN_WRITE_INTERVAL,
+    DEFAULT_WRITE_THRESHOLD,
+    DEFAULT_SOLAR_CO2_INTENSITY,
 )
+from .tariff import ScheduleError, parse_schedule
+
+
+def _valid_price(source_type: str, value: Any) -> bool:
+    """Return whether a price value can be used with its source type."""
+    if source_type != SOURCE_TYPE_SCHEDULE:
+        return True
+    try:
+        parse_schedule(value)
+    except ScheduleError:
+        return False
+    return True
+
+
+def _calculation_schema(data: dict[str, Any]) -> vol.Schema:
+    """Return the schema of the calculation settings step."""
+    return vol.Schema(
+        {
+            vol.Required(
+                CONF_INTEGRATION_METHOD,
+                default=data.get(CONF_INTEGRATION_METHOD, DEFAULT_INTEGRATION_METHOD),
+            ): selector.SelectSelector(
+                selector.SelectSelectorConfig(
+                    options=[
+                        INTEGRATION_METHOD_RIGHT,
+                        INTEGRATION_METHOD_LEFT,
+                        INTEGRATION_METHOD_TRAPEZOIDAL,
+                    ],
+                    mode=selector.SelectSelectorMode.LIST,
+                    translation_key="integration_method",
+                )
+            ),
+            vol.Required(
+                CONF_COST_BASIS,
+                default=data.get(CONF_COST_BASIS, DEFAULT_COST_BASIS),
+            ): selector.SelectSelector(
+                selector.SelectSelectorConfig(
+                    options=[COST_BASIS_AVERAGE, COST_BASIS_FIFO, COST_BASIS_LIFO],
+                    mode=selector.SelectSelectorMode.LIST,
+                    translation_key="cost_basis",
+                )
+            ),
+            vol.Required(
+                CONF_INTEGRATE_ENERGY,
+                default=data.get(CONF_INTEGRATE_ENERGY, False),
+            ): selector.BooleanSelector(),
+            vol.Required(
+                CONF_CHARGE_EFFICIENCY,
+                default=data.get(CONF_CHARGE_EFFICIENCY, DEFAULT_CHARGE_EFFICIENCY),
+            ): selector.NumberSelector(
+                selector.NumberSelectorConfig(
+                    min=50,
+                    max=100,
+                    step=0.1,
+                    unit_of_measurement="%",
+                    mode=selector.NumberSelectorMode.BOX,
+                )
+            ),
+            vol.Required(
+                CONF_DISCHARGE_EFFICIENCY,
+                default=data.get(
+                    CONF_DISCHARGE_EFFICIENCY, DEFAULT_DISCHARGE_EFFICIENCY
+                ),
+            ): selector.NumberSelector(
+                selector.NumberSelectorConfig(
+                    min=50,
+                    max=100,
+                    step=0.1,
+                    unit_of_measurement="%",
+                    mode=selector.NumberSelectorMode.BOX,
+                )
+            ),
+            vol.Required(
+                CONF_SELF_DISCHARGE,
+                default=data.get(CONF_SELF_DISCHARGE, DEFAULT_SELF_DISCHARGE),
+            ): selector.NumberSelector(
+                selector.NumberSelectorConfig(
+                    min=0,
+                    max=10,
+                    step=0.01,
+                    unit_of_measurement="%/d",
+                    mode=selector.NumberSelectorMode.BOX,
+                )
+            ),
+            vol.Required(
+                CONF_UPDATE_MODE,
+                default=data.get(CONF_UPDATE_MODE, DEFAULT_UPDATE_MODE),
+            ): selector.SelectSelector(
+                selector.SelectSelectorConfig(
+                    options=[UPDATE_MODE_EVENT, UPDATE_MODE_INTERVAL, UPDATE_MODE_BOTH],
+                    mode=selector.SelectSelectorMode.LIST,
+                    translation_key="update_mode",
+                )
+            ),
+            vol.Required(
+                CONF_UPDATE_INTERVAL,
+                default=data.get(CONF_UPDATE_INTERVAL, DEFAULT_UPDATE_INTERVAL),
+            ): selector.NumberSelector(
+                selector.NumberSelectorConfig(
+                    min=1,
+                    max=3600,
+                    step=1,
+                    unit_of_measurement="s",
+                    mode=selector.NumberSelectorMode.BOX,
+                )
+            ),
+            vol.Required(
+                CONF_COALESCE_WINDOW,
+                default=data.get(CONF_COALESCE_WINDOW, DEFAULT_COALESCE_WINDOW),
+            ): selector.NumberSelector(
+                selector.NumberSelectorConfig(
+                    min=0,
+                    max=60000,
+                    step=10,
+                    unit_of_measurement="ms",
+                    mode=selector.NumberSelectorMode.BOX,
+                )
+            ),
+            vol.Required(
+                CONF_REORDER_WINDOW,
+                default=data.get(CONF_REORDER_WINDOW, DEFAULT_REORDER_WINDOW),
+            ): selector.NumberSelector(
+                selector.NumberSelectorConfig(
+                    min=0,
+                    max=10000,
+                    step=10,
+                    unit_of_measurement="ms",
+                    mode=selector.NumberSelectorMode.BOX,
+                )
+            ),
+            vol.Required(
+                CONF_MIN_WRITE_INTERVAL,
+                default=data.get(CONF_MIN_WRITE_INTERVAL, DEFAULT_MIN_WRITE_INTERVAL),
+            ): selector.NumberSelector(
+                selector.NumberSelectorConfig(
+                    min=0,
+                    max=3600,
+                    step=1,
+                    unit_of_measurement="s",
+                    mode=selector.NumberSelectorMode.BOX,
+                )
+            ),
+            vol.Required(
+                CONF_WRITE_THRESHOLD,
+                default=data.get(CONF_WRITE_THRESHOLD, DEFAULT_WRITE_THRESHOLD),
+            ): selector.NumberSelector(
+                selector.NumberSelectorConfig(
+                    min=0,
+                    max=1,
+                    step=0.0001,
+                    unit_of_measurement="€/kWh",
+                    mode=selector.NumberSelectorMode.BOX,
+                )
+            ),
+            vol.Optional(
+                CONF_CONSUMERS, default=data.get(CONF_CONSUMERS, [])
+            ): selector.EntitySelector(
+                selector.EntitySelectorConfig(domain="sensor", multiple=True)
+            ),
+            vol.Optional(
+                CONF_PRICE_FORECAST,
+                description={"suggested_value": data.get(CONF_PRICE_FORECAST)},
+            ): selector.EntitySelector(selector.EntitySelectorConfig(domain="sensor")),
+            vol.Optional(
+                CONF_SOLAR_FORECAST,
+                description={"suggested_value": data.get(CONF_SOLAR_FORECAST)},
+            ): selector.EntitySelector(selector.EntitySelectorConfig(domain="sensor")),
+            vol.Optional(
+                CONF_GRID_CO2_INTENSITY,
+                description={"suggested_value": data.get(CONF_GRID_CO2_INTENSITY)},
+            ): selector.EntitySelector(selector.EntitySelectorConfig(domain="sensor")),
+            vol.Required(
+                CONF_SOLAR_CO2_INTENSITY,
+                default=data.get(CONF_SOLAR_CO2_INTENSITY, DEFAULT_SOLAR_CO2_INTENSITY),
+            ): selector.NumberSelector(
+                selector.NumberSelectorConfig(
+                    min=0,
+                    max=1000,
+                    step=1,
+                    unit_of_measurement="g/kWh",
+                    mode=selector.NumberSelectorMode.BOX,
+                )
+            ),
+            vol.Required(
+                CONF_DEBUG_SENSORS,
+                default=data.get(CONF_DEBUG_SENSORS, False),
+            ): selector.BooleanSelector(),
+        }
+    )
 
 
 class WeightedEnergyCostConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
@@ -71,6 +304,7 @@ class WeightedEnergyCostConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
         key: str,
         allow_dashboard: bool = False,
         default=SOURCE_TYPE_ENTITY,
+        allow_schedule: bool = False,
     ):
         options = [
             {"value": SOURCE_TYPE_ENTITY, "label": "Sensor Entity"},
@@ -80,6 +314,8 @@ class WeightedEnergyCostConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
             options.append(
                 {"value": SOURCE_TYPE_DASHBOARD, "label": "Energy Dashboard Entity"}
             )
+        if allow_schedule:
+            options.append({"value": SOURCE_TYPE_SCHEDULE, "label": "Tariff Schedule"})
 
         return self.async_show_form(
             step_id=step_id,
@@ -99,7 +335,13 @@ class WeightedEnergyCostConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
             last_step=False,
         )
 
-    async def _async_show_value_step(self, step_id: str, type_key: str, value_key: str):
+    async def _async_show_value_step(
+        self,
+        step_id: str,
+        type_key: str,
+        value_key: str,
+        errors: dict[str, str] | None = None,
+    ):
         source_type = self.data[type_key]
         current_val = self.data.get(value_key)
 
@@ -122,6 +364,17 @@ class WeightedEnergyCostConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
                     )
                 }
             )
+        elif source_type == SOURCE_TYPE_SCHEDULE:
+            schema = vol.Schema(
+                {
+                    vol.Required(
+                        value_key,
+                        default=current_val if isinstance(current_val, str) else "",
+                    ): selector.TextSelector(
+                        selector.TextSelectorConfig(multiline=True)
+                    )
+                }
+            )
         elif source_type == SOURCE_TYPE_DASHBOARD:
             schema = vol.Schema(
                 {
@@ -148,7 +401,7 @@ class WeightedEnergyCostConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
             )
 
         return self.async_show_form(
-            step_id=step_id, data_schema=schema, last_step=False
+            step_id=step_id, data_schema=schema, errors=errors, last_step=False
         )
 
     async def async_step_grid_import(self, user_input=None):
@@ -174,17 +427,27 @@ class WeightedEnergyCostConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
             self.data.update(user_input)
             return await self.async_step_grid_price_value()
         return await self._async_show_type_step(
-            "grid_price", CONF_GRID_IMPORT_PRICE_TYPE, default=SOURCE_TYPE_FIXED
+            "grid_price",
+            CONF_GRID_IMPORT_PRICE_TYPE,
+            default=SOURCE_TYPE_FIXED,
+            allow_schedule=True,
         )
 
     async def async_step_grid_price_value(self, user_input=None):
+        errors = {}
         if user_input:
-            self.data.update(user_input)
-            return await self.async_step_solar()
+            if _valid_price(
+                self.data[CONF_GRID_IMPORT_PRICE_TYPE],
+                user_input[CONF_GRID_IMPORT_PRICE_VALUE],
+            ):
+                self.data.update(user_input)
+                return await self.async_step_solar()
+            errors["base"] = "invalid_schedule"
         return await self._async_show_value_step(
             "grid_price_value",
             CONF_GRID_IMPORT_PRICE_TYPE,
             CONF_GRID_IMPORT_PRICE_VALUE,
+            errors=errors,
         )
 
     async def async_step_solar(self, user_input=None):
@@ -208,15 +471,74 @@ class WeightedEnergyCostConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
             self.data.update(user_input)
             return await self.async_step_solar_price_value()
         return await self._async_show_type_step(
-            "solar_price", CONF_SOLAR_PRICE_TYPE, default=SOURCE_TYPE_FIXED
+            "solar_price",
+            CONF_SOLAR_PRICE_TYPE,
+            default=SOURCE_TYPE_FIXED,
+            allow_schedule=True,
         )
 
     async def async_step_solar_price_value(self, user_input=None):
+        errors = {}
+        if user_input:
+            if _valid_price(
+                self.data[CONF_SOLAR_PRICE_TYPE], user_input[CONF_SOLAR_PRICE_VALUE]
+            ):
+                self.data.update(user_input)
+                return await self.async_step_grid_export()
+            errors["base"] = "invalid_schedule"
+        return await self._async_show_value_step(
+            "solar_price_value",
+            CONF_SOLAR_PRICE_TYPE,
+            CONF_SOLAR_PRICE_VALUE,
+            errors=errors,
+        )
+
+    async def async_step_grid_export(self, user_input=None):
         if user_input:
             self.data.update(user_input)
-            return await self.async_step_battery_power()
+            return await self.async_step_grid_export_value()
+        return await self._async_show_type_step(
+            "grid_export",
+            CONF_GRID_EXPORT_SOURCE_TYPE,
+            allow_dashboard=True,
+            default=SOURCE_TYPE_FIXED,
+        )
+
+    async def async_step_grid_export_value(self, user_input=None):
+        if user_input:
+            self.data.update(user_input)
+            return await self.async_step_feed_in_price()
+        return await self._async_show_value_step(
+            "grid_export_value",
+            CONF_GRID_EXPORT_SOURCE_TYPE,
+            CONF_GRID_EXPORT_SOURCE_VALUE,
+        )
+
+    async def async_step_feed_in_price(self, user_input=None):
+        if user_input:
+            self.data.update(user_input)
+            return await self.async_step_feed_in_price_value()
+        return await self._async_show_type_step(
+            "feed_in_price",
+            CONF_FEED_IN_PRICE_TYPE,
+            default=SOURCE_TYPE_FIXED,
+            allow_schedule=True,
+        )
+
+    async def async_step_feed_in_price_value(self, user_input=None):
+        errors = {}
+        if user_input:
+            if _valid_price(
+                self.data[CONF_FEED_IN_PRICE_TYPE], user_input[CONF_FEED_IN_PRICE_VALUE]
+            ):
+                self.data.update(user_input)
+                return await self.async_step_battery_power()
+            errors["base"] = "invalid_schedule"
         return await self._async_show_value_step(
-            "solar_price_value", CONF_SOLAR_PRICE_TYPE, CONF_SOLAR_PRICE_VALUE
+            "feed_in_price_value",
+            CONF_FEED_IN_PRICE_TYPE,
+            CONF_FEED_IN_PRICE_VALUE,
+            errors=errors,
         )
 
     async def async_step_battery_power(self, user_input=None):
@@ -248,13 +570,21 @@ class WeightedEnergyCostConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
     async def async_step_battery_energy_value(self, user_input=None):
         if user_input:
             self.data.update(user_input)
-            return self.async_create_entry(title=self.data[CONF_NAME], data=self.data)
+            return await self.async_step_calculation()
         return await self._async_show_value_step(
             "battery_energy_value",
             CONF_BATTERY_ENERGY_SOURCE_TYPE,
             CONF_BATTERY_ENERGY_SOURCE_VALUE,
         )
 
+    async def async_step_calculation(self, user_input=None):
+        if user_input:
+            self.data.update(user_input)
+            return self.async_create_entry(title=self.data[CONF_NAME], data=self.data)
+        return self.async_show_form(
+            step_id="calculation", data_schema=_calculation_schema(self.data)
+        )
+
 
 class WeightedEnergyCostOptionsFlow(config_entries.OptionsFlow):
     """Handle options flow for Weighted Energy Cost Sensor."""
@@ -276,7 +606,12 @@ class WeightedEnergyCostOptionsFlow(config_entries.OptionsFlow):
         return await self.async_step_grid_import()
 
     async def _async_show_type_step(
-        self, step_id, key, allow_dashboard=False, default=SOURCE_TYPE_ENTITY
+        self,
+        step_id,
+        key,
+        allow_dashboard=False,
+        default=SOURCE_TYPE_ENTITY,
+        allow_schedule=False,
     ):
         options = [
             {"value": SOURCE_TYPE_ENTITY, "label": "Sensor Entity"},
@@ -286,6 +621,8 @@ class WeightedEnergyCostOptionsFlow(config_entries.OptionsFlow):
             options.append(
                 {"value": SOURCE_TYPE_DASHBOARD, "label": "Energy Dashboard Entity"}
             )
+        if allow_schedule:
+            options.append({"value": SOURCE_TYPE_SCHEDULE, "label": "Tariff Schedule"})
 
         return self.async_show_form(
             step_id=step_id,
@@ -305,7 +642,7 @@ class WeightedEnergyCostOptionsFlow(config_entries.OptionsFlow):
             last_step=False,
         )
 
-    async def _async_show_value_step(self, step_id, type_key, value_key):
+    async def _async_show_value_step(self, step_id, type_key, value_key, errors=None):
         source_type = self.data[type_key]
         current_val = self.data.get(value_key)
 
@@ -328,6 +665,17 @@ class WeightedEnergyCostOptionsFlow(config_entries.OptionsFlow):
                     )
                 }
             )
+        elif source_type == SOURCE_TYPE_SCHEDULE:
+            schema = vol.Schema(
+                {
+                    vol.Required(
+                        value_key,
+                        default=current_val if isinstance(current_val, str) else "",
+                    ): selector.TextSelector(
+                        selector.TextSelectorConfig(multiline=True)
+                    )
+                }
+            )
         elif source_type == SOURCE_TYPE_DASHBOARD:
             schema = vol.Schema(
                 {
@@ -354,7 +702,7 @@ class WeightedEnergyCostOptionsFlow(config_entries.OptionsFlow):
             )
 
         return self.async_show_form(
-            step_id=step_id, data_schema=schema, last_step=False
+            step_id=step_id, data_schema=schema, errors=errors, last_step=False
         )
 
     async def async_step_grid_import(self, user_input=None):
@@ -380,17 +728,27 @@ class WeightedEnergyCostOptionsFlow(config_entries.OptionsFlow):
             self.data.update(user_input)
             return await self.async_step_grid_price_value()
         return await self._async_show_type_step(
-            "grid_price", CONF_GRID_IMPORT_PRICE_TYPE, default=SOURCE_TYPE_FIXED
+            "grid_price",
+            CONF_GRID_IMPORT_PRICE_TYPE,
+            default=SOURCE_TYPE_FIXED,
+            allow_schedule=True,
         )
 
     async def async_step_grid_price_value(self, user_input=None):
+        errors = {}
         if user_input:
-            self.data.update(user_input)
-            return await self.async_step_solar()
+            if _valid_price(
+                self.data[CONF_GRID_IMPORT_PRICE_TYPE],
+                user_input[CONF_GRID_IMPORT_PRICE_VALUE],
+            ):
+                self.data.update(user_input)
+                return await self.async_step_solar()
+            errors["base"] = "invalid_schedule"
         return await self._async_show_value_step(
             "grid_price_value",
             CONF_GRID_IMPORT_PRICE_TYPE,
             CONF_GRID_IMPORT_PRICE_VALUE,
+            errors=errors,
         )
 
     async def async_step_solar(self, user_input=None):
@@ -414,15 +772,74 @@ class WeightedEnergyCostOptionsFlow(config_entries.OptionsFlow):
             self.data.update(user_input)
             return await self.async_step_solar_price_value()
         return await self._async_show_type_step(
-            "solar_price", CONF_SOLAR_PRICE_TYPE, default=SOURCE_TYPE_FIXED
+            "solar_price",
+            CONF_SOLAR_PRICE_TYPE,
+            default=SOURCE_TYPE_FIXED,
+            allow_schedule=True,
         )
 
     async def async_step_solar_price_value(self, user_input=None):
+        errors = {}
+        if user_input:
+            if _valid_price(
+                self.data[CONF_SOLAR_PRICE_TYPE], user_input[CONF_SOLAR_PRICE_VALUE]
+            ):
+                self.data.update(user_input)
+                return await self.async_step_grid_export()
+            errors["base"] = "invalid_schedule"
+        return await self._async_show_value_step(
+            "solar_price_value",
+            CONF_SOLAR_PRICE_TYPE,
+            CONF_SOLAR_PRICE_VALUE,
+            errors=errors,
+        )
+
+    async def async_step_grid_export(self, user_input=None):
         if user_input:
             self.data.update(user_input)
-            return await self.async_step_battery_power()
+            return await self.async_step_grid_export_value()
+        return await self._async_show_type_step(
+            "grid_export",
+            CONF_GRID_EXPORT_SOURCE_TYPE,
+            allow_dashboard=True,
+            default=SOURCE_TYPE_FIXED,
+        )
+
+    async def async_step_grid_export_value(self, user_input=None):
+        if user_input:
+            self.data.update(user_input)
+            return await self.async_step_feed_in_price()
         return await self._async_show_value_step(
-            "solar_price_value", CONF_SOLAR_PRICE_TYPE, CONF_SOLAR_PRICE_VALUE
+            "grid_export_value",
+            CONF_GRID_EXPORT_SOURCE_TYPE,
+            CONF_GRID_EXPORT_SOURCE_VALUE,
+        )
+
+    async def async_step_feed_in_price(self, user_input=None):
+        if user_input:
+            self.data.update(user_input)
+            return await self.async_step_feed_in_price_value()
+        return await self._async_show_type_step(
+            "feed_in_price",
+            CONF_FEED_IN_PRICE_TYPE,
+            default=SOURCE_TYPE_FIXED,
+            allow_schedule=True,
+        )
+
+    async def async_step_feed_in_price_value(self, user_input=None):
+        errors = {}
+        if user_input:
+            if _valid_price(
+                self.data[CONF_FEED_IN_PRICE_TYPE], user_input[CONF_FEED_IN_PRICE_VALUE]
+            ):
+                self.data.update(user_input)
+                return await self.async_step_battery_power()
+            errors["base"] = "invalid_schedule"
+        return await self._async_show_value_step(
+            "feed_in_price_value",
+            CONF_FEED_IN_PRICE_TYPE,
+            CONF_FEED_IN_PRICE_VALUE,
+            errors=errors,
         )
 
     async def async_step_battery_power(self, user_input=None):
@@ -454,9 +871,24 @@ class WeightedEnergyCostOptionsFlow(config_entries.OptionsFlow):
     async def async_step_battery_energy_value(self, user_input=None):
         if user_input:
             self.data.update(user_input)
-            return self.async_create_entry(title="", data=self.data)
+            return await self.async_step_calculation()
         return await self._async_show_value_step(
             "battery_energy_value",
             CONF_BATTERY_ENERGY_SOURCE_TYPE,
             CONF_BATTERY_ENERGY_SOURCE_VALUE,
         )
+
+    async def async_step_calculation(self, user_input=None):
+        if user_input:
+            # Cleared optional entities are left out of the input
+            for key in (
+                CONF_PRICE_FORECAST,
+                CONF_SOLAR_FORECAST,
+                CONF_GRID_CO2_INTENSITY,
+            ):
+                self.data.pop(key, None)
+            self.data.update(user_input)
+            return self.async_create_entry(title="", data=self.data)
+        return self.async_show_form(
+            step_id="calculation", data_schema=_calculation_schema(self.data)
+        )
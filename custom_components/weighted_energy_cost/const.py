@@ -13,13 +13,69 @@ CONF_SOLAR_SOURCE_VALUE = "solar_source_value"
 CONF_SOLAR_PRICE_TYPE = "solar_price_type"
 CONF_SOLAR_PRICE_VALUE = "solar_price_value"
 
+CONF_GRID_EXPORT_SOURCE_TYPE = "grid_export_source_type"
+CONF_GRID_EXPORT_SOURCE_VALUE = "grid_export_source_value"
+CONF_FEED_IN_PRICE_TYPE = "feed_in_price_type"
+CONF_FEED_IN_PRICE_VALUE = "feed_in_price_value"
+
 CONF_BATTERY_POWER_SOURCE_TYPE = "battery_power_source_type"
 CONF_BATTERY_POWER_SOURCE_VALUE = "battery_power_source_value"
 CONF_BATTERY_ENERGY_SOURCE_TYPE = "battery_energy_source_type"
 CONF_BATTERY_ENERGY_SOURCE_VALUE = "battery_energy_source_value"
 
+CONF_GRID_CO2_INTENSITY = "grid_co2_intensity"
+CONF_SOLAR_CO2_INTENSITY = "solar_co2_intensity"
+
 SOURCE_TYPE_ENTITY = "entity"
 SOURCE_TYPE_FIXED = "fixed"
 SOURCE_TYPE_DASHBOARD = "dashboard"
+SOURCE_TYPE_SCHEDULE = "schedule"
+
+CONF_INTEGRATION_METHOD = "integration_method"
+INTEGRATION_METHOD_RIGHT = "right"
+INTEGRATION_METHOD_LEFT = "left"
+INTEGRATION_METHOD_TRAPEZOIDAL = "trapezoidal"
+
+CONF_COST_BASIS = "cost_basis"
+COST_BASIS_AVERAGE = "average"
+COST_BASIS_FIFO = "fifo"
+COST_BASIS_LIFO = "lifo"
+
+CONF_INTEGRATE_ENERGY = "integrate_energy"
+CONF_CHARGE_EFFICIENCY = "charge_efficiency"
+CONF_DISCHARGE_EFFICIENCY = "discharge_efficiency"
+CONF_SELF_DISCHARGE = "self_discharge"
+
+CONF_UPDATE_MODE = "update_mode"
+UPDATE_MODE_EVENT = "event"
+UPDATE_MODE_INTERVAL = "interval"
+UPDATE_MODE_BOTH = "both"
+
+CONF_UPDATE_INTERVAL = "update_interval"
+CONF_COALESCE_WINDOW = "coalesce_window"
+CONF_REORDER_WINDOW = "reorder_window"
+CONF_MIN_WRITE_INTERVAL = "min_write_interval"
+CONF_WRITE_THRESHOLD = "write_threshold"
+CONF_CONSUMERS = "consumers"
+CONF_PRICE_FORECAST = "price_forecast"
+CONF_SOLAR_FORECAST = "solar_forecast"
+CONF_DEBUG_SENSORS = "debug_sensors"
 
 DEFAULT_NAME = "Weighted Energy Cost"
+DEFAULT_INTEGRATION_METHOD = INTEGRATION_METHOD_RIGHT
+DEFAULT_COST_BASIS = COST_BASIS_AVERAGE
+DEFAULT_CHARGE_EFFICIENCY = 100  # %
+DEFAULT_DISCHARGE_EFFICIENCY = 100  # %
+DEFAULT_SELF_DISCHARGE = 0.0  # % per day
+DEFAULT_UPDATE_MODE = UPDATE_MODE_EVENT
+DEFAULT_UPDATE_INTERVAL = 60  # s
+DEFAULT_COALESCE_WINDOW = 0  # ms, 0 = once per event loop iteration
+DEFAULT_REORDER_WINDOW = 0  # ms, 0 = no wait for late state changes
+DEFAULT_MIN_WRITE_INTERVAL = 0  # s
+DEFAULT_WRITE_THRESHOLD = 0.0  # €/kWh
+DEFAULT_SOLAR_CO2_INTENSITY = 0.0  # g/kWh
+
+SERVICE_RECOMPUTE = "recompute"
+ATTR_CONFIG_ENTRY_ID = "config_entry_id"
+ATTR_START = "start"
+ATTR_INITIAL_BATTERY_COST = "initial_battery_cost"
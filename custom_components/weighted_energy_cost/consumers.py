@@ -0,0 +1,63 @@
+"""Cost of individual consumers supplied at the weighted energy cost.
+
+A hub sensor keeps one battery cost basis for the grid, solar and battery
+sources and prices the loads of any number of sub-circuits from the same
+calculation step. Like the engine, this module does not import Home
+Assistant.
+"""
+
+from __future__ import annotations
+
+from collections.abc import Iterable
+from dataclasses import dataclass
+
+from .const import INTEGRATION_METHOD_RIGHT
+from .engine import INTEGRATION_WEIGHTS
+from .inputs import EntitySource, entity_index
+
+
+@dataclass(slots=True)
+class ConsumerState:
+    """Power and accumulated cost of one consumer."""
+
+    total_cost: float = 0.0
+    energy_kwh: float = 0.0
+    power_kw: float = 0.0
+    cost_rate: float = 0.0
+
+
+class ConsumerMeters:
+    """Price the loads of many consumers in one pass."""
+
+    def __init__(
+        self, entity_ids: Iterable[str], method: str = INTEGRATION_METHOD_RIGHT
+    ) -> None:
+        """Initialize the meters for the given load entities."""
+        self.sources = [EntitySource(entity_id, True) for entity_id in entity_ids]
+        self.index = entity_index(self.sources)
+        self.states = {source.entity_id: ConsumerState() for source in self.sources}
+        self.method = method
+        self._started = False
+
+    def step(self, now: float, dt: float, price: float, previous_price: float) -> None:
+        """Accumulate the cost of every consumer over ``dt`` hours up to ``now``.
+
+        ``price`` is the weighted cost at the end of the interval and
+        ``previous_price`` the one at its start, integrated like the battery
+        flows of the engine.
+        """
+        w_prev, w_cur = INTEGRATION_WEIGHTS[self.method]
+        states = self.states
+        started = self._started
+        self._started = True
+        for source in self.sources:
+            state = states[source.entity_id]
+            power_kw, counter = source.read(now)
+            # A counter-derived rate is the average over the whole interval
+            prev_kw = state.power_kw if started and not counter else power_kw
+            state.energy_kwh += (w_prev * prev_kw + w_cur * power_kw) * dt
+            state.total_cost += (
+                w_prev * prev_kw * previous_price + w_cur * power_kw * price
+            ) * dt
+            state.power_kw = power_kw
+            state.cost_rate = power_kw * price
@@ -0,0 +1,137 @@
+"""Power derived from the readings of an energy counter.
+
+Energy meters often report only every few minutes, or only when the count
+has moved. The rate is therefore taken over a sliding window of the
+counter's own readings rather than over the interval since the last
+calculation step. Like the engine, this module does not import Home
+Assistant.
+"""
+
+from __future__ import annotations
+
+from collections.abc import Mapping
+from typing import Any
+
+# Readings further back than this (in seconds) do not affect the rate, and
+# a counter without a reading for this long is considered idle.
+COUNTER_WINDOW = 900.0
+
+# Number of readings kept per counter
+COUNTER_SAMPLES = 16
+
+# A reading below this fraction of the previous one is a reset of the
+# counter, as in Home Assistant's statistics; smaller dips are jitter
+RESET_RATIO = 0.9
+
+
+class CounterRate:
+    """Average rate of a total_increasing energy counter in kW.
+
+    Readings are kept in a fixed-size ring buffer. A reading that drops
+    below ``RESET_RATIO`` of the previous one is a reset of the counter,
+    after which it counts up from zero again; a smaller dip counts as no
+    change until the counter is back above the previous reading.
+    """
+
+    __slots__ = (
+        "window",
+        "resets",
+        "_times",
+        "_totals",
+        "_head",
+        "_size",
+        "_offset",
+        "_last",
+    )
+
+    def __init__(
+        self, window: float = COUNTER_WINDOW, samples: int = COUNTER_SAMPLES
+    ) -> None:
+        """Initialize an empty tracker."""
+        self.window = window
+        # Resets seen since the tracker was created, for diagnostics
+        self.resets = 0
+        self._times = [0.0] * samples
+        self._totals = [0.0] * samples
+        self._head = 0
+        self._size = 0
+        self._offset = 0.0
+        self._last: float | None = None
+
+    def add(self, timestamp: float, value: float) -> None:
+        """Record a reading in kWh taken at ``timestamp`` (seconds)."""
+        last = self._last
+        if last is not None and value < last:
+            if value < last * RESET_RATIO:
+                # The counter was reset; keep the energy counted before
+                self._offset += last
+                self.resets += 1
+            else:
+                value = last
+        self._last = value
+        total = self._offset + value
+
+        if self._size and timestamp <= self._times[self._head]:
+            # Several readings at the same time count as one
+            self._totals[self._head] = total
+            return
+
+        self._head = (self._head + 1) % len(self._times)
+        self._times[self._head] = timestamp
+        self._totals[self._head] = total
+        self._size = min(self._size + 1, len(self._times))
+
+    def rate(self, now: float) -> float:
+        """Return the average power over the window up to the last reading.
+
+        Once the counter has been idle for longer than the window, the
+        energy is spread up to ``now`` instead, so the rate falls off
+        towards zero.
+        """
+        if self._size < 2:
+            return 0.0
+
+        times = self._times
+        head = self._head
+        start = times[head] - self.window
+
+        # The newest reading at or before the window start, or the oldest
+        samples = len(times)
+        ref = head
+        for k in range(1, self._size):
+            ref = (head - k) % samples
+            if times[ref] <= start:
+                break
+
+        end = times[head]
+        if now - end > self.window:
+            end = now
+        elapsed = end - times[ref]
+        if elapsed <= 0:
+            return 0.0
+        return (self._totals[head] - self._totals[ref]) * 3600.0 / elapsed
+
+    def as_dict(self, shift: float = 0.0) -> dict[str, Any]:
+        """Return the readings, oldest first, with ``shift`` added to times."""
+        samples = len(self._times)
+        order = [(self._head - k) % samples for k in range(self._size - 1, -1, -1)]
+        return {
+            "window": self.window,
+            "samples": samples,
+            "times": [self._times[i] + shift for i in order],
+            "totals": [self._totals[i] for i in order],
+            "offset": self._offset,
+            "last": self._last,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Mapping[str, Any], shift: float = 0.0) -> CounterRate:
+        """Rebuild a tracker from ``as_dict``, adding ``shift`` to times."""
+        rate = cls(float(data["window"]), int(data["samples"]))
+        # Stored totals already include earlier resets and never decrease
+        for timestamp, total in zip(data["times"], data["totals"]):
+            rate.add(float(timestamp) + shift, float(total))
+        rate._offset = float(data["offset"])
+        last = data["last"]
+        rate._last = None if last is None else float(last)
+        return rate
@@ -0,0 +1,20 @@
+"""Diagnostics support for the Weighted Energy Cost Sensor."""
+
+from __future__ import annotations
+
+from typing import Any
+
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant
+
+from .const import DOMAIN
+
+
+async def async_get_config_entry_diagnostics(
+    hass: HomeAssistant, entry: ConfigEntry
+) -> dict[str, Any]:
+    """Return the configuration, calculation state and runtime statistics."""
+    diagnostics: dict[str, Any] = {"config": {**entry.data, **entry.options}}
+    if (sensor := hass.data.get(DOMAIN, {}).get(entry.entry_id)) is not None:
+        diagnostics.update(sensor.diagnostics())
+    return diagnostics
@@ -0,0 +1,482 @@
+"""Calculation engine for the Weighted Energy Cost Sensor.
+
+This module holds the cost math without any Home Assistant dependency so the
+exact production calculation can be driven by the sensor, by replays of
+recorder history and by benchmarks alike. Besides the price, every source
+carries a small vector of per-kWh metrics, which the same step weights with
+the same power split.
+"""
+
+from __future__ import annotations
+
+from collections.abc import Mapping
+from dataclasses import dataclass, field
+from typing import Any, NamedTuple
+
+from .const import (
+    CONF_CHARGE_EFFICIENCY,
+    CONF_COST_BASIS,
+    CONF_DISCHARGE_EFFICIENCY,
+    CONF_INTEGRATE_ENERGY,
+    CONF_SELF_DISCHARGE,
+    DEFAULT_CHARGE_EFFICIENCY,
+    DEFAULT_COST_BASIS,
+    DEFAULT_DISCHARGE_EFFICIENCY,
+    DEFAULT_SELF_DISCHARGE,
+    INTEGRATION_METHOD_LEFT,
+    INTEGRATION_METHOD_RIGHT,
+    INTEGRATION_METHOD_TRAPEZOIDAL,
+)
+from .lots import BatteryLots, create_lots
+
+# Updates closer together than this (in hours, ~0.36 seconds) are skipped and
+# folded into the next interval.
+MIN_DT_HOURS = 0.0001
+
+# Below these thresholds a flow or a stored energy is treated as zero.
+MIN_SUPPLY_KW = 0.001
+MIN_BATTERY_KWH = 0.01
+
+# Weights of the (previous, current) sample for each integration method
+INTEGRATION_WEIGHTS = {
+    INTEGRATION_METHOD_RIGHT: (0.0, 1.0),
+    INTEGRATION_METHOD_LEFT: (1.0, 0.0),
+    INTEGRATION_METHOD_TRAPEZOIDAL: (0.5, 0.5),
+}
+
+
+class StepInputs(NamedTuple):
+    """Normalized inputs for one calculation step.
+
+    ``solar_kw`` is the solar production including any part of it that is
+    exported, ``export_kw`` the power fed into the grid. ``grid_co2`` and
+    ``solar_co2`` are the carbon intensities of the sources in g/kWh.
+    """
+
+    grid_kw: float
+    grid_price: float
+    solar_kw: float
+    solar_price: float
+    battery_kw: float
+    battery_kwh: float
+    export_kw: float = 0.0
+    feed_in_price: float = 0.0
+    grid_co2: float = 0.0
+    solar_co2: float = 0.0
+
+
+class Metrics(NamedTuple):
+    """Per-kWh metrics of energy, weighted in the same step as the price.
+
+    ``co2`` is the carbon intensity in g/kWh, ``solar`` the share of the
+    energy produced by the solar panels, directly or through the battery,
+    and ``self_sufficiency`` the share not drawn from the grid.
+    """
+
+    co2: float
+    solar: float
+    self_sufficiency: float
+
+
+@dataclass(slots=True)
+class EnergyTotals:
+    """Energy and cost accumulated over all calculation steps.
+
+    ``cost`` is the cost of the energy used by the home: grid and solar
+    energy at their prices, with the cost of energy stored in the battery
+    deferred until it is discharged.
+    """
+
+    cost: float = 0.0
+    grid_kwh: float = 0.0
+    solar_kwh: float = 0.0
+    battery_kwh: float = 0.0
+    battery_cost_in: float = 0.0
+    battery_cost_out: float = 0.0
+    export_kwh: float = 0.0
+    export_revenue: float = 0.0
+
+
+@dataclass(slots=True)
+class StateOfEnergy:
+    """Stored battery energy integrated from the battery power.
+
+    Charging stores the charged energy times ``charge_efficiency`` and
+    discharging draws the delivered energy divided by
+    ``discharge_efficiency``. ``self_discharge`` is the fraction of the
+    stored energy lost per hour. A reading of the battery energy sensor
+    replaces the estimate in the step after it was reported.
+    """
+
+    charge_efficiency: float = 1.0
+    discharge_efficiency: float = 1.0
+    self_discharge: float = 0.0
+    stored_kwh: float | None = None
+    reading: float | None = None
+    reported_at: float | None = None
+
+    def report(self, kwh: float, timestamp: float) -> None:
+        """Take a reading of the sensor if it was reported at a new time."""
+        if timestamp != self.reported_at:
+            self.reported_at = timestamp
+            self.reading = kwh
+
+    def advance(
+        self,
+        charged_kwh: float,
+        delivered_kwh: float,
+        dt: float,
+        now: float | None = None,
+    ) -> float:
+        """Integrate the battery flows over ``dt`` hours up to ``now``.
+
+        A pending reading replaces the estimate at the time it was reported,
+        and only the part of the flows after that time is added to it; the
+        flows are taken as steady over the interval.
+        """
+        net_kwh = (
+            charged_kwh * self.charge_efficiency
+            - delivered_kwh / self.discharge_efficiency
+        )
+        after = 1.0
+        if self.reading is not None:
+            stored = self.reading
+            self.reading = None
+            if now is None or self.reported_at is None:
+                after = 0.0
+            else:
+                after = min(max((now - self.reported_at) / 3600.0 / dt, 0.0), 1.0)
+        else:
+            stored = self.stored_kwh or 0.0
+        if self.self_discharge:
+            stored *= (1.0 - self.self_discharge) ** (dt * after)
+        stored += net_kwh * after
+        self.stored_kwh = stored if stored > 0 else 0.0
+        return self.stored_kwh
+
+
+@dataclass(slots=True)
+class BatteryMetrics:
+    """The metrics of the energy stored in the battery.
+
+    Like the cost of the average pool, charging adds the CO2 emitted for
+    the energy it takes and the solar part of that energy, and discharging
+    removes both in proportion to the stored energy drawn. ``charged_kwh``
+    is the charged energy still attributed to the battery, against which the
+    solar share is measured.
+    """
+
+    co2: float = 0.0
+    solar_kwh: float = 0.0
+    charged_kwh: float = 0.0
+
+    def per_kwh(self, battery_kwh: float, draw: float = 1.0) -> Metrics:
+        """Return the metrics per kWh discharged.
+
+        ``draw`` is the stored energy drawn per kWh delivered.
+        """
+        return Metrics(
+            self.co2 / battery_kwh * draw if battery_kwh > MIN_BATTERY_KWH else 0.0,
+            (
+                min(self.solar_kwh / self.charged_kwh, 1.0)
+                if self.charged_kwh > MIN_BATTERY_KWH
+                else 0.0
+            ),
+            1.0,
+        )
+
+    def remove(self, fraction: float) -> None:
+        """Remove a fraction of the stored energy's metrics."""
+        keep = 1.0 - fraction if fraction < 1.0 else 0.0
+        self.co2 *= keep
+        self.solar_kwh *= keep
+        self.charged_kwh *= keep
+
+
+@dataclass(slots=True)
+class EngineState:
+    """Mutable state carried between calculation steps.
+
+    With ``lots`` the battery cost basis is layered (FIFO or LIFO) instead
+    of one average pool, and ``total_battery_cost`` is the cost of the lots.
+    With ``soe`` the stored energy is integrated instead of taken from the
+    inputs on every step. ``metrics`` is the battery basis of the metrics
+    other than the price, always kept as an average pool.
+    """
+
+    total_battery_cost: float = 0.0
+    last_update: float | None = None
+    last_inputs: StepInputs | None = None
+    totals: EnergyTotals = field(default_factory=EnergyTotals)
+    lots: BatteryLots | None = None
+    soe: StateOfEnergy | None = None
+    metrics: BatteryMetrics = field(default_factory=BatteryMetrics)
+
+
+class StepResult(NamedTuple):
+    """Outputs of one calculation step.
+
+    ``weighted_cost`` is ``None`` when nothing supplies the home and no grid
+    price is available, in which case the previous value should be kept.
+    ``metrics`` are the weighted metrics of the energy used by the home,
+    ``None`` when nothing supplies it, and ``battery_metrics`` those of the
+    energy stored in the battery.
+    """
+
+    weighted_cost: float | None
+    battery_unit_price: float
+    total_battery_cost: float
+    battery_kwh: float
+    metrics: Metrics | None = None
+    battery_metrics: Metrics | None = None
+
+
+def create_state(
+    config: Mapping[str, Any], total_battery_cost: float = 0.0
+) -> EngineState:
+    """Return a fresh engine state for the sensor's configuration."""
+    soe = None
+    if config.get(CONF_INTEGRATE_ENERGY):
+        # Self-discharge is configured in % per day
+        per_day = float(config.get(CONF_SELF_DISCHARGE, DEFAULT_SELF_DISCHARGE))
+        soe = StateOfEnergy(
+            charge_efficiency=float(
+                config.get(CONF_CHARGE_EFFICIENCY, DEFAULT_CHARGE_EFFICIENCY)
+            )
+            / 100.0,
+            discharge_efficiency=float(
+                config.get(CONF_DISCHARGE_EFFICIENCY, DEFAULT_DISCHARGE_EFFICIENCY)
+            )
+            / 100.0,
+            self_discharge=1.0 - (1.0 - min(per_day, 100.0) / 100.0) ** (1.0 / 24.0),
+        )
+    return EngineState(
+        total_battery_cost=total_battery_cost,
+        lots=create_lots(config.get(CONF_COST_BASIS, DEFAULT_COST_BASIS)),
+        soe=soe,
+    )
+
+
+def advance(state: EngineState, timestamp: float) -> float | None:
+    """Move the clock to ``timestamp`` (seconds) and return the elapsed hours.
+
+    Returns ``None`` if this is the first timestamp seen or if the interval is
+    too short to be worth a step; the clock is not moved in the latter case.
+    """
+    if state.last_update is None:
+        state.last_update = timestamp
+        return None
+
+    dt = (timestamp - state.last_update) / 3600.0
+    if dt < MIN_DT_HOURS:
+        return None
+
+    state.last_update = timestamp
+    return dt
+
+
+def solar_unit_cost(inputs: StepInputs) -> float:
+    """Return the price of solar energy used on site in €/kWh.
+
+    Solar energy used on site could have been exported instead, so it costs
+    at least the feed-in price it would have earned.
+    """
+    return max(inputs.solar_price, inputs.feed_in_price)
+
+
+def solar_used_kw(inputs: StepInputs) -> float:
+    """Return the solar power that is not exported."""
+    used = inputs.solar_kw - inputs.export_kw
+    return used if used > 0 else 0.0
+
+
+def source_cost_rate(inputs: StepInputs) -> float:
+    """Return the cost rate (€/h) of the grid and solar energy used on site."""
+    return inputs.grid_kw * inputs.grid_price + solar_used_kw(inputs) * solar_unit_cost(
+        inputs
+    )
+
+
+def charge_split(inputs: StepInputs) -> tuple[float, float]:
+    """Return the solar and the grid power charging the battery.
+
+    The battery charges from solar first and from the grid for the rest.
+    """
+    if inputs.battery_kw >= 0:
+        return 0.0, 0.0
+    solar_used = solar_used_kw(inputs)
+    if inputs.grid_kw + solar_used <= MIN_SUPPLY_KW:
+        return 0.0, 0.0
+    charge_kw = -inputs.battery_kw
+    solar_kw = min(charge_kw, solar_used)
+    return solar_kw, charge_kw - solar_kw
+
+
+def charge_cost_rate(inputs: StepInputs) -> float:
+    """Return the rate (€/h) at which charging adds cost to the battery."""
+    solar_kw, grid_kw = charge_split(inputs)
+    return solar_kw * solar_unit_cost(inputs) + grid_kw * inputs.grid_price
+
+
+def step(
+    state: EngineState,
+    inputs: StepInputs,
+    dt: float,
+    method: str = INTEGRATION_METHOD_RIGHT,
+) -> StepResult:
+    """Run one calculation step over ``dt`` hours.
+
+    Battery flows over the interval are integrated from the previous and the
+    current sample with the weights of ``method``; the default right Riemann
+    sum uses only the current sample.
+    """
+    grid_kw, grid_price, _, _, bat_pow_kw, bat_energy_kwh, export_kw, _ = inputs[:8]
+    previous = state.last_inputs if state.last_inputs is not None else inputs
+    state.last_inputs = inputs
+    w_prev, w_cur = INTEGRATION_WEIGHTS[method]
+
+    # Battery flows over the interval
+    charge_kw = -bat_pow_kw if bat_pow_kw < 0 else 0.0
+    prev_charge_kw = -previous.battery_kw if previous.battery_kw < 0 else 0.0
+    charged_kwh = (w_prev * prev_charge_kw + w_cur * charge_kw) * dt
+    bat_discharge_kw = bat_pow_kw if bat_pow_kw > 0 else 0.0
+    prev_discharge_kw = previous.battery_kw if previous.battery_kw > 0 else 0.0
+    energy_removed = (w_prev * prev_discharge_kw + w_cur * bat_discharge_kw) * dt
+
+    # Stored energy drawn per kWh delivered
+    draw = 1.0
+    soe = state.soe
+    if soe is not None:
+        bat_energy_kwh = soe.advance(charged_kwh, energy_removed, dt, state.last_update)
+        draw = 1.0 / soe.discharge_efficiency
+
+    lots = state.lots
+    if lots is not None and not lots and state.total_battery_cost:
+        # A cost basis set from outside becomes the first lot
+        lots.add(bat_energy_kwh, state.total_battery_cost)
+        state.total_battery_cost = lots.cost
+    cost_before = state.total_battery_cost
+
+    # 1. Charging adds the cost of the solar and grid energy it takes, and
+    # its CO2 and solar share
+    metrics = state.metrics
+    if bat_pow_kw < 0 or previous.battery_kw < 0:
+        prev_solar_kw, prev_grid_kw = charge_split(previous) if w_prev else (0.0, 0.0)
+        cur_solar_kw, cur_grid_kw = charge_split(inputs)
+        added = (
+            w_prev
+            * (
+                prev_solar_kw * solar_unit_cost(previous)
+                + prev_grid_kw * previous.grid_price
+            )
+            + w_cur
+            * (cur_solar_kw * solar_unit_cost(inputs) + cur_grid_kw * grid_price)
+        ) * dt
+        state.total_battery_cost += added
+        if lots is not None:
+            lots.add(charged_kwh, added)
+            state.total_battery_cost = lots.cost
+        metrics.co2 += (
+            w_prev
+            * (prev_solar_kw * previous.solar_co2 + prev_grid_kw * previous.grid_co2)
+            + w_cur * (cur_solar_kw * inputs.solar_co2 + cur_grid_kw * inputs.grid_co2)
+        ) * dt
+        metrics.solar_kwh += (w_prev * prev_solar_kw + w_cur * cur_solar_kw) * dt
+        metrics.charged_kwh += (
+            w_prev * (prev_solar_kw + prev_grid_kw)
+            + w_cur * (cur_solar_kw + cur_grid_kw)
+        ) * dt
+
+    cost_charged = state.total_battery_cost
+
+    # 2. Determine current battery price: the average of the pool, or the
+    # next lot's price per kWh still stored after conversion losses
+    battery_price = 0.0
+    if bat_energy_kwh > MIN_BATTERY_KWH:
+        if lots is None:
+            battery_price = state.total_battery_cost / bat_energy_kwh * draw
+        else:
+            battery_price = lots.unit_price() * lots.energy / bat_energy_kwh * draw
+    battery_metrics = metrics.per_kwh(bat_energy_kwh, draw)
+
+    # 3. Discharging removes cost proportionally, or from the lots in order
+    if energy_removed > 0 and lots is not None:
+        if bat_energy_kwh > MIN_BATTERY_KWH:
+            # The energy discharged may span several lots
+            battery_price = (
+                lots.remove(energy_removed * draw / bat_energy_kwh) / energy_removed
+            )
+            state.total_battery_cost = lots.cost
+    elif energy_removed > 0:
+        state.total_battery_cost -= energy_removed * battery_price
+        if state.total_battery_cost < 0:
+            state.total_battery_cost = 0.0
+    if energy_removed > 0 and bat_energy_kwh > MIN_BATTERY_KWH:
+        metrics.remove(energy_removed * draw / bat_energy_kwh)
+
+    # Accumulate energy per source and the cost of the energy used
+    solar_kw = solar_used_kw(inputs)
+    solar_price = solar_unit_cost(inputs)
+    grid_kwh = (w_prev * previous.grid_kw + w_cur * grid_kw) * dt
+    solar_kwh = (w_prev * solar_used_kw(previous) + w_cur * solar_kw) * dt
+    cost_in = cost_charged - cost_before
+    cost_out = cost_charged - state.total_battery_cost
+    totals = state.totals
+    totals.grid_kwh += max(grid_kwh, 0.0)
+    totals.solar_kwh += max(solar_kwh, 0.0)
+    totals.battery_kwh += energy_removed
+    totals.battery_cost_in += cost_in
+    totals.battery_cost_out += cost_out
+    totals.cost += (
+        (w_prev * source_cost_rate(previous) + w_cur * source_cost_rate(inputs)) * dt
+        - cost_in
+        + cost_out
+    )
+    totals.export_kwh += (w_prev * previous.export_kw + w_cur * export_kw) * dt
+    totals.export_revenue += (
+        w_prev * previous.export_kw * previous.feed_in_price
+        + w_cur * export_kw * inputs.feed_in_price
+    ) * dt
+
+    # 4. Cost of the energy used by the home: what the battery takes is
+    # paid for when it is discharged, and exported energy is not used
+    solar_charge_kw = min(charge_kw, solar_kw)
+    home_grid_kw = max(grid_kw - (charge_kw - solar_charge_kw), 0.0)
+    home_solar_kw = solar_kw - solar_charge_kw
+    # Export beyond the solar production comes from the battery
+    home_battery_kw = max(bat_discharge_kw - max(export_kw - inputs.solar_kw, 0.0), 0.0)
+    total_supply_kw = home_grid_kw + home_solar_kw + home_battery_kw
+
+    weighted_metrics = None
+    if total_supply_kw > MIN_SUPPLY_KW:
+        weighted_cost = (
+            home_grid_kw * grid_price
+            + home_solar_kw * solar_price
+            + home_battery_kw * battery_price
+        ) / total_supply_kw
+        # The same split weights the metrics; only grid energy counts
+        # against the self-sufficiency
+        weighted_metrics = Metrics(
+            (
+                home_grid_kw * inputs.grid_co2
+                + home_solar_kw * inputs.solar_co2
+                + home_battery_kw * battery_metrics.co2
+            )
+            / total_supply_kw,
+            (home_solar_kw + home_battery_kw * battery_metrics.solar) / total_supply_kw,
+            (home_solar_kw + home_battery_kw) / total_supply_kw,
+        )
+    elif grid_price > 0:
+        # If no supply, default to grid price if available
+        weighted_cost = grid_price
+    else:
+        weighted_cost = None
+
+    return StepResult(
+        weighted_cost,
+        battery_price,
+        state.total_battery_cost,
+        bat_energy_kwh,
+        weighted_metrics,
+        battery_metrics,
+    )
@@ -0,0 +1,213 @@
+"""Parallel replay of the data of many sites.
+
+A fleet directory holds one subdirectory per site, with the site's sensor
+configuration in ``config.json`` next to its data in any form the offline
+replay reads: a directory of ``.npy`` columns, which the workers
+memory-map instead of copying, a CSV or Parquet file or a copy of the
+recorder database. The sites are replayed in a process pool, one site per
+task, and their results are merged into one report. Like the engine, this
+module does not import Home Assistant.
+"""
+
+from __future__ import annotations
+
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from collections.abc import Iterable, Sequence
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import asdict, dataclass, fields
+from pathlib import Path
+from typing import Any, NamedTuple, TextIO
+from zoneinfo import ZoneInfo
+
+from .engine import EnergyTotals
+from .offline import STATISTICS_TABLES, load_config, parse_time, replay_file
+
+CONFIG_FILE = "config.json"
+
+# Suffixes of the data files of a site
+DATA_SUFFIXES = (".csv", ".parquet", ".db", ".sqlite", ".sqlite3")
+
+REPORT_COLUMNS = (
+    "site",
+    "rows",
+    "steps",
+    "weighted_cost",
+    "total_battery_cost",
+    *(field.name for field in fields(EnergyTotals)),
+    "elapsed_s",
+    "error",
+)
+
+
+class Site(NamedTuple):
+    """The configuration and data of one site."""
+
+    name: str
+    config: Path
+    data: Path | None
+
+
+@dataclass(frozen=True, slots=True)
+class FleetOptions:
+    """Settings shared by the replays of all sites."""
+
+    statistics: str | None = None
+    start: float | None = None
+    end: float | None = None
+    time_zone: str = "UTC"
+    series: Path | None = None
+
+
+def discover_sites(root: str | Path) -> list[Site]:
+    """Return the sites below ``root``, ordered by name.
+
+    A site's data is a subdirectory holding ``timestamp.npy`` or its only
+    data file; sites without data are returned with ``data`` None.
+    """
+    sites = []
+    for directory in sorted(Path(root).iterdir()):
+        config = directory / CONFIG_FILE
+        if not config.is_file():
+            continue
+        data = [
+            path
+            for path in sorted(directory.iterdir())
+            if (path / "timestamp.npy").is_file()
+            or (path.is_file() and path.suffix.lower() in DATA_SUFFIXES)
+        ]
+        sites.append(Site(directory.name, config, data[0] if len(data) == 1 else None))
+    return sites
+
+
+def replay_site(site: Site, options: FleetOptions) -> dict[str, Any]:
+    """Replay one site and return its row of the report.
+
+    Errors are reported in the row rather than raised, so one broken site
+    does not stop the fleet.
+    """
+    started = time.perf_counter()
+    row: dict[str, Any] = {"site": site.name}
+    if site.data is None:
+        return {**row, "error": "no data, or more than one data file"}
+    output: TextIO | None = None
+    try:
+        config = load_config(site.config)
+        if options.series is not None:
+            output = open(
+                options.series / f"{site.name}.csv", "w", encoding="utf-8", newline=""
+            )
+        summary = replay_file(
+            config,
+            site.data,
+            output,
+            statistics=options.statistics,
+            start=options.start,
+            end=options.end,
+            time_zone=ZoneInfo(options.time_zone),
+        )
+    except Exception as err:
+        # Anything a malformed configuration or data file raises
+        return {**row, "error": f"{type(err).__name__}: {err}"}
+    finally:
+        if output is not None:
+            output.close()
+    return {
+        **row,
+        "rows": summary.rows,
+        "steps": summary.steps,
+        "weighted_cost": summary.weighted_cost,
+        "total_battery_cost": summary.engine.total_battery_cost,
+        **asdict(summary.engine.totals),
+        "elapsed_s": round(time.perf_counter() - started, 3),
+    }
+
+
+def run_fleet(
+    sites: Iterable[Site],
+    options: FleetOptions = FleetOptions(),
+    workers: int | None = None,
+) -> list[dict[str, Any]]:
+    """Replay the sites in parallel and return the report rows by site.
+
+    ``workers`` defaults to the number of cores; with one worker the sites
+    are replayed in this process.
+    """
+    sites = list(sites)
+    workers = min(workers or os.cpu_count() or 1, max(len(sites), 1))
+    if workers == 1:
+        rows = [replay_site(site, options) for site in sites]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(replay_site, site, options) for site in sites]
+            rows = [future.result() for future in as_completed(futures)]
+    return sorted(rows, key=lambda row: row["site"])
+
+
+def write_report(rows: Iterable[dict[str, Any]], output: TextIO) -> None:
+    """Write the report rows as CSV."""
+    writer = csv.DictWriter(output, REPORT_COLUMNS)
+    writer.writeheader()
+    writer.writerows(rows)
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    """Run the command line tool."""
+    parser = argparse.ArgumentParser(
+        description="Replay the data of many sites in parallel."
+    )
+    parser.add_argument("fleet", help="directory with one subdirectory per site")
+    parser.add_argument("-o", "--output", help="CSV file for the merged report")
+    parser.add_argument("--series", help="directory for the cost series per site")
+    parser.add_argument("-j", "--workers", type=int, help="processes (default: cores)")
+    parser.add_argument(
+        "--statistics",
+        choices=tuple(STATISTICS_TABLES),
+        help="replay the recorder's statistics instead of its states",
+    )
+    parser.add_argument("--start", help="replay from this time on (ISO 8601)")
+    parser.add_argument("--end", help="replay up to this time (ISO 8601)")
+    parser.add_argument(
+        "--time-zone", default="UTC", help="time zone of tariff schedules"
+    )
+    args = parser.parse_args(argv)
+
+    series = Path(args.series) if args.series else None
+    if series is not None:
+        series.mkdir(parents=True, exist_ok=True)
+    options = FleetOptions(
+        statistics=args.statistics,
+        start=parse_time(args.start) if args.start else None,
+        end=parse_time(args.end) if args.end else None,
+        time_zone=args.time_zone,
+        series=series,
+    )
+    started = time.perf_counter()
+    rows = run_fleet(discover_sites(args.fleet), options, args.workers)
+    elapsed = time.perf_counter() - started
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8", newline="") as file:
+            write_report(rows, file)
+    else:
+        write_report(rows, sys.stdout)
+    total_rows = sum(row.get("rows") or 0 for row in rows)
+    failed = [row["site"] for row in rows if row.get("error")]
+    print(
+        json.dumps(
+            {
+                "sites": len(rows),
+                "failed": failed,
+                "rows": total_rows,
+                "elapsed_s": round(elapsed, 3),
+                "rows_per_second": round(total_rows / elapsed) if elapsed else 0,
+            },
+            indent=2,
+        ),
+        file=sys.stderr,
+    )
+    return 1 if failed else 0
@@ -0,0 +1,236 @@
+"""Projection of the weighted cost over tariff and solar forecasts.
+
+Dynamic tariff integrations publish the prices of the coming hours as
+attribute arrays, and solar forecast integrations the expected production.
+The projection assumes the current load continues, lets solar cover it
+first, charges the battery with any surplus and discharges it for the rest
+until it runs empty. The resulting flows are run through the batch engine,
+so all slots are evaluated with NumPy instead of one step at a time. Like
+the engine, this module does not import Home Assistant.
+"""
+
+from __future__ import annotations
+
+from collections.abc import Mapping
+from datetime import datetime, timedelta
+from typing import Any, NamedTuple
+
+import numpy as np
+
+from .batch import run_batch
+from .engine import MIN_DT_HOURS, EngineState
+
+# Attributes holding lists of slots with a start time and a value, as
+# published by Nord Pool, Tibber, EPEX Spot, Solcast and similar integrations
+SERIES_ATTRIBUTES = (
+    "raw_today",
+    "raw_tomorrow",
+    "prices",
+    "data",
+    "forecast",
+    "detailedForecast",
+)
+START_KEYS = ("start", "start_time", "startsAt", "period_start", "datetime")
+END_KEYS = ("end", "end_time", "endsAt", "period_end")
+VALUE_KEYS = ("value", "price", "total", "price_per_kwh", "pv_estimate")
+
+# Attributes holding one value per equal slot of the day (Nord Pool)
+DAY_ATTRIBUTES = ("today", "tomorrow")
+
+# Attribute mapping times to a power in W (Forecast.Solar, Open-Meteo)
+WATTS_ATTRIBUTE = "watts"
+
+
+class Forecast(NamedTuple):
+    """Slots of a forecast as timestamps in seconds and their values."""
+
+    start: np.ndarray
+    end: np.ndarray
+    value: np.ndarray
+
+
+class Projection(NamedTuple):
+    """Expected weighted cost and battery state for each forecast slot."""
+
+    start: np.ndarray
+    end: np.ndarray
+    weighted_cost: np.ndarray
+    battery_unit_price: np.ndarray
+    battery_kwh: np.ndarray
+
+
+def _timestamp(value: Any) -> float | None:
+    """Return a time given as datetime, ISO string or epoch in seconds."""
+    if isinstance(value, datetime):
+        return value.timestamp()
+    if isinstance(value, str):
+        try:
+            return datetime.fromisoformat(value).timestamp()
+        except ValueError:
+            return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    return None
+
+
+def _first(item: Mapping[str, Any], keys: tuple[str, ...]) -> Any:
+    """Return the value of the first of ``keys`` present in ``item``."""
+    for key in keys:
+        if (value := item.get(key)) is not None:
+            return value
+    return None
+
+
+def parse_forecast(
+    attributes: Mapping[str, Any], today_start: datetime | None = None
+) -> Forecast:
+    """Collect the forecast slots from a state's attributes.
+
+    Lists of slots with a start (and optionally end) time are read from the
+    known attributes, and arrays of equal slots per day from ``today`` and
+    ``tomorrow`` if the local ``today_start`` is given. A ``watts`` mapping
+    is converted to kW. Slots without an end last until the next one.
+    """
+    starts: list[float] = []
+    ends: list[float] = []
+    values: list[float] = []
+
+    for attribute in SERIES_ATTRIBUTES:
+        items = attributes.get(attribute)
+        if not isinstance(items, (list, tuple)):
+            continue
+        for item in items:
+            if not isinstance(item, Mapping):
+                continue
+            start = _timestamp(_first(item, START_KEYS))
+            value = _first(item, VALUE_KEYS)
+            if start is None or not isinstance(value, (int, float)):
+                continue
+            end = _timestamp(_first(item, END_KEYS))
+            starts.append(start)
+            ends.append(np.nan if end is None else end)
+            values.append(float(value))
+
+    if not starts and today_start is not None:
+        for day, attribute in enumerate(DAY_ATTRIBUTES):
+            items = attributes.get(attribute)
+            if not isinstance(items, (list, tuple)) or not items:
+                continue
+            # Days with a DST change have 23 or 25 hours
+            day_start = (today_start + timedelta(days=day)).timestamp()
+            day_end = (today_start + timedelta(days=day + 1)).timestamp()
+            length = (day_end - day_start) / len(items)
+            for i, value in enumerate(items):
+                if isinstance(value, (int, float)):
+                    starts.append(day_start + i * length)
+                    ends.append(day_start + (i + 1) * length)
+                    values.append(float(value))
+
+    if not starts and isinstance(watts := attributes.get(WATTS_ATTRIBUTE), Mapping):
+        for time, value in watts.items():
+            if (start := _timestamp(time)) is not None and isinstance(
+                value, (int, float)
+            ):
+                starts.append(start)
+                ends.append(np.nan)
+                values.append(float(value) / 1000.0)
+
+    start = np.asarray(starts, dtype=np.float64)
+    order = np.argsort(start, kind="stable")
+    start = start[order]
+    end = np.asarray(ends, dtype=np.float64)[order]
+    value = np.asarray(values, dtype=np.float64)[order]
+
+    # Open slots last until the next one; the last as long as the one before
+    if start.size:
+        following = np.empty_like(start)
+        following[:-1] = start[1:]
+        following[-1] = start[-1] + (start[-1] - start[-2] if start.size > 1 else 3600)
+        end = np.where(np.isnan(end), following, end)
+    return Forecast(start, end, value)
+
+
+def resample(forecast: Forecast, start: np.ndarray, end: np.ndarray) -> np.ndarray:
+    """Return the forecast's value at the middle of each slot, 0 outside it."""
+    if not forecast.start.size:
+        return np.zeros(start.size)
+    middle = (start + end) / 2
+    i = np.searchsorted(forecast.start, middle, side="right") - 1
+    clipped = np.maximum(i, 0)
+    covered = (i >= 0) & (middle < forecast.end[clipped])
+    return np.where(covered, forecast.value[clipped], 0.0)
+
+
+def project(
+    prices: Forecast,
+    solar_kw: np.ndarray,
+    *,
+    load_kw: float,
+    solar_price: float,
+    battery_kwh: float,
+    total_battery_cost: float,
+    now: float | None = None,
+) -> Projection:
+    """Project the weighted cost over the price slots that end after ``now``.
+
+    ``solar_kw`` holds the expected solar power of each price slot. The
+    projection starts from the current stored energy and battery cost basis.
+    """
+    # Slots too short for a calculation step are left out
+    keep = prices.end - prices.start >= MIN_DT_HOURS * 3600.0
+    if now is not None:
+        keep &= prices.end >= now + MIN_DT_HOURS * 3600.0
+    start = prices.start[keep]
+    end = prices.end[keep]
+    grid_price = prices.value[keep]
+    solar = np.maximum(np.asarray(solar_kw, dtype=np.float64)[keep], 0.0)
+    if not start.size:
+        empty = np.empty(0)
+        return Projection(empty, empty, empty, empty, empty)
+    if now is not None:
+        # The slot in progress counts from now on
+        start = start.copy()
+        start[0] = max(start[0], now)
+
+    hours = (end - start) / 3600.0
+    load = max(load_kw, 0.0)
+    surplus = np.maximum(solar - load, 0.0)
+    deficit = np.maximum(load - solar, 0.0)
+
+    # Stored energy as a walk that is reflected at empty: the energy the
+    # battery cannot deliver is the amount the walk would go below zero
+    walk = battery_kwh + np.cumsum((surplus - deficit) * hours)
+    shortfall = np.maximum(-np.minimum.accumulate(np.minimum(walk, 0.0)), 0.0)
+    stored = walk + shortfall
+    unserved = np.diff(shortfall, prepend=0.0)
+    grid_kw = np.where(hours > 0, unserved / hours, 0.0)
+    battery_kw = deficit - grid_kw - surplus
+    # Charge is priced against the energy stored at the end of the slot and
+    # discharge against the energy at its start, so emptying the battery
+    # removes all of its cost
+    stored_before = np.concatenate(([battery_kwh], stored[:-1]))
+    energy = np.maximum(stored, stored_before)
+
+    columns = [
+        grid_kw,
+        grid_price,
+        solar,
+        np.full(start.size, solar_price),
+        battery_kw,
+        energy,
+    ]
+    # The first sample only starts the engine's clock
+    timestamps = np.concatenate((start[:1], end))
+    result = run_batch(
+        EngineState(total_battery_cost=total_battery_cost),
+        timestamps,
+        *(np.concatenate((column[:1], column)) for column in columns),
+        initial_cost=float(grid_price[0]),
+    )
+    return Projection(
+        start,
+        end,
+        result.weighted_cost[1:],
+        result.battery_unit_price[1:],
+        stored,
+    )
@@ -0,0 +1,428 @@
+"""Input handling for the Weighted Energy Cost Sensor.
+
+Reads the configured sources from state objects and normalizes them into
+engine inputs. The configuration is compiled once into source accessors,
+which parse each state object when it changes and keep the value. The same
+code serves state change events of the live sensor and replays of recorder
+history. Like the engine, this module does not import Home Assistant.
+"""
+
+from __future__ import annotations
+
+from collections.abc import Callable, Iterable, Mapping
+from datetime import tzinfo
+from typing import Any, NamedTuple
+
+from .const import (
+    CONF_GRID_IMPORT_SOURCE_TYPE,
+    CONF_GRID_IMPORT_SOURCE_VALUE,
+    CONF_GRID_IMPORT_PRICE_TYPE,
+    CONF_GRID_IMPORT_PRICE_VALUE,
+    CONF_SOLAR_SOURCE_TYPE,
+    CONF_SOLAR_SOURCE_VALUE,
+    CONF_SOLAR_PRICE_TYPE,
+    CONF_SOLAR_PRICE_VALUE,
+    CONF_GRID_EXPORT_SOURCE_TYPE,
+    CONF_GRID_EXPORT_SOURCE_VALUE,
+    CONF_FEED_IN_PRICE_TYPE,
+    CONF_FEED_IN_PRICE_VALUE,
+    CONF_BATTERY_POWER_SOURCE_TYPE,
+    CONF_BATTERY_POWER_SOURCE_VALUE,
+    CONF_BATTERY_ENERGY_SOURCE_TYPE,
+    CONF_BATTERY_ENERGY_SOURCE_VALUE,
+    CONF_GRID_CO2_INTENSITY,
+    CONF_SOLAR_CO2_INTENSITY,
+    DEFAULT_SOLAR_CO2_INTENSITY,
+    SOURCE_TYPE_DASHBOARD,
+    SOURCE_TYPE_FIXED,
+    SOURCE_TYPE_SCHEDULE,
+)
+from .counters import CounterRate
+from .engine import EngineState, StepInputs
+from .tariff import ScheduleError, TariffSchedule, parse_schedule
+
+# Mirrors of the Home Assistant attribute names and values used here
+ATTR_DEVICE_CLASS = "device_class"
+ATTR_UNIT_OF_MEASUREMENT = "unit_of_measurement"
+DEVICE_CLASS_ENERGY = "energy"
+UNAVAILABLE_STATES = ("unknown", "unavailable")
+
+# Energy units and their factor to kWh
+ENERGY_UNITS = {"wh": 0.001, "kwh": 1.0, "mwh": 1000.0}
+
+# (type, value) configuration keys of every source
+SOURCE_KEYS = (
+    (CONF_GRID_IMPORT_SOURCE_TYPE, CONF_GRID_IMPORT_SOURCE_VALUE),
+    (CONF_GRID_IMPORT_PRICE_TYPE, CONF_GRID_IMPORT_PRICE_VALUE),
+    (CONF_SOLAR_SOURCE_TYPE, CONF_SOLAR_SOURCE_VALUE),
+    (CONF_SOLAR_PRICE_TYPE, CONF_SOLAR_PRICE_VALUE),
+    (CONF_GRID_EXPORT_SOURCE_TYPE, CONF_GRID_EXPORT_SOURCE_VALUE),
+    (CONF_FEED_IN_PRICE_TYPE, CONF_FEED_IN_PRICE_VALUE),
+    (CONF_BATTERY_POWER_SOURCE_TYPE, CONF_BATTERY_POWER_SOURCE_VALUE),
+    (CONF_BATTERY_ENERGY_SOURCE_TYPE, CONF_BATTERY_ENERGY_SOURCE_VALUE),
+)
+
+GetState = Callable[[str], Any]
+
+
+class FixedSource:
+    """A configured constant."""
+
+    __slots__ = ("value",)
+
+    # A constant counts as reported once, at the start
+    updated = 0.0
+
+    def __init__(self, value: float) -> None:
+        """Initialize the source."""
+        self.value = value
+
+    def read(self, now: float) -> tuple[float, bool]:
+        """Return the value and that it is not derived from a counter."""
+        return self.value, False
+
+
+class EntitySource:
+    """A numeric entity, normalized to kW if it measures power or energy.
+
+    The scale factor and whether the entity is an energy counter are derived
+    from its unit and device class, and only again when those change. The
+    power of an energy counter is derived from its own readings.
+    """
+
+    __slots__ = (
+        "entity_id",
+        "power",
+        "updated",
+        "_value",
+        "_attributes",
+        "_unit",
+        "_device_class",
+        "_scale",
+        "_energy",
+        "_rate",
+    )
+
+    def __init__(self, entity_id: str, power: bool, energy: bool = False) -> None:
+        """Initialize the source.
+
+        ``energy`` marks the entity as an energy counter regardless of its
+        attributes.
+        """
+        self.entity_id = entity_id
+        self.power = power
+        # Time of the last valid reading, None while unavailable
+        self.updated: float | None = None
+        self._value: float | None = None
+        self._attributes: Any = None
+        self._unit: Any = None
+        self._device_class: Any = None
+        self._scale = 1.0
+        self._energy = energy
+        self._rate: CounterRate | None = CounterRate() if energy else None
+
+    def update(self, state: Any, timestamp: float) -> None:
+        """Parse a new state of the entity taken at ``timestamp`` (seconds)."""
+        if not state or state.state in UNAVAILABLE_STATES:
+            self._value = None
+            self.updated = None
+            return
+
+        try:
+            self._value = float(state.state)
+        except ValueError:
+            self._value = None
+            self.updated = None
+            return
+        self.updated = timestamp
+
+        if not self.power:
+            return
+        if state.attributes is not self._attributes:
+            self._resolve(state.attributes)
+        if self._rate is not None:
+            self._rate.add(timestamp, self._value * self._scale)
+
+    def read(self, now: float) -> tuple[float, bool]:
+        """Return the current value and whether it was derived from a counter."""
+        val = self._value
+        if val is None:
+            return 0.0, False
+        if not self.power:
+            return val, False
+
+        # If it's an energy sensor, calculate rate
+        if self._rate is not None:
+            return self._rate.rate(now), True
+        return val * self._scale, False
+
+    @property
+    def counter(self) -> CounterRate | None:
+        """Return the readings tracker if the entity is an energy counter."""
+        return self._rate
+
+    def restore_counter(self, rate: CounterRate, timestamp: float) -> None:
+        """Continue an energy counter from restored readings.
+
+        The current reading is recorded again at ``timestamp``.
+        """
+        if self._rate is None:
+            return
+        self._rate = rate
+        if self._value is not None:
+            rate.add(timestamp, self._value * self._scale)
+
+    def _resolve(self, attributes: Mapping[str, Any]) -> None:
+        """Derive the scale factor from the unit and device class."""
+        self._attributes = attributes
+        unit = attributes.get(ATTR_UNIT_OF_MEASUREMENT)
+        device_class = attributes.get(ATTR_DEVICE_CLASS)
+        if unit == self._unit and device_class == self._device_class:
+            return
+
+        self._unit = unit
+        self._device_class = device_class
+        unit = (unit or "").lower()
+        if self._energy or device_class == DEVICE_CLASS_ENERGY or unit in ENERGY_UNITS:
+            # Energy is tracked in kWh; readings in another unit cannot be
+            # compared with the old ones
+            scale = ENERGY_UNITS.get(unit, 1.0)
+            if self._rate is None or scale != self._scale:
+                self._rate = CounterRate()
+        else:
+            # If it's power, just convert to kW
+            scale = 0.001 if unit == "w" else 1.0
+            self._rate = None
+        self._scale = scale
+
+
+class ScheduleSource:
+    """A price from a time-of-use tariff schedule.
+
+    The price is looked up when the source is updated with the wall-clock
+    time, which also yields the time of the next tariff change.
+    """
+
+    __slots__ = ("schedule", "value", "next_change", "updated")
+
+    def __init__(self, schedule: TariffSchedule) -> None:
+        """Initialize the source."""
+        self.schedule = schedule
+        self.value = 0.0
+        self.next_change: float | None = None
+        self.updated: float | None = None
+
+    def update(self, timestamp: float) -> None:
+        """Look up the price at ``timestamp`` (seconds since the epoch)."""
+        self.value, self.next_change = self.schedule.lookup(timestamp)
+        self.updated = timestamp
+
+    def read(self, now: float) -> tuple[float, bool]:
+        """Return the value and that it is not derived from a counter."""
+        return self.value, False
+
+
+Source = FixedSource | EntitySource | ScheduleSource
+
+
+class Sources(NamedTuple):
+    """Compiled accessors for every configured source."""
+
+    grid: Source
+    grid_price: Source
+    solar: Source
+    solar_price: Source
+    battery: Source
+    battery_energy: Source
+    export: Source
+    feed_in_price: Source
+    grid_co2: Source
+    solar_co2: Source
+
+
+def compile_sources(
+    data: Mapping[str, Any], time_zone: tzinfo | None = None
+) -> Sources:
+    """Build the source accessors from the sensor's configuration.
+
+    Tariff schedules are evaluated in ``time_zone``, UTC if not given. The
+    optional grid export and feed-in price read as 0 if not configured, as
+    does the grid's carbon intensity.
+    """
+    try:
+        solar_co2 = float(
+            data.get(CONF_SOLAR_CO2_INTENSITY, DEFAULT_SOLAR_CO2_INTENSITY)
+        )
+    except (ValueError, TypeError):
+        solar_co2 = 0.0
+    return Sources(
+        grid=compile_source(
+            data, CONF_GRID_IMPORT_SOURCE_TYPE, CONF_GRID_IMPORT_SOURCE_VALUE, True
+        ),
+        grid_price=compile_source(
+            data,
+            CONF_GRID_IMPORT_PRICE_TYPE,
+            CONF_GRID_IMPORT_PRICE_VALUE,
+            False,
+            time_zone,
+        ),
+        solar=compile_source(
+            data, CONF_SOLAR_SOURCE_TYPE, CONF_SOLAR_SOURCE_VALUE, True
+        ),
+        solar_price=compile_source(
+            data, CONF_SOLAR_PRICE_TYPE, CONF_SOLAR_PRICE_VALUE, False, time_zone
+        ),
+        battery=compile_source(
+            data, CONF_BATTERY_POWER_SOURCE_TYPE, CONF_BATTERY_POWER_SOURCE_VALUE, True
+        ),
+        battery_energy=compile_source(
+            data,
+            CONF_BATTERY_ENERGY_SOURCE_TYPE,
+            CONF_BATTERY_ENERGY_SOURCE_VALUE,
+            False,
+        ),
+        export=compile_source(
+            data, CONF_GRID_EXPORT_SOURCE_TYPE, CONF_GRID_EXPORT_SOURCE_VALUE, True
+        ),
+        feed_in_price=compile_source(
+            data, CONF_FEED_IN_PRICE_TYPE, CONF_FEED_IN_PRICE_VALUE, False, time_zone
+        ),
+        grid_co2=(
+            EntitySource(data[CONF_GRID_CO2_INTENSITY], False)
+            if data.get(CONF_GRID_CO2_INTENSITY)
+            else FixedSource(0.0)
+        ),
+        solar_co2=FixedSource(solar_co2),
+    )
+
+
+def compile_source(
+    data: Mapping[str, Any],
+    type_key: str,
+    value_key: str,
+    power: bool,
+    time_zone: tzinfo | None = None,
+) -> Source:
+    """Build the accessor for one source.
+
+    Power sources are normalized to kW, other sources such as prices or the
+    stored energy in kWh are used as they are.
+    """
+    t = data.get(type_key)
+    v = data.get(value_key)
+
+    if t == SOURCE_TYPE_FIXED:
+        try:
+            val = float(v)
+        except (ValueError, TypeError):
+            return FixedSource(0.0)
+        # For fixed values, we assume it's kW if small, W if > 10.
+        if power and val > 10:
+            val /= 1000.0
+        return FixedSource(val)
+
+    if t == SOURCE_TYPE_SCHEDULE:
+        try:
+            return ScheduleSource(TariffSchedule(parse_schedule(str(v)), time_zone))
+        except ScheduleError:
+            return FixedSource(0.0)
+
+    # Energy Dashboard sources are energy counters
+    return EntitySource(v, power, energy=t == SOURCE_TYPE_DASHBOARD)
+
+
+def entity_index(sources: Iterable[Source]) -> dict[str, list[EntitySource]]:
+    """Map each entity id to the sources reading from it."""
+    index: dict[str, list[EntitySource]] = {}
+    for source in sources:
+        if isinstance(source, EntitySource) and source.entity_id:
+            index.setdefault(source.entity_id, []).append(source)
+    return index
+
+
+def update_entity(
+    index: Mapping[str, list[EntitySource]],
+    entity_id: str,
+    state: Any,
+    timestamp: float,
+) -> None:
+    """Hand a new state of ``entity_id`` to the sources reading from it."""
+    for source in index.get(entity_id, ()):
+        source.update(state, timestamp)
+
+
+def refresh_entities(
+    index: Mapping[str, list[EntitySource]], get_state: GetState, timestamp: float
+) -> None:
+    """Load the current state of every indexed entity."""
+    for entity_id, sources in index.items():
+        state = get_state(entity_id)
+        for source in sources:
+            source.update(state, timestamp)
+
+
+def tracked_entities(data: Mapping[str, Any]) -> list[str]:
+    """Identify which entities to track."""
+    entities = []
+    for type_key, value_key in SOURCE_KEYS:
+        if data.get(type_key) == SOURCE_TYPE_SCHEDULE:
+            continue
+        val = data.get(value_key)
+        if val and isinstance(val, str) and "." in val:
+            entities.append(val)
+    if grid_co2 := data.get(CONF_GRID_CO2_INTENSITY):
+        entities.append(grid_co2)
+    return entities
+
+
+def update_schedules(sources: Iterable[Source], timestamp: float) -> float | None:
+    """Look up the tariff schedules at ``timestamp``.
+
+    Returns the time of the next tariff change, or None without schedules.
+    """
+    next_change = None
+    for source in sources:
+        if isinstance(source, ScheduleSource):
+            source.update(timestamp)
+            if next_change is None or source.next_change < next_change:
+                next_change = source.next_change
+    return next_change
+
+
+def read_inputs(sources: Sources, engine: EngineState, now: float) -> StepInputs:
+    """Fetch current values (kW and Price) for one calculation step."""
+    grid_kw, grid_counter = sources.grid.read(now)
+    solar_kw, solar_counter = sources.solar.read(now)
+    battery_kw, battery_counter = sources.battery.read(now)
+    export_kw, export_counter = sources.export.read(now)
+    inputs = StepInputs(
+        grid_kw=grid_kw,
+        grid_price=sources.grid_price.read(now)[0],
+        solar_kw=solar_kw,
+        solar_price=sources.solar_price.read(now)[0],
+        battery_kw=battery_kw,
+        battery_kwh=sources.battery_energy.read(now)[0],
+        export_kw=export_kw,
+        feed_in_price=sources.feed_in_price.read(now)[0],
+        grid_co2=sources.grid_co2.read(now)[0],
+        solar_co2=sources.solar_co2.read(now)[0],
+    )
+
+    # The integrated stored energy is corrected whenever the sensor reports
+    if engine.soe is not None and sources.battery_energy.updated is not None:
+        engine.soe.report(inputs.battery_kwh, sources.battery_energy.updated)
+
+    # A rate derived from an energy counter already is an average over the
+    # counter's recent readings. Align the previous sample with it so that
+    # every integration method uses that average for the whole interval.
+    if engine.last_inputs is not None and (
+        grid_counter or solar_counter or battery_counter or export_counter
+    ):
+        last = engine.last_inputs
+        engine.last_inputs = last._replace(
+            grid_kw=grid_kw if grid_counter else last.grid_kw,
+            solar_kw=solar_kw if solar_counter else last.solar_kw,
+            battery_kw=battery_kw if battery_counter else last.battery_kw,
+            export_kw=export_kw if export_counter else last.export_kw,
+        )
+    return inputs
@@ -0,0 +1,167 @@
+"""Layered battery cost basis for the Weighted Energy Cost Sensor.
+
+Instead of one average pool, the energy charged into the battery is kept as
+lots with the cost they were bought at. Discharging takes energy from the
+oldest lots first (FIFO) or from the newest (LIFO). The lots are held in a
+bounded deque: a new lot priced close to its neighbour joins it, and when
+the deque is full the two adjacent lots with the closest prices are merged,
+so memory and the work per update stay constant over years of cycling.
+Like the engine, this module does not import Home Assistant.
+"""
+
+from __future__ import annotations
+
+from collections import deque
+from collections.abc import Iterable
+
+from .const import COST_BASIS_FIFO, COST_BASIS_LIFO
+
+# Number of lots kept before neighbours are merged
+MAX_LOTS = 32
+
+# Lots whose unit prices differ by less than this (€/kWh) are one lot
+MERGE_TOLERANCE = 0.005
+
+# Lots below this energy (kWh) are dropped once discharged
+MIN_LOT_KWH = 1e-9
+
+
+class BatteryLots:
+    """Energy charged into the battery as lots of ``[kwh, cost]``.
+
+    The lots are ordered oldest first. Their energy is the energy as it was
+    charged; conversion losses are accounted for by discharging the same
+    fraction of the lots as of the measured stored energy.
+    """
+
+    __slots__ = ("lifo", "max_lots", "tolerance", "_lots", "_cost")
+
+    def __init__(
+        self,
+        lifo: bool = False,
+        max_lots: int = MAX_LOTS,
+        tolerance: float = MERGE_TOLERANCE,
+    ) -> None:
+        """Initialize an empty battery."""
+        self.lifo = lifo
+        self.max_lots = max(max_lots, 2)
+        self.tolerance = tolerance
+        self._lots: deque[list[float]] = deque()
+        self._cost = 0.0
+
+    def __len__(self) -> int:
+        """Return the number of lots."""
+        return len(self._lots)
+
+    @property
+    def energy(self) -> float:
+        """Return the charged energy of all lots in kWh."""
+        return sum(lot[0] for lot in self._lots)
+
+    @property
+    def cost(self) -> float:
+        """Return the cost of all lots in €."""
+        return self._cost
+
+    def add(self, kwh: float, cost: float) -> None:
+        """Charge ``kwh`` bought for ``cost`` as the newest lot.
+
+        Cost without energy joins the newest lot and is dropped if there is
+        none.
+        """
+        lots = self._lots
+        if kwh <= MIN_LOT_KWH:
+            if lots:
+                lots[-1][1] += cost
+                self._cost += cost
+            return
+
+        self._cost += cost
+        if lots:
+            newest = lots[-1]
+            if abs(newest[1] / newest[0] - cost / kwh) < self.tolerance:
+                newest[0] += kwh
+                newest[1] += cost
+                return
+        lots.append([kwh, cost])
+        if len(lots) > self.max_lots:
+            self._merge_closest()
+
+    def unit_price(self) -> float:
+        """Return the price per charged kWh of the lot discharged next."""
+        if not self._lots:
+            return 0.0
+        kwh, cost = self._lots[-1] if self.lifo else self._lots[0]
+        return cost / kwh
+
+    def remove(self, fraction: float) -> float:
+        """Discharge ``fraction`` of the charged energy and return its cost."""
+        lots = self._lots
+        if fraction >= 1.0:
+            removed = self._cost
+            self.clear()
+            return removed
+        if fraction <= 0.0 or not lots:
+            return 0.0
+
+        remaining = fraction * self.energy
+        removed = 0.0
+        pop = lots.pop if self.lifo else lots.popleft
+        while lots and remaining > MIN_LOT_KWH:
+            lot = lots[-1] if self.lifo else lots[0]
+            kwh, cost = lot
+            if kwh <= remaining + MIN_LOT_KWH:
+                pop()
+                removed += cost
+                remaining -= kwh
+            else:
+                part = cost * remaining / kwh
+                lot[0] = kwh - remaining
+                lot[1] = cost - part
+                removed += part
+                remaining = 0.0
+        self._cost = self._cost - removed if lots else 0.0
+        return removed
+
+    def clear(self) -> None:
+        """Remove all lots."""
+        self._lots.clear()
+        self._cost = 0.0
+
+    def copy(self) -> BatteryLots:
+        """Return an independent copy."""
+        lots = BatteryLots(self.lifo, self.max_lots, self.tolerance)
+        lots.restore(self.as_list())
+        return lots
+
+    def as_list(self) -> list[list[float]]:
+        """Return the lots as ``[kwh, cost]`` pairs, oldest first."""
+        return [list(lot) for lot in self._lots]
+
+    def restore(self, lots: Iterable[Iterable[float]]) -> None:
+        """Replace the lots with ``[kwh, cost]`` pairs from ``as_list``."""
+        self.clear()
+        for kwh, cost in lots:
+            self._lots.append([float(kwh), float(cost)])
+            self._cost += float(cost)
+        while len(self._lots) > self.max_lots:
+            self._merge_closest()
+
+    def _merge_closest(self) -> None:
+        """Merge the two adjacent lots with the closest unit prices."""
+        lots = self._lots
+        prices = [cost / kwh for kwh, cost in lots]
+        i = min(range(len(prices) - 1), key=lambda k: abs(prices[k + 1] - prices[k]))
+        kwh, cost = lots[i + 1]
+        del lots[i + 1]
+        lots[i][0] += kwh
+        lots[i][1] += cost
+
+
+def create_lots(cost_basis: str | None) -> BatteryLots | None:
+    """Return empty lots for a layered cost basis, None for the average."""
+    if cost_basis == COST_BASIS_FIFO:
+        return BatteryLots()
+    if cost_basis == COST_BASIS_LIFO:
+        return BatteryLots(lifo=True)
+    return None
@@ -0,0 +1,863 @@
+"""Offline replay of exported data through the Weighted Energy Cost math.
+
+Reads recorded data without Home Assistant, for evaluating tariffs and
+battery strategies on another machine, in one of two shapes:
+
+* state changes as ``(time, entity_id, state)`` rows, from a CSV or Parquet
+  export or the ``states`` table of a copy of the recorder database. They
+  run through the same input handling and engine as the live sensor and
+  yield hourly statistics of the weighted cost.
+* samples with one column per engine input (``timestamp``, ``grid_kw``,
+  ``grid_price``, ...), from a CSV or Parquet file, a directory of
+  memory-mapped ``.npy`` columns or the long-term or short-term
+  ``statistics`` of the recorder. They run through the batch engine and
+  yield the weighted cost of every sample.
+
+Every source is read in chunks, so memory stays constant however large the
+file is. Reading Parquet needs ``pyarrow``. Like the engine, this module
+does not import Home Assistant.
+"""
+
+from __future__ import annotations
+
+import argparse
+import csv
+import heapq
+import json
+import sqlite3
+import sys
+import time
+from collections.abc import Iterable, Iterator, Mapping, Sequence
+from dataclasses import asdict
+from datetime import datetime, timezone, tzinfo
+from itertools import islice
+from pathlib import Path
+from typing import Any, NamedTuple, TextIO
+from zoneinfo import ZoneInfo
+
+import numpy as np
+
+from .batch import run_batch
+from .const import CONF_INTEGRATION_METHOD, DEFAULT_INTEGRATION_METHOD
+from .engine import EngineState, StepInputs, advance, create_state, step
+from .inputs import (
+    ATTR_DEVICE_CLASS,
+    ATTR_UNIT_OF_MEASUREMENT,
+    ENERGY_UNITS,
+    EntitySource,
+    FixedSource,
+    ScheduleSource,
+    compile_sources,
+    tracked_entities,
+)
+from .replay import HOUR, HistoryReplay
+
+DAY = 86400.0
+
+# Rows read and replayed at once
+DEFAULT_CHUNK_SIZE = 65536
+
+# Columns of a sample file, in the order of the engine inputs; the grid
+# export and feed-in price are optional
+SAMPLE_COLUMNS = ("timestamp", *StepInputs._fields)
+REQUIRED_SAMPLE_COLUMNS = SAMPLE_COLUMNS[:7]
+
+# Column names accepted for the time of a state change
+TIME_COLUMNS = ("last_updated", "last_changed", "timestamp", "time")
+
+# Periods of the recorder's statistics tables in seconds
+STATISTICS_TABLES = {
+    "hourly": ("statistics", HOUR),
+    "5min": ("statistics_short_term", 300.0),
+}
+
+# Statistics are read one window of this many seconds at a time
+STATISTICS_WINDOW = 30 * DAY
+
+
+class RecordedState(NamedTuple):
+    """A state as read from an export, in the shape of a state object."""
+
+    state: str
+    attributes: Mapping[str, Any]
+
+
+Event = tuple[float, str, RecordedState]
+
+
+def load_config(path: str | Path) -> dict[str, Any]:
+    """Read the sensor's configuration from a JSON file.
+
+    Accepts the configuration itself or the integration's diagnostics
+    download, which contains it.
+    """
+    with open(path, encoding="utf-8") as file:
+        data = json.load(file)
+    data = data.get("data", data)
+    return dict(data.get("config", data))
+
+
+def parse_time(value: str | float | datetime) -> float:
+    """Return seconds since the epoch for a number or an ISO 8601 time.
+
+    Times without a time zone are taken as UTC, like the recorder stores
+    them.
+    """
+    if isinstance(value, datetime):
+        moment = value
+    else:
+        try:
+            return float(value)
+        except ValueError:
+            moment = datetime.fromisoformat(value)
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return moment.timestamp()
+
+
+class _AttributeCache:
+    """Share one attributes mapping per distinct unit and device class.
+
+    Sources only parse the unit again when they see another mapping, so
+    equal attributes must be the same object.
+    """
+
+    def __init__(self) -> None:
+        """Initialize an empty cache."""
+        self._cache: dict[tuple[str | None, str | None], Mapping[str, Any]] = {}
+
+    def get(self, unit: str | None, device_class: str | None) -> Mapping[str, Any]:
+        """Return the attributes for ``unit`` and ``device_class``."""
+        key = (unit or None, device_class or None)
+        if (attributes := self._cache.get(key)) is None:
+            attributes = self._cache[key] = {
+                ATTR_UNIT_OF_MEASUREMENT: key[0],
+                ATTR_DEVICE_CLASS: key[1],
+            }
+        return attributes
+
+
+def _event_rows(
+    rows: Iterable[Sequence[Any]], header: Sequence[str], cache: _AttributeCache
+) -> Iterator[Event]:
+    """Convert rows of state changes into events."""
+    columns = {name: i for i, name in enumerate(header)}
+    time_col = next(columns[name] for name in TIME_COLUMNS if name in columns)
+    entity_col = columns["entity_id"]
+    state_col = columns["state"]
+    unit_col = columns.get(ATTR_UNIT_OF_MEASUREMENT)
+    class_col = columns.get(ATTR_DEVICE_CLASS)
+    for row in rows:
+        if not row:
+            continue
+        state = row[state_col]
+        yield parse_time(row[time_col]), row[entity_col], RecordedState(
+            "unknown" if state is None else str(state),
+            cache.get(
+                row[unit_col] if unit_col is not None else None,
+                row[class_col] if class_col is not None else None,
+            ),
+        )
+
+
+def _check_event_header(header: Sequence[str], path: str | Path) -> None:
+    """Raise ValueError unless the columns describe state changes."""
+    if not {"entity_id", "state"} <= set(header) or not set(TIME_COLUMNS) & set(header):
+        raise ValueError(
+            f"{path}: state changes need entity_id, state and one of "
+            f"{', '.join(TIME_COLUMNS)} columns"
+        )
+
+
+def read_csv_events(path: str | Path) -> Iterator[Event]:
+    """Yield the state changes of a CSV export in time order.
+
+    The history download of Home Assistant lists one entity after the
+    other. Such files are merged by time from one reader per entity block;
+    any other file must already be in time order. Optional
+    ``unit_of_measurement`` and ``device_class`` columns describe the
+    entities, which are taken as kW and kWh otherwise.
+    """
+    with open(path, encoding="utf-8", newline="") as file:
+        header = next(csv.reader(file), [])
+    _check_event_header(header, path)
+    entity_col = header.index("entity_id")
+
+    # Byte ranges of the runs of rows of one entity, until an entity
+    # appears a second time
+    blocks: dict[str, tuple[int, int]] = {}
+    current = None
+    with open(path, "rb") as file:
+        offset = header_end = len(file.readline())
+        for line in file:
+            fields = next(csv.reader([line.decode("utf-8")]), None)
+            if fields:
+                entity_id = fields[entity_col]
+                if entity_id == current:
+                    blocks[entity_id] = (blocks[entity_id][0], offset + len(line))
+                elif entity_id in blocks:
+                    # Entities are interleaved, so the file is read in its
+                    # own order
+                    blocks = {"": (header_end, file.seek(0, 2))}
+                    break
+                else:
+                    blocks[entity_id] = (offset, offset + len(line))
+                    current = entity_id
+            offset += len(line)
+
+    cache = _AttributeCache()
+    yield from heapq.merge(
+        *(
+            _csv_block(path, header, start, end, cache)
+            for start, end in blocks.values()
+        ),
+        key=lambda event: event[0],
+    )
+
+
+def _csv_block(
+    path: str | Path,
+    header: Sequence[str],
+    start: int,
+    end: int,
+    cache: _AttributeCache,
+) -> Iterator[Event]:
+    """Yield the events stored between two byte offsets of a CSV file."""
+    with open(path, "rb") as file:
+        file.seek(start)
+        lines = (
+            line.decode("utf-8")
+            for line in iter(lambda: file.readline() if file.tell() < end else b"", b"")
+        )
+        yield from _event_rows(csv.reader(lines), header, cache)
+
+
+def _parquet_file(path: str | Path):
+    """Open a Parquet file, which needs the optional pyarrow package."""
+    try:
+        import pyarrow.parquet as pq
+    except ImportError as err:
+        raise ValueError("Reading Parquet files needs the pyarrow package") from err
+    return pq.ParquetFile(path)
+
+
+def read_parquet_events(
+    path: str | Path, chunk_size: int = DEFAULT_CHUNK_SIZE
+) -> Iterator[Event]:
+    """Yield the state changes of a Parquet file, which must be in time order."""
+    parquet = _parquet_file(path)
+    header = parquet.schema_arrow.names
+    _check_event_header(header, path)
+    cache = _AttributeCache()
+    for batch in parquet.iter_batches(batch_size=chunk_size):
+        columns = batch.to_pydict()
+        yield from _event_rows(zip(*columns.values()), list(columns), cache)
+
+
+class RecorderReader:
+    """Read-only access to a copy of the recorder database.
+
+    Needs the schema of Home Assistant 2023.4 or later, which keeps entity
+    ids and attributes in their own tables.
+    """
+
+    def __init__(self, path: str | Path) -> None:
+        """Open the database read-only."""
+        self._db = sqlite3.connect(f"file:{Path(path).resolve()}?mode=ro", uri=True)
+        self._attributes: dict[int | None, Mapping[str, Any]] = {None: {}}
+        self._cache = _AttributeCache()
+
+    def close(self) -> None:
+        """Close the database."""
+        self._db.close()
+
+    def _ids(self, table: str, key: str, names: Iterable[str]) -> dict[int, Any]:
+        """Map the ids of a metadata table to its rows for ``names``."""
+        names = list(names)
+        rows = self._db.execute(
+            f"SELECT * FROM {table} WHERE {key} IN " f"({', '.join('?' * len(names))})",
+            names,
+        )
+        columns = [d[0] for d in rows.description]
+        return {row[0]: dict(zip(columns, row)) for row in rows}
+
+    def _state_attributes(self, attributes_id: int | None) -> Mapping[str, Any]:
+        """Return the unit and device class of a shared attributes row."""
+        if (attributes := self._attributes.get(attributes_id)) is None:
+            row = self._db.execute(
+                "SELECT shared_attrs FROM state_attributes WHERE attributes_id = ?",
+                (attributes_id,),
+            ).fetchone()
+            shared = json.loads(row[0]) if row and row[0] else {}
+            if len(self._attributes) > 4096:
+                self._attributes = {None: {}}
+            attributes = self._attributes[attributes_id] = self._cache.get(
+                shared.get(ATTR_UNIT_OF_MEASUREMENT), shared.get(ATTR_DEVICE_CLASS)
+            )
+        return attributes
+
+    def events(
+        self,
+        entity_ids: Iterable[str],
+        start: float | None = None,
+        end: float | None = None,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+    ) -> Iterator[Event]:
+        """Yield the recorded states of ``entity_ids`` in time order.
+
+        The states are queried one day at a time and fetched in chunks.
+        """
+        meta = self._ids("states_meta", "entity_id", entity_ids)
+        if not meta:
+            return
+        ids = list(meta)
+        marks = ", ".join("?" * len(ids))
+        first, last = self._db.execute(
+            "SELECT MIN(last_updated_ts), MAX(last_updated_ts) FROM states "
+            f"WHERE metadata_id IN ({marks})",
+            ids,
+        ).fetchone()
+        if first is None:
+            return
+        start = first if start is None else max(start, first)
+        end = last + 1.0 if end is None else end
+        query = (
+            "SELECT last_updated_ts, metadata_id, state, attributes_id FROM states "
+            f"WHERE metadata_id IN ({marks}) "
+            "AND last_updated_ts >= ? AND last_updated_ts < ? "
+            "ORDER BY last_updated_ts, state_id"
+        )
+        while start < end:
+            window_end = min(start + DAY, end)
+            cursor = self._db.execute(query, (*ids, start, window_end))
+            while rows := cursor.fetchmany(chunk_size):
+                for timestamp, metadata_id, state, attributes_id in rows:
+                    yield timestamp, meta[metadata_id]["entity_id"], RecordedState(
+                        state if state is not None else "unknown",
+                        self._state_attributes(attributes_id),
+                    )
+            start = window_end
+
+    def samples(
+        self,
+        config: Mapping[str, Any],
+        period: str = "hourly",
+        start: float | None = None,
+        end: float | None = None,
+        time_zone: tzinfo | None = None,
+    ) -> Iterator[dict[str, np.ndarray]]:
+        """Yield engine input columns from the recorder's statistics.
+
+        Every sample is the end of one statistics period, carrying the mean
+        over that period. Energy counters without a mean give the energy
+        counted during the period as power, fixed values are repeated and
+        tariff schedules are looked up at the start of the period.
+        """
+        table, seconds = STATISTICS_TABLES[period]
+        sources = compile_sources(config, time_zone)
+        meta = self._ids(
+            "statistics_meta",
+            "statistic_id",
+            {s.entity_id for s in sources if isinstance(s, EntitySource)},
+        )
+        by_entity = {row["statistic_id"]: row for row in meta.values()}
+        if not meta:
+            return
+        ids = list(meta)
+        marks = ", ".join("?" * len(ids))
+        first, last = self._db.execute(
+            f"SELECT MIN(start_ts), MAX(start_ts) FROM {table} "
+            f"WHERE metadata_id IN ({marks})",
+            ids,
+        ).fetchone()
+        if first is None:
+            return
+        start = first if start is None else max(start, first)
+        end = last + seconds if end is None else end
+        # Values held over from the previous window
+        held: dict[int, float] = {}
+        sums: dict[int, tuple[float, float]] = {}
+        while start < end:
+            window_end = min(start + STATISTICS_WINDOW, end)
+            grid = np.arange(start, window_end, seconds)
+            rows = self._db.execute(
+                f"SELECT metadata_id, start_ts, mean, sum FROM {table} "
+                f"WHERE metadata_id IN ({marks}) AND start_ts >= ? AND start_ts < ? "
+                "ORDER BY metadata_id, start_ts",
+                (*ids, start, window_end),
+            ).fetchall()
+            series: dict[int, tuple[np.ndarray, np.ndarray]] = {}
+            for metadata_id, group in _group_rows(rows):
+                series[metadata_id] = self._values(meta[metadata_id], group, sums)
+            columns = {"timestamp": grid + seconds}
+            for name, source in zip(StepInputs._fields, sources):
+                if isinstance(source, FixedSource):
+                    columns[name] = np.full(grid.size, source.value)
+                elif isinstance(source, ScheduleSource):
+                    values = np.empty(grid.size)
+                    for i, moment in enumerate(grid.tolist()):
+                        source.update(moment)
+                        values[i] = source.value
+                    columns[name] = values
+                elif (row := by_entity.get(source.entity_id)) is None:
+                    columns[name] = np.zeros(grid.size)
+                else:
+                    columns[name] = _hold(
+                        grid, *series.get(row["id"], _EMPTY), held, row["id"]
+                    )
+            yield columns
+            start = window_end
+
+    @staticmethod
+    def _values(
+        meta: Mapping[str, Any],
+        rows: list[tuple[int, float, float | None, float | None]],
+        sums: dict[int, tuple[float, float]],
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """Return the start times and values of one statistic, scaled to kW."""
+        unit = (meta.get("unit_of_measurement") or "").lower()
+        starts = np.array([row[1] for row in rows], dtype=np.float64)
+        if meta.get("has_mean"):
+            values = np.array(
+                [np.nan if row[2] is None else row[2] for row in rows],
+                dtype=np.float64,
+            )
+            return starts, values * (0.001 if unit == "w" else 1.0)
+
+        # The energy counted since the previous row, spread over the time
+        totals = np.array([row[3] or 0.0 for row in rows], dtype=np.float64)
+        previous_start, previous_total = sums.get(meta["id"], (np.nan, np.nan))
+        prev_starts = np.concatenate(([previous_start], starts[:-1]))
+        prev_totals = np.concatenate(([previous_total], totals[:-1]))
+        sums[meta["id"]] = (float(starts[-1]), float(totals[-1]))
+        hours = (starts - prev_starts) / HOUR
+        energy = (totals - prev_totals) * ENERGY_UNITS.get(unit, 1.0)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return starts, np.maximum(energy / hours, 0.0)
+
+
+_EMPTY = (np.empty(0), np.empty(0))
+
+
+def _group_rows(rows: list[tuple]) -> Iterator[tuple[int, list[tuple]]]:
+    """Group rows ordered by their first column."""
+    group: list[tuple] = []
+    for row in rows:
+        if group and row[0] != group[0][0]:
+            yield group[0][0], group
+            group = []
+        group.append(row)
+    if group:
+        yield group[0][0], group
+
+
+def _hold(
+    grid: np.ndarray,
+    starts: np.ndarray,
+    values: np.ndarray,
+    held: dict[int, float],
+    key: int,
+) -> np.ndarray:
+    """Sample ``values`` at ``grid``, holding each until the next one."""
+    known = ~np.isnan(values)
+    starts, values = starts[known], values[known]
+    pos = np.searchsorted(starts, grid, side="right") - 1
+    out = np.where(pos >= 0, values[np.maximum(pos, 0)] if values.size else 0.0, 0.0)
+    out[pos < 0] = held.get(key, 0.0)
+    if values.size:
+        held[key] = float(values[-1])
+    return out
+
+
+def read_csv_samples(
+    path: str | Path, chunk_size: int = DEFAULT_CHUNK_SIZE
+) -> Iterator[dict[str, np.ndarray]]:
+    """Yield engine input columns from a CSV file with a header row.
+
+    All fields must be numbers, the timestamps in seconds since the epoch.
+    """
+    with open(path, encoding="utf-8", newline="") as file:
+        header = [name.strip() for name in next(csv.reader(file), [])]
+        _check_sample_header(header, path)
+        width = len(header)
+        while lines := list(islice(file, chunk_size)):
+            text = "".join(lines).replace("\n", ",")
+            try:
+                values = np.fromstring(text, sep=",")
+            except ValueError as err:
+                raise ValueError(f"{path}: samples must be numeric") from err
+            if values.size % width:
+                raise ValueError(f"{path}: every row needs {width} fields")
+            table = values.reshape(-1, width)
+            yield {name: table[:, i] for i, name in enumerate(header)}
+
+
+def read_parquet_samples(
+    path: str | Path, chunk_size: int = DEFAULT_CHUNK_SIZE
+) -> Iterator[dict[str, np.ndarray]]:
+    """Yield engine input columns from a Parquet file."""
+    parquet = _parquet_file(path)
+    header = parquet.schema_arrow.names
+    _check_sample_header(header, path)
+    names = [name for name in SAMPLE_COLUMNS if name in header]
+    for batch in parquet.iter_batches(batch_size=chunk_size, columns=names):
+        columns = {}
+        for name, column in zip(names, batch.columns):
+            if str(column.type).startswith("timestamp"):
+                column = column.cast("timestamp[us]").cast("int64")
+                columns[name] = column.to_numpy() / 1e6
+            else:
+                columns[name] = column.to_numpy(zero_copy_only=False).astype(
+                    np.float64, copy=False
+                )
+        yield columns
+
+
+def read_npy_samples(
+    directory: str | Path, chunk_size: int = DEFAULT_CHUNK_SIZE
+) -> Iterator[dict[str, np.ndarray]]:
+    """Yield engine input columns stored as one ``<column>.npy`` per input.
+
+    The files are memory-mapped, so the chunks are views into them and
+    only the pages being replayed are read.
+    """
+    directory = Path(directory)
+    names = [name for name in SAMPLE_COLUMNS if (directory / f"{name}.npy").exists()]
+    _check_sample_header(names, directory)
+    columns = {
+        name: np.load(directory / f"{name}.npy", mmap_mode="r") for name in names
+    }
+    rows = columns["timestamp"].shape[0]
+    if any(values.shape != (rows,) for values in columns.values()):
+        raise ValueError(f"{directory}: all columns need the same length")
+    for start in range(0, rows, chunk_size):
+        yield {
+            name: values[start : start + chunk_size] for name, values in columns.items()
+        }
+
+
+def _check_sample_header(header: Sequence[str], path: str | Path) -> None:
+    """Raise ValueError unless all required sample columns are present."""
+    if missing := [name for name in REQUIRED_SAMPLE_COLUMNS if name not in header]:
+        raise ValueError(f"{path}: missing columns {', '.join(missing)}")
+
+
+class ReplaySummary(NamedTuple):
+    """Outcome of an offline replay."""
+
+    rows: int
+    steps: int
+    weighted_cost: float | None
+    engine: EngineState
+    elapsed: float
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the summary for JSON output."""
+        engine = self.engine
+        return {
+            "rows": self.rows,
+            "steps": self.steps,
+            "weighted_cost": self.weighted_cost,
+            "total_battery_cost": engine.total_battery_cost,
+            "totals": asdict(engine.totals),
+            "elapsed_s": round(self.elapsed, 3),
+            "rows_per_second": round(self.rows / self.elapsed) if self.elapsed else 0,
+        }
+
+
+def replay_events(
+    config: Mapping[str, Any],
+    events: Iterable[Event],
+    output: TextIO | None = None,
+    initial_battery_cost: float = 0.0,
+    time_zone: tzinfo | None = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> ReplaySummary:
+    """Replay state changes like the live sensor.
+
+    The hourly mean, minimum and maximum of the weighted cost are written
+    to ``output`` as CSV.
+    """
+    started = time.perf_counter()
+    replay = HistoryReplay(
+        config,
+        create_state(config, initial_battery_cost),
+        time_zone=time_zone,
+    )
+    writer = csv.writer(output) if output is not None else None
+    if writer is not None:
+        writer.writerow(("start", "mean", "min", "max"))
+    events = iter(events)
+    rows = 0
+    last = None
+    while chunk := list(islice(events, chunk_size)):
+        rows += len(chunk)
+        last = chunk[-1][0]
+        hourly = replay.feed(chunk)
+        replay.take_totals()
+        if writer is not None:
+            writer.writerows(_hourly_rows(hourly))
+    if last is not None:
+        hourly = replay.finish(last)
+        if writer is not None:
+            writer.writerows(_hourly_rows(hourly))
+    return ReplaySummary(
+        rows,
+        replay.steps,
+        replay.weighted_cost,
+        replay.engine,
+        time.perf_counter() - started,
+    )
+
+
+def _hourly_rows(rows: Iterable) -> Iterator[tuple[str, float, float, float]]:
+    """Format hourly statistics rows for CSV output."""
+    for row in rows:
+        yield (
+            datetime.fromtimestamp(row.start, timezone.utc).isoformat(),
+            round(row.mean, 6),
+            row.min,
+            row.max,
+        )
+
+
+def replay_samples(
+    config: Mapping[str, Any],
+    chunks: Iterable[Mapping[str, np.ndarray]],
+    output: TextIO | None = None,
+    initial_battery_cost: float = 0.0,
+) -> ReplaySummary:
+    """Replay engine input columns chunk by chunk.
+
+    The weighted cost, battery unit price and battery cost basis after
+    every sample are written to ``output`` as CSV. The average cost basis
+    runs through the vectorized batch engine; layered lots and the
+    integrated stored energy are stepped sample by sample.
+    """
+    started = time.perf_counter()
+    state = create_state(config, initial_battery_cost)
+    method = config.get(CONF_INTEGRATION_METHOD, DEFAULT_INTEGRATION_METHOD)
+    vectorized = state.lots is None and state.soe is None
+    if output is not None:
+        output.write("timestamp,weighted_cost,battery_unit_price,total_battery_cost\n")
+    rows = steps = 0
+    weighted_cost: float | None = None
+    for columns in chunks:
+        ts = columns["timestamp"]
+        if not ts.size:
+            continue
+        inputs = [columns.get(name, 0.0) for name in StepInputs._fields]
+        if vectorized:
+            result = run_batch(
+                state,
+                ts,
+                *inputs[:6],
+                initial_cost=np.nan if weighted_cost is None else weighted_cost,
+                method=method,
+                export_kw=inputs[6],
+                feed_in_price=inputs[7],
+            )
+            weighted, unit_price, cost, stepped = result
+        else:
+            weighted, unit_price, cost, stepped = _step_samples(
+                state, ts, inputs, method, weighted_cost
+            )
+        rows += ts.size
+        steps += int(stepped.sum())
+        known = weighted[~np.isnan(weighted)]
+        if known.size:
+            weighted_cost = float(known[-1])
+        if output is not None:
+            np.savetxt(
+                output,
+                np.column_stack((ts, weighted, unit_price, cost)),
+                fmt=("%.3f", "%.6f", "%.6f", "%.6f"),
+                delimiter=",",
+            )
+    return ReplaySummary(
+        rows, steps, weighted_cost, state, time.perf_counter() - started
+    )
+
+
+def _step_samples(
+    state: EngineState,
+    timestamps: np.ndarray,
+    inputs: list[np.ndarray | float],
+    method: str,
+    weighted_cost: float | None,
+) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """Run samples through ``engine.step`` one at a time."""
+    n = timestamps.size
+    columns = [np.broadcast_to(np.asarray(c, dtype=np.float64), n) for c in inputs]
+    weighted = np.empty(n)
+    unit_price = np.empty(n)
+    cost = np.empty(n)
+    stepped = np.zeros(n, dtype=bool)
+    price = 0.0
+    held = np.nan if weighted_cost is None else weighted_cost
+    for i, (timestamp, *values) in enumerate(
+        zip(timestamps.tolist(), *(c.tolist() for c in columns))
+    ):
+        sample = StepInputs(*values)
+        if state.soe is not None:
+            state.soe.report(sample.battery_kwh, timestamp)
+        if (dt := advance(state, timestamp)) is not None:
+            result = step(state, sample, dt, method)
+            stepped[i] = True
+            price = result.battery_unit_price
+            if result.weighted_cost is not None:
+                held = result.weighted_cost
+        weighted[i] = held
+        unit_price[i] = price
+        cost[i] = state.total_battery_cost
+    return weighted, unit_price, cost, stepped
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    """Run the command line tool."""
+    parser = argparse.ArgumentParser(
+        description="Replay exported data through the Weighted Energy Cost math."
+    )
+    parser.add_argument("config", help="JSON configuration or diagnostics download")
+    parser.add_argument(
+        "input",
+        help="CSV or Parquet file, directory of .npy columns, or a copy of "
+        "home-assistant_v2.db",
+    )
+    parser.add_argument("-o", "--output", help="CSV file for the cost series")
+    parser.add_argument(
+        "--statistics",
+        choices=tuple(STATISTICS_TABLES),
+        help="replay the recorder's statistics instead of its states",
+    )
+    parser.add_argument("--start", help="replay from this time on (ISO 8601)")
+    parser.add_argument("--end", help="replay up to this time (ISO 8601)")
+    parser.add_argument(
+        "--initial-battery-cost",
+        type=float,
+        default=0.0,
+        help="battery cost basis in € at the start",
+    )
+    parser.add_argument(
+        "--time-zone", default="UTC", help="time zone of tariff schedules"
+    )
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    args = parser.parse_args(argv)
+
+    config = load_config(args.config)
+    time_zone = ZoneInfo(args.time_zone)
+    start = parse_time(args.start) if args.start else None
+    end = parse_time(args.end) if args.end else None
+    path = Path(args.input)
+    output = (
+        open(args.output, "w", encoding="utf-8", newline="") if args.output else None
+    )
+    try:
+        summary = replay_file(
+            config,
+            path,
+            output,
+            statistics=args.statistics,
+            start=start,
+            end=end,
+            initial_battery_cost=args.initial_battery_cost,
+            time_zone=time_zone,
+            chunk_size=args.chunk_size,
+        )
+    except (OSError, ValueError, sqlite3.Error) as err:
+        print(f"error: {err}", file=sys.stderr)
+        return 1
+    finally:
+        if output is not None:
+            output.close()
+    print(json.dumps(summary.as_dict(), indent=2))
+    return 0
+
+
+def replay_file(
+    config: Mapping[str, Any],
+    path: str | Path,
+    output: TextIO | None = None,
+    *,
+    statistics: str | None = None,
+    start: float | None = None,
+    end: float | None = None,
+    initial_battery_cost: float = 0.0,
+    time_zone: tzinfo | None = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> ReplaySummary:
+    """Replay the data at ``path`` with the reader its kind needs.
+
+    A directory holds samples as ``.npy`` columns, a database is a copy of
+    the recorder, whose ``statistics`` period selects samples instead of
+    states, and CSV or Parquet files hold state changes if they have an
+    ``entity_id`` column and samples otherwise.
+    """
+    path = Path(path)
+    cost = initial_battery_cost
+    suffix = path.suffix.lower()
+    if path.is_dir():
+        chunks = read_npy_samples(path, chunk_size)
+        return replay_samples(
+            config, _samples_between(chunks, start, end), output, cost
+        )
+    if suffix in (".db", ".sqlite", ".sqlite3"):
+        reader = RecorderReader(path)
+        try:
+            if statistics:
+                chunks = reader.samples(config, statistics, start, end, time_zone)
+                return replay_samples(config, chunks, output, cost)
+            events = reader.events(tracked_entities(config), start, end, chunk_size)
+            return replay_events(config, events, output, cost, time_zone, chunk_size)
+        finally:
+            reader.close()
+
+    if suffix == ".parquet":
+        header = _parquet_file(path).schema_arrow.names
+    else:
+        with open(path, encoding="utf-8", newline="") as file:
+            header = [name.strip() for name in next(csv.reader(file), [])]
+    if "entity_id" in header:
+        events = (
+            read_parquet_events(path, chunk_size)
+            if suffix == ".parquet"
+            else read_csv_events(path)
+        )
+        events = _between(events, start, end)
+        return replay_events(config, events, output, cost, time_zone, chunk_size)
+
+    chunks = (
+        read_parquet_samples(path, chunk_size)
+        if suffix == ".parquet"
+        else read_csv_samples(path, chunk_size)
+    )
+    return replay_samples(config, _samples_between(chunks, start, end), output, cost)
+
+
+def _between(
+    events: Iterable[Event], start: float | None, end: float | None
+) -> Iterator[Event]:
+    """Yield the events from ``start`` up to ``end``."""
+    for event in events:
+        if start is not None and event[0] < start:
+            continue
+        if end is not None and event[0] >= end:
+            return
+        yield event
+
+
+def _samples_between(
+    chunks: Iterable[dict[str, np.ndarray]], start: float | None, end: float | None
+) -> Iterator[dict[str, np.ndarray]]:
+    """Yield the samples from ``start`` up to ``end``."""
+    if start is None and end is None:
+        yield from chunks
+        return
+    for columns in chunks:
+        ts = columns["timestamp"]
+        keep = np.ones(ts.size, dtype=bool)
+        if start is not None:
+            keep &= ts >= start
+        if end is not None:
+            keep &= ts < end
+        yield {name: values[keep] for name, values in columns.items()}
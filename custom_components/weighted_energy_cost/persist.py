@@ -0,0 +1,103 @@
+"""Full-precision calculation state stored across restarts.
+
+The sensor stores the engine state and the readings of its energy counters
+along with its last state, so a restart or reload neither rounds the battery
+cost basis nor needs new counter readings to warm up. Monotonic times are
+stored as wall-clock times: ``shift`` is added to every time on the way out
+and on the way back. Like the engine, this module does not import Home
+Assistant.
+"""
+
+from __future__ import annotations
+
+from collections.abc import Iterable, Mapping
+from dataclasses import asdict
+from typing import Any
+
+from .counters import CounterRate
+from .engine import BatteryMetrics, EnergyTotals, EngineState, StepInputs
+from .inputs import EntitySource
+
+# After a restart or reload within this time (in seconds) the calculation
+# continues from the stored clock and inputs, covering the gap.
+MAX_RESUME_GAP = 300
+
+# Entity ids and the sources they update
+Index = Mapping[str, list[EntitySource]]
+
+
+def engine_data(engine: EngineState, shift: float) -> dict[str, Any]:
+    """Return the engine state, with ``shift`` added to its clock."""
+    return {
+        "total_battery_cost": engine.total_battery_cost,
+        "last_update": (
+            engine.last_update + shift if engine.last_update is not None else None
+        ),
+        "last_inputs": (
+            list(engine.last_inputs) if engine.last_inputs is not None else None
+        ),
+        "totals": asdict(engine.totals),
+        "lots": engine.lots.as_list() if engine.lots is not None else None,
+        "stored_kwh": engine.soe.stored_kwh if engine.soe is not None else None,
+        "battery_metrics": asdict(engine.metrics),
+    }
+
+
+def restore_engine(
+    engine: EngineState, data: Mapping[str, Any], now: float, shift: float
+) -> bool:
+    """Restore the engine state from ``engine_data``, adding ``shift``.
+
+    The calculation resumes from the stored clock and inputs if ``now`` is
+    at most MAX_RESUME_GAP after the stored clock; returns whether it does.
+    Malformed data raises KeyError, TypeError or ValueError.
+    """
+    engine.total_battery_cost = float(data["total_battery_cost"])
+    if (totals := data.get("totals")) is not None:
+        engine.totals = EnergyTotals(
+            **{key: float(value) for key, value in totals.items()}
+        )
+    # Lots stored by another cost basis are not used; the restored cost then
+    # becomes the first lot
+    if engine.lots is not None and (lots := data.get("lots")):
+        engine.lots.restore(lots)
+        engine.total_battery_cost = engine.lots.cost
+    if engine.soe is not None and (stored_kwh := data.get("stored_kwh")) is not None:
+        engine.soe.stored_kwh = float(stored_kwh)
+    if (metrics := data.get("battery_metrics")) is not None:
+        engine.metrics = BatteryMetrics(
+            **{key: float(value) for key, value in metrics.items()}
+        )
+
+    last_update = data.get("last_update")
+    last_inputs = data.get("last_inputs")
+    if (
+        last_update is None
+        or last_inputs is None
+        or not 0 <= now - (last_update + shift) <= MAX_RESUME_GAP
+    ):
+        return False
+    engine.last_update = last_update + shift
+    engine.last_inputs = StepInputs(*map(float, last_inputs))
+    return True
+
+
+def counters_data(indexes: Iterable[Index], shift: float) -> dict[str, Any]:
+    """Return the readings of the energy counters by entity id."""
+    counters = {}
+    for index in indexes:
+        for entity_id, sources in index.items():
+            if (counter := sources[0].counter) is not None:
+                counters[entity_id] = counter.as_dict(shift)
+    return counters
+
+
+def restore_counters(
+    indexes: Iterable[Index], data: Mapping[str, Any], now: float, shift: float
+) -> None:
+    """Continue the energy counters from ``counters_data`` at ``now``."""
+    indexes = list(indexes)
+    for entity_id, counter in data.items():
+        for index in indexes:
+            for source in index.get(entity_id, ()):
+                source.restore_counter(CounterRate.from_dict(counter, shift), now)
@@ -0,0 +1,267 @@
+"""Rebuild the battery cost basis of a sensor from recorder history."""
+
+from __future__ import annotations
+
+import heapq
+import logging
+from collections.abc import Callable, Iterator, Mapping
+from datetime import datetime, timedelta
+from typing import TYPE_CHECKING, Any
+
+from homeassistant.components.recorder import get_instance, history
+from homeassistant.components.recorder.models import StatisticData, StatisticMetaData
+from homeassistant.components.recorder.statistics import (
+    async_import_statistics,
+    statistics_during_period,
+)
+from homeassistant.core import HomeAssistant, State
+from homeassistant.util import dt as dt_util
+
+from .engine import EnergyTotals, create_state, step
+from .replay import HistoryReplay, HourlyRow, TotalsRow
+
+if TYPE_CHECKING:
+    from .sensor import WeightedEnergyCostSensor
+
+_LOGGER = logging.getLogger(__name__)
+
+# History is fetched and replayed one slice at a time to bound memory use
+CHUNK = timedelta(days=1)
+
+# The totals continue from their last hourly statistics within this time
+# before the start
+SUM_LOOKBACK = timedelta(days=30)
+
+
+async def async_recompute(
+    hass: HomeAssistant,
+    sensor: WeightedEnergyCostSensor,
+    start: datetime,
+    initial_battery_cost: float = 0.0,
+) -> dict[str, Any]:
+    """Replay the sensor's inputs since ``start`` and apply the result.
+
+    The corrected battery cost basis and totals replace the live ones. The
+    history is replayed up to the sensor's last step; the steps the sensor
+    takes while the history is fetched continue the replay before it is
+    applied, so none of them is lost.
+    """
+    resumed_from = sensor.async_start_journal()
+    end = (
+        dt_util.utc_from_timestamp(resumed_from)
+        if resumed_from is not None
+        else dt_util.utcnow()
+    )
+    try:
+        replay, rows_imported = await _async_replay(
+            hass, sensor, start, end, initial_battery_cost
+        )
+    finally:
+        journal = sensor.async_take_journal()
+    for inputs, dt in journal:
+        step(replay.engine, inputs, dt, replay.method)
+
+    _LOGGER.debug(
+        "Recomputed %s from %s: %s steps and %s live steps, battery cost %.4f",
+        sensor.entity_id,
+        start,
+        replay.steps,
+        len(journal),
+        replay.engine.total_battery_cost,
+    )
+    sensor.async_set_battery_cost(
+        replay.engine.total_battery_cost,
+        replay.engine.totals,
+        replay.engine.lots,
+        replay.engine.metrics,
+    )
+    return {
+        "total_battery_cost": replay.engine.total_battery_cost,
+        "weighted_cost": replay.weighted_cost,
+        "steps": replay.steps,
+        "statistics": rows_imported,
+    }
+
+
+async def _async_replay(
+    hass: HomeAssistant,
+    sensor: WeightedEnergyCostSensor,
+    start: datetime,
+    end: datetime,
+    initial_battery_cost: float,
+) -> tuple[HistoryReplay, int]:
+    """Replay the history from ``start`` to ``end`` and import statistics.
+
+    Hourly statistics of the weighted cost and of every total are imported
+    for the replayed period, one chunk of history at a time. The totals
+    continue from the state and sum of their statistics before ``start``.
+    Returns the replay and the number of imported statistics rows.
+    """
+    entity_ids = sensor.tracked_entities
+    recorder = get_instance(hass)
+    total_sensors = [
+        total for total in sensor.total_sensors if total.entity_id is not None
+    ]
+    last_sums = await recorder.async_add_executor_job(
+        _last_sums,
+        hass,
+        {total.entity_id for total in total_sensors},
+        start.replace(minute=0, second=0, microsecond=0),
+    )
+    engine = create_state(sensor.config, initial_battery_cost)
+    offsets = {}
+    for total in total_sensors:
+        state, total_sum = last_sums.get(total.entity_id, (0.0, 0.0))
+        setattr(engine.totals, total.entity_description.field, state)
+        # The sum differs from the state by the resets before the start
+        offsets[total.entity_id] = total_sum - state
+    replay = HistoryReplay(sensor.config, engine, time_zone=dt_util.DEFAULT_TIME_ZONE)
+    metadata = StatisticMetaData(
+        has_mean=True,
+        has_sum=False,
+        name=None,
+        source="recorder",
+        statistic_id=sensor.entity_id,
+        unit_of_measurement=sensor.native_unit_of_measurement,
+    )
+    totals_metadata = [
+        (
+            StatisticMetaData(
+                has_mean=False,
+                has_sum=True,
+                name=None,
+                source="recorder",
+                statistic_id=total.entity_id,
+                unit_of_measurement=total.native_unit_of_measurement,
+            ),
+            total.entity_description.value_fn,
+            offsets[total.entity_id],
+        )
+        for total in total_sensors
+    ]
+
+    chunk_start = start
+    rows_imported = 0
+    while entity_ids and chunk_start < end:
+        chunk_end = min(chunk_start + CHUNK, end)
+        states = await recorder.async_add_executor_job(
+            _fetch_states,
+            hass,
+            chunk_start,
+            chunk_end,
+            entity_ids,
+            chunk_start == start,
+        )
+        rows = await hass.async_add_executor_job(
+            replay.feed, _merge_states(states, chunk_start.timestamp())
+        )
+        if chunk_end == end:
+            # Integrate up to the sensor's last step, which the live steps
+            # continue from
+            rows.extend(replay.advance(end.timestamp()))
+            rows.extend(replay.finish(end.timestamp()))
+        if rows:
+            async_import_statistics(hass, metadata, _statistics(rows))
+            rows_imported += len(rows)
+        if totals_rows := replay.take_totals():
+            for total_metadata, value_fn, offset in totals_metadata:
+                async_import_statistics(
+                    hass,
+                    total_metadata,
+                    _sum_statistics(totals_rows, value_fn, offset),
+                )
+            rows_imported += len(totals_rows) * len(totals_metadata)
+        chunk_start = chunk_end
+    return replay, rows_imported
+
+
+def _fetch_states(
+    hass: HomeAssistant,
+    start: datetime,
+    end: datetime,
+    entity_ids: list[str],
+    include_start_time_state: bool,
+) -> Mapping[str, list[State]]:
+    """Fetch every recorded state of the tracked entities in one slice."""
+    return history.get_significant_states(
+        hass,
+        start,
+        end,
+        entity_ids,
+        include_start_time_state=include_start_time_state,
+        significant_changes_only=False,
+    )
+
+
+def _last_sums(
+    hass: HomeAssistant, statistic_ids: set[str], before: datetime
+) -> dict[str, tuple[float, float]]:
+    """Return the state and sum of each statistic's last hour before ``before``."""
+    statistics = statistics_during_period(
+        hass,
+        before - SUM_LOOKBACK,
+        before,
+        statistic_ids,
+        "hour",
+        None,
+        {"state", "sum"},
+    )
+    return {
+        statistic_id: (rows[-1].get("state") or 0.0, rows[-1].get("sum") or 0.0)
+        for statistic_id, rows in statistics.items()
+        if rows
+    }
+
+
+def _merge_states(
+    states: Mapping[str, list[State]], start: float
+) -> Iterator[tuple[float, str, State]]:
+    """Merge the per-entity state lists into one time-ordered event stream."""
+    return heapq.merge(
+        *(
+            _events(entity_id, entity_states, start)
+            for entity_id, entity_states in states.items()
+        ),
+        key=lambda event: event[0],
+    )
+
+
+def _events(
+    entity_id: str, states: list[State], start: float
+) -> Iterator[tuple[float, str, State]]:
+    """Yield the states of one entity, starting no earlier than ``start``."""
+    for state in states:
+        yield max(state.last_updated.timestamp(), start), entity_id, state
+
+
+def _statistics(rows: list[HourlyRow]) -> list[StatisticData]:
+    """Convert replayed hourly rows into recorder statistics."""
+    return [
+        StatisticData(
+            start=dt_util.utc_from_timestamp(row.start),
+            mean=row.mean,
+            min=row.min,
+            max=row.max,
+        )
+        for row in rows
+    ]
+
+
+def _sum_statistics(
+    rows: list[TotalsRow], value_fn: Callable[[EnergyTotals], float], offset: float
+) -> list[StatisticData]:
+    """Convert replayed hourly totals into recorder sum statistics.
+
+    ``offset`` is added to the totals for the sum.
+    """
+    statistics = []
+    for row in rows:
+        value = value_fn(row.totals)
+        statistics.append(
+            StatisticData(
+                start=dt_util.utc_from_timestamp(row.start),
+                state=value,
+                sum=value + offset,
+            )
+        )
+    return statistics
@@ -0,0 +1,94 @@
+"""Event-time ordering of the state changes of the tracked entities.
+
+A state change is stamped with the time its source reported it, mapped onto
+the monotonic clock the engine integrates with, rather than the time the
+event loop gets around to it. A short reorder buffer holds the changes until
+no earlier one can still arrive and releases them in the order they were
+reported, so a late or out-of-order change is integrated into the interval
+it belongs to. Like the engine, this module does not import Home Assistant.
+"""
+
+from __future__ import annotations
+
+from collections.abc import Iterable, Iterator
+from heapq import heappop, heappush
+from typing import Any
+
+# Most state changes the buffer holds; beyond it the oldest is let through
+MAX_BUFFERED_EVENTS = 1024
+
+# Most a reported time may lie behind the time a change is received, in
+# seconds. Older times (a restored state, a clock that jumped) count as now.
+MAX_EVENT_LAG = 60.0
+
+# A state change: its event time, entity id and new state
+Event = tuple[float, str, Any]
+
+
+def event_time(clock: float, wall: float, reported: float) -> float:
+    """Map the wall time a change was ``reported`` at onto the ``clock``.
+
+    ``clock`` and ``wall`` are the monotonic and wall time the change was
+    received at. A reported time in the future counts as now.
+    """
+    return clock - min(max(wall - reported, 0.0), MAX_EVENT_LAG)
+
+
+class ReorderBuffer:
+    """State changes held for ``delay`` seconds and released in time order."""
+
+    __slots__ = ("delay", "capacity", "_heap", "_seq")
+
+    def __init__(self, delay: float = 0.0, capacity: int = MAX_BUFFERED_EVENTS):
+        """Initialize an empty buffer."""
+        self.delay = delay
+        self.capacity = capacity
+        # (event time, arrival order, entity id, state)
+        self._heap: list[tuple[float, int, str, Any]] = []
+        self._seq = 0
+
+    def __len__(self) -> int:
+        """Return the number of held state changes."""
+        return len(self._heap)
+
+    def push(self, timestamp: float, entity_id: str, state: Any) -> Event | None:
+        """Hold a state change; return the oldest one if the buffer is full.
+
+        Changes with the same time keep the order they arrived in.
+        """
+        heappush(self._heap, (timestamp, self._seq, entity_id, state))
+        self._seq += 1
+        if len(self._heap) > self.capacity:
+            timestamp, _, entity_id, state = heappop(self._heap)
+            return timestamp, entity_id, state
+        return None
+
+    def next_due(self) -> float | None:
+        """Return the clock time the oldest held change is released at."""
+        return self._heap[0][0] + self.delay if self._heap else None
+
+    def release(self, clock: float) -> list[Event]:
+        """Return the changes held for at least the delay, oldest first."""
+        heap = self._heap
+        horizon = clock - self.delay
+        events = []
+        while heap and heap[0][0] <= horizon:
+            timestamp, _, entity_id, state = heappop(heap)
+            events.append((timestamp, entity_id, state))
+        return events
+
+
+def bursts(events: Iterable[Event], window: float) -> Iterator[list[Event]]:
+    """Split time-ordered changes into bursts of at most ``window`` seconds.
+
+    A burst, for example the readings of one Modbus poll, is integrated as
+    one step at the time of its last change.
+    """
+    burst: list[Event] = []
+    for event in events:
+        if burst and event[0] - burst[0][0] > window:
+            yield burst
+            burst = []
+        burst.append(event)
+    if burst:
+        yield burst
@@ -0,0 +1,192 @@
+"""Replay of recorded history through the Weighted Energy Cost calculation.
+
+The replay feeds state changes, in time order, through the same input
+handling and engine as the live sensor. It does not import Home Assistant;
+fetching the history is left to the caller.
+"""
+
+from __future__ import annotations
+
+from collections.abc import Iterable, Mapping
+from dataclasses import replace
+from datetime import tzinfo
+from typing import Any, NamedTuple
+
+from .const import CONF_INTEGRATION_METHOD, DEFAULT_INTEGRATION_METHOD
+from .engine import EnergyTotals, EngineState, advance, create_state, step
+from .inputs import (
+    ScheduleSource,
+    compile_sources,
+    entity_index,
+    read_inputs,
+    update_entity,
+    update_schedules,
+)
+
+HOUR = 3600.0
+
+
+class HourlyRow(NamedTuple):
+    """Time-weighted statistics of the weighted cost for one hour."""
+
+    start: float
+    mean: float
+    min: float
+    max: float
+
+
+class HourlyStatistics:
+    """Compile hourly mean/min/max of a value that is held between updates."""
+
+    def __init__(self) -> None:
+        """Initialize the statistics."""
+        self._value: float | None = None
+        self._hour_start = 0.0
+        self._since = 0.0
+        self._area = 0.0
+        self._covered = 0.0
+        self._min = 0.0
+        self._max = 0.0
+
+    def add(self, timestamp: float, value: float) -> list[HourlyRow]:
+        """Record ``value`` from ``timestamp`` on and return completed hours."""
+        if self._value is None:
+            rows = []
+            self._hour_start = timestamp - timestamp % HOUR
+            self._since = timestamp
+            self._min = self._max = value
+        else:
+            rows = self.advance(timestamp)
+            self._min = min(self._min, value)
+            self._max = max(self._max, value)
+        self._value = value
+        return rows
+
+    def advance(self, timestamp: float) -> list[HourlyRow]:
+        """Hold the current value until ``timestamp`` and return completed hours."""
+        rows: list[HourlyRow] = []
+        if self._value is None or timestamp <= self._since:
+            return rows
+
+        while timestamp >= self._hour_start + HOUR:
+            end = self._hour_start + HOUR
+            self._area += self._value * (end - self._since)
+            self._covered += end - self._since
+            rows.append(
+                HourlyRow(
+                    self._hour_start, self._area / self._covered, self._min, self._max
+                )
+            )
+            self._hour_start = self._since = end
+            self._area = self._covered = 0.0
+            self._min = self._max = self._value
+
+        self._area += self._value * (timestamp - self._since)
+        self._covered += timestamp - self._since
+        self._since = timestamp
+        return rows
+
+
+class TotalsRow(NamedTuple):
+    """The engine's accumulated totals at the end of one hour."""
+
+    start: float
+    totals: EnergyTotals
+
+
+class HourlyTotals:
+    """Sample accumulated totals at the end of every hour."""
+
+    def __init__(self) -> None:
+        """Initialize the sampler."""
+        self._hour_start: float | None = None
+
+    def advance(self, timestamp: float, totals: EnergyTotals) -> list[TotalsRow]:
+        """Return the hours completed before ``timestamp``, ending at ``totals``."""
+        if self._hour_start is None:
+            self._hour_start = timestamp - timestamp % HOUR
+            return []
+
+        rows: list[TotalsRow] = []
+        if timestamp >= self._hour_start + HOUR:
+            snapshot = replace(totals)
+            while timestamp >= self._hour_start + HOUR:
+                rows.append(TotalsRow(self._hour_start, snapshot))
+                self._hour_start += HOUR
+        return rows
+
+
+class HistoryReplay:
+    """Replay state changes of the tracked entities through the engine."""
+
+    def __init__(
+        self,
+        data: Mapping[str, Any],
+        engine: EngineState | None = None,
+        weighted_cost: float | None = None,
+        time_zone: tzinfo | None = None,
+    ) -> None:
+        """Initialize the replay from the sensor's configuration."""
+        self.data = data
+        self.sources = compile_sources(data, time_zone)
+        self._index = entity_index(self.sources)
+        self._schedules = [s for s in self.sources if isinstance(s, ScheduleSource)]
+        self.method = data.get(CONF_INTEGRATION_METHOD, DEFAULT_INTEGRATION_METHOD)
+        self.engine = engine if engine is not None else create_state(data)
+        self.weighted_cost = weighted_cost
+        self.statistics = HourlyStatistics()
+        self.totals = HourlyTotals()
+        self.steps = 0
+        self._totals_rows: list[TotalsRow] = []
+
+    def feed(self, events: Iterable[tuple[float, str, Any]]) -> list[HourlyRow]:
+        """Replay ``(timestamp, entity_id, state)`` events in time order.
+
+        Returns the hourly statistics rows completed by these events. The
+        totals of completed hours are collected for ``take_totals``.
+        """
+        rows: list[HourlyRow] = []
+        index = self._index
+        for timestamp, entity_id, state in events:
+            update_entity(index, entity_id, state, timestamp)
+            self._step(timestamp, rows)
+        return rows
+
+    def advance(self, timestamp: float) -> list[HourlyRow]:
+        """Integrate the current inputs up to ``timestamp``.
+
+        Returns the hourly statistics rows completed by the step.
+        """
+        rows: list[HourlyRow] = []
+        self._step(timestamp, rows)
+        return rows
+
+    def _step(self, timestamp: float, rows: list[HourlyRow]) -> None:
+        """Run one step at ``timestamp`` and collect the completed hours."""
+        engine = self.engine
+        dt = advance(engine, timestamp)
+        if dt is None:
+            self._totals_rows.extend(self.totals.advance(timestamp, engine.totals))
+            return
+
+        if self._schedules:
+            update_schedules(self._schedules, timestamp)
+        inputs = read_inputs(self.sources, engine, timestamp)
+        result = step(engine, inputs, dt, self.method)
+        self.steps += 1
+        # The step reaching past an hour boundary still counts to that hour
+        self._totals_rows.extend(self.totals.advance(timestamp, engine.totals))
+        if result.weighted_cost is not None:
+            self.weighted_cost = round(result.weighted_cost, 4)
+        if self.weighted_cost is not None:
+            rows.extend(self.statistics.add(timestamp, self.weighted_cost))
+
+    def finish(self, timestamp: float) -> list[HourlyRow]:
+        """Close the replay at ``timestamp`` and return the remaining full hours."""
+        self._totals_rows.extend(self.totals.advance(timestamp, self.engine.totals))
+        return self.statistics.advance(timestamp)
+
+    def take_totals(self) -> list[TotalsRow]:
+        """Return and forget the totals of the hours completed so far."""
+        rows, self._totals_rows = self._totals_rows, []
+        return rows
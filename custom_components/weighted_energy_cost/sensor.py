@@ -3,44 +3,291 @@
 from __future__ import annotations
 
 import logging
-from datetime import datetime
+import time
+from collections.abc import Callable, Mapping
+from dataclasses import asdict, dataclass, replace
+from datetime import datetime, timedelta
+from operator import attrgetter
+from typing import Any
 
+import numpy as np
 from homeassistant.components.sensor import (
     SensorDeviceClass,
     SensorEntity,
+    SensorEntityDescription,
     SensorStateClass,
 )
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.const import (
-    ATTR_UNIT_OF_MEASUREMENT,
-)
-from homeassistant.core import HomeAssistant, callback
+from homeassistant.const import EntityCategory
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
-from homeassistant.helpers.event import async_track_state_change_event
-from homeassistant.helpers.restore_state import RestoreEntity
+from homeassistant.helpers.event import (
+    async_call_later,
+    async_track_point_in_utc_time,
+    async_track_state_change_event,
+    async_track_time_interval,
+)
+from homeassistant.helpers.restore_state import ExtraStoredData, RestoreEntity
+from homeassistant.util import dt as dt_util
 
 from .const import (
     DOMAIN,
     CONF_NAME,
-    CONF_GRID_IMPORT_SOURCE_TYPE,
-    CONF_GRID_IMPORT_SOURCE_VALUE,
+    CONF_INTEGRATION_METHOD,
+    CONF_UPDATE_MODE,
+    CONF_UPDATE_INTERVAL,
+    CONF_COALESCE_WINDOW,
+    CONF_REORDER_WINDOW,
+    CONF_MIN_WRITE_INTERVAL,
+    CONF_WRITE_THRESHOLD,
+    CONF_CONSUMERS,
+    CONF_DEBUG_SENSORS,
     CONF_GRID_IMPORT_PRICE_TYPE,
     CONF_GRID_IMPORT_PRICE_VALUE,
-    CONF_SOLAR_SOURCE_TYPE,
-    CONF_SOLAR_SOURCE_VALUE,
-    CONF_SOLAR_PRICE_TYPE,
-    CONF_SOLAR_PRICE_VALUE,
-    CONF_BATTERY_POWER_SOURCE_TYPE,
-    CONF_BATTERY_POWER_SOURCE_VALUE,
-    CONF_BATTERY_ENERGY_SOURCE_TYPE,
-    CONF_BATTERY_ENERGY_SOURCE_VALUE,
+    CONF_GRID_EXPORT_SOURCE_TYPE,
+    CONF_GRID_CO2_INTENSITY,
+    CONF_PRICE_FORECAST,
+    CONF_SOLAR_FORECAST,
+    DEFAULT_INTEGRATION_METHOD,
+    DEFAULT_UPDATE_MODE,
+    DEFAULT_UPDATE_INTERVAL,
+    DEFAULT_COALESCE_WINDOW,
+    DEFAULT_REORDER_WINDOW,
+    DEFAULT_MIN_WRITE_INTERVAL,
+    DEFAULT_WRITE_THRESHOLD,
+    UPDATE_MODE_EVENT,
+    UPDATE_MODE_INTERVAL,
     SOURCE_TYPE_ENTITY,
     SOURCE_TYPE_FIXED,
-    SOURCE_TYPE_DASHBOARD,
 )
+from .consumers import ConsumerMeters
+from .engine import (
+    MIN_DT_HOURS,
+    BatteryMetrics,
+    EnergyTotals,
+    EngineState,
+    Metrics,
+    StepInputs,
+    StepResult,
+    advance,
+    create_state,
+    solar_unit_cost,
+    step,
+)
+from .forecast import parse_forecast, project, resample
+from .inputs import (
+    ScheduleSource,
+    compile_sources,
+    entity_index,
+    read_inputs,
+    refresh_entities,
+    tracked_entities,
+    update_entity,
+    update_schedules,
+)
+from .lots import BatteryLots
+from .persist import counters_data, engine_data, restore_counters, restore_engine
+from .reorder import Event, ReorderBuffer, bursts, event_time
+from .stats import RuntimeStats, source_diagnostics
+from .writes import WriteGate
 
 _LOGGER = logging.getLogger(__name__)
 
+# The companion sensors are written along with the main sensor, but at most
+# once per this interval or the minimum write interval (in seconds)
+COMPANION_WRITE_INTERVAL = 60
+
+
+@dataclass(frozen=True, kw_only=True)
+class TotalSensorDescription(SensorEntityDescription):
+    """Describes a sensor of one of the engine's accumulated totals."""
+
+    # The attribute of EnergyTotals the sensor shows
+    field: str
+    exists_fn: Callable[[Mapping[str, Any]], bool] = lambda config: True
+
+    @property
+    def value_fn(self) -> Callable[[EnergyTotals], float]:
+        """Return the lookup of the total in the engine's totals."""
+        return attrgetter(self.field)
+
+
+def _export_configured(config: Mapping[str, Any]) -> bool:
+    """Return whether the grid export is measured rather than left at 0."""
+    return (
+        config.get(CONF_GRID_EXPORT_SOURCE_TYPE, SOURCE_TYPE_FIXED) != SOURCE_TYPE_FIXED
+    )
+
+
+TOTAL_SENSORS = (
+    TotalSensorDescription(
+        key="total_cost",
+        name="Total cost",
+        device_class=SensorDeviceClass.MONETARY,
+        state_class=SensorStateClass.TOTAL,
+        native_unit_of_measurement="€",
+        icon="mdi:cash",
+        field="cost",
+    ),
+    TotalSensorDescription(
+        key="grid_energy",
+        name="Grid energy",
+        device_class=SensorDeviceClass.ENERGY,
+        state_class=SensorStateClass.TOTAL_INCREASING,
+        native_unit_of_measurement="kWh",
+        field="grid_kwh",
+    ),
+    TotalSensorDescription(
+        key="solar_energy",
+        name="Solar energy",
+        device_class=SensorDeviceClass.ENERGY,
+        state_class=SensorStateClass.TOTAL_INCREASING,
+        native_unit_of_measurement="kWh",
+        field="solar_kwh",
+    ),
+    TotalSensorDescription(
+        key="battery_energy",
+        name="Battery discharge energy",
+        device_class=SensorDeviceClass.ENERGY,
+        state_class=SensorStateClass.TOTAL_INCREASING,
+        native_unit_of_measurement="kWh",
+        field="battery_kwh",
+    ),
+    # Negative prices can lower the costs, so they are totals that may
+    # decrease rather than increasing ones
+    TotalSensorDescription(
+        key="battery_cost_in",
+        name="Battery cost in",
+        device_class=SensorDeviceClass.MONETARY,
+        state_class=SensorStateClass.TOTAL,
+        native_unit_of_measurement="€",
+        icon="mdi:battery-arrow-up",
+        field="battery_cost_in",
+    ),
+    TotalSensorDescription(
+        key="battery_cost_out",
+        name="Battery cost out",
+        device_class=SensorDeviceClass.MONETARY,
+        state_class=SensorStateClass.TOTAL,
+        native_unit_of_measurement="€",
+        icon="mdi:battery-arrow-down",
+        field="battery_cost_out",
+    ),
+    TotalSensorDescription(
+        key="export_energy",
+        name="Export energy",
+        device_class=SensorDeviceClass.ENERGY,
+        state_class=SensorStateClass.TOTAL_INCREASING,
+        native_unit_of_measurement="kWh",
+        icon="mdi:transmission-tower-export",
+        field="export_kwh",
+        exists_fn=_export_configured,
+    ),
+    TotalSensorDescription(
+        key="feed_in_revenue",
+        name="Feed-in revenue",
+        device_class=SensorDeviceClass.MONETARY,
+        state_class=SensorStateClass.TOTAL,
+        native_unit_of_measurement="€",
+        icon="mdi:cash-plus",
+        field="export_revenue",
+        exists_fn=_export_configured,
+    ),
+)
+
+
+@dataclass(frozen=True, kw_only=True)
+class MetricSensorDescription(SensorEntityDescription):
+    """Describes a sensor of one of the weighted metrics besides the price."""
+
+    # Called with the metrics of the energy used by the home and of the
+    # energy stored in the battery
+    value_fn: Callable[[Metrics, Metrics], float]
+    exists_fn: Callable[[Mapping[str, Any]], bool] = lambda config: True
+
+
+def _co2_configured(config: Mapping[str, Any]) -> bool:
+    """Return whether the grid's carbon intensity is measured."""
+    return bool(config.get(CONF_GRID_CO2_INTENSITY))
+
+
+METRIC_SENSORS = (
+    MetricSensorDescription(
+        key="weighted_co2",
+        name="Weighted CO2 intensity",
+        state_class=SensorStateClass.MEASUREMENT,
+        native_unit_of_measurement="gCO2eq/kWh",
+        icon="mdi:molecule-co2",
+        value_fn=lambda home, battery: round(home.co2, 1),
+        exists_fn=_co2_configured,
+    ),
+    MetricSensorDescription(
+        key="battery_co2",
+        name="Battery CO2 intensity",
+        state_class=SensorStateClass.MEASUREMENT,
+        native_unit_of_measurement="gCO2eq/kWh",
+        icon="mdi:battery-heart-variant",
+        value_fn=lambda home, battery: round(battery.co2, 1),
+        exists_fn=_co2_configured,
+    ),
+    MetricSensorDescription(
+        key="self_sufficiency",
+        name="Self-sufficiency",
+        state_class=SensorStateClass.MEASUREMENT,
+        native_unit_of_measurement="%",
+        icon="mdi:home-lightning-bolt",
+        value_fn=lambda home, battery: round(home.self_sufficiency * 100.0, 1),
+    ),
+    MetricSensorDescription(
+        key="solar_fraction",
+        name="Solar fraction",
+        state_class=SensorStateClass.MEASUREMENT,
+        native_unit_of_measurement="%",
+        icon="mdi:solar-power",
+        value_fn=lambda home, battery: round(home.solar * 100.0, 1),
+    ),
+)
+
+
+@dataclass(frozen=True, kw_only=True)
+class DebugSensorDescription(SensorEntityDescription):
+    """Describes a sensor of the hub's runtime statistics."""
+
+    value_fn: Callable[[RuntimeStats], float]
+
+
+DEBUG_SENSORS = (
+    DebugSensorDescription(
+        key="updates",
+        name="Updates",
+        state_class=SensorStateClass.TOTAL_INCREASING,
+        icon="mdi:counter",
+        value_fn=lambda stats: stats.updates,
+    ),
+    DebugSensorDescription(
+        key="skipped_updates",
+        name="Skipped updates",
+        state_class=SensorStateClass.TOTAL_INCREASING,
+        icon="mdi:debug-step-over",
+        value_fn=lambda stats: stats.skipped_updates,
+    ),
+    DebugSensorDescription(
+        key="state_writes",
+        name="State writes",
+        state_class=SensorStateClass.TOTAL_INCREASING,
+        icon="mdi:database-arrow-down",
+        value_fn=lambda stats: stats.writes,
+    ),
+    DebugSensorDescription(
+        key="update_time",
+        name="Mean update time",
+        state_class=SensorStateClass.MEASUREMENT,
+        native_unit_of_measurement="µs",
+        icon="mdi:timer-outline",
+        value_fn=lambda stats: round(stats.latency.mean_us(), 1),
+    ),
+)
+
 
 async def async_setup_entry(
     hass: HomeAssistant,
@@ -48,7 +295,28 @@ async def async_setup_entry(
     async_add_entities: AddEntitiesCallback,
 ) -> None:
     """Set up the sensor platform."""
-    async_add_entities([WeightedEnergyCostSensor(hass, entry)])
+    sensor = WeightedEnergyCostSensor(hass, entry)
+    hass.data.setdefault(DOMAIN, {})[entry.entry_id] = sensor
+    companions: list[ConsumerCostSensor | DebugSensor | MetricSensor | TotalSensor] = [
+        TotalSensor(sensor, description)
+        for description in TOTAL_SENSORS
+        if description.exists_fn(sensor.config)
+    ]
+    companions.extend(
+        MetricSensor(sensor, description)
+        for description in METRIC_SENSORS
+        if description.exists_fn(sensor.config)
+    )
+    companions.extend(
+        ConsumerCostSensor(hass, sensor, entity_id)
+        for entity_id in sensor.consumers.states
+    )
+    if sensor.config.get(CONF_DEBUG_SENSORS):
+        companions.extend(
+            DebugSensor(sensor, description) for description in DEBUG_SENSORS
+        )
+    sensor.companion_sensors = companions
+    async_add_entities([sensor, *companions])
 
 
 class WeightedEnergyCostSensor(RestoreEntity, SensorEntity):
@@ -56,6 +324,19 @@ class WeightedEnergyCostSensor(RestoreEntity, SensorEntity):
 
     _attr_state_class = SensorStateClass.MEASUREMENT
     _attr_icon = "mdi:currency-eur"
+    # Instantaneous values change on every update; keep them out of the
+    # recorder so unchanged cost values share one attributes row.
+    _unrecorded_attributes = frozenset(
+        {
+            "battery_energy_kwh",
+            "grid_kw",
+            "solar_kw",
+            "battery_kw",
+            "export_kw",
+            "last_update",
+            "projection",
+        }
+    )
 
     def __init__(self, hass: HomeAssistant, entry: ConfigEntry) -> None:
         """Initialize the sensor."""
@@ -66,28 +347,96 @@ class WeightedEnergyCostSensor(RestoreEntity, SensorEntity):
         self._attr_native_unit_of_measurement = "€/kWh"
 
         self._state = 0.0
-        self._total_battery_cost = 0.0
-        self._last_update = None
-
-        # Track previous energy values for rate calculation
-        self._last_energy_values: dict[str, float] = {}
-
-        self._entities_to_track = []
-        self._setup_entities()
-
-    def _setup_entities(self):
-        """Identify which entities to track."""
-        for key in [
-            CONF_GRID_IMPORT_SOURCE_VALUE,
-            CONF_GRID_IMPORT_PRICE_VALUE,
-            CONF_SOLAR_SOURCE_VALUE,
-            CONF_SOLAR_PRICE_VALUE,
-            CONF_BATTERY_POWER_SOURCE_VALUE,
-            CONF_BATTERY_ENERGY_SOURCE_VALUE,
-        ]:
-            val = self.entry.data.get(key)
-            if val and isinstance(val, str) and "." in val:
-                self._entities_to_track.append(val)
+        self._attr_extra_state_attributes = {}
+
+        # The options flow stores the full configuration as options
+        self._config = {**entry.data, **entry.options}
+        # Battery cost basis, last inputs and last update time
+        self._engine = create_state(self._config)
+        self._method = self._config.get(
+            CONF_INTEGRATION_METHOD, DEFAULT_INTEGRATION_METHOD
+        )
+        # Inputs and hours of the steps taken while a recompute runs
+        self._journal: list[tuple[StepInputs, float]] | None = None
+        self._entities_to_track = tracked_entities(self._config)
+        self._sources = compile_sources(self._config, dt_util.DEFAULT_TIME_ZONE)
+        self._entity_index = entity_index(self._sources)
+
+        # Tariff schedules, recalculated exactly at their price changes
+        self._schedules = [
+            source for source in self._sources if isinstance(source, ScheduleSource)
+        ]
+        self._tariff_change: float | None = None
+        self._cancel_tariff_change: CALLBACK_TYPE | None = None
+
+        # Recalculate on state changes, on a fixed cadence or both
+        self._update_mode = self._config.get(CONF_UPDATE_MODE, DEFAULT_UPDATE_MODE)
+        self._update_interval = timedelta(
+            seconds=float(
+                self._config.get(CONF_UPDATE_INTERVAL, DEFAULT_UPDATE_INTERVAL)
+            )
+        )
+
+        # Bursts of state changes within this window share one recalculation
+        self._coalesce_window = (
+            float(self._config.get(CONF_COALESCE_WINDOW, DEFAULT_COALESCE_WINDOW))
+            / 1000.0
+        )
+        # Changes reported closer together than a step are integrated as one
+        self._burst_window = max(self._coalesce_window, MIN_DT_HOURS * 3600.0)
+        self._cancel_pending_update: CALLBACK_TYPE | None = None
+
+        # State changes are integrated at the time they were reported and
+        # held for this window, so late ones still land in the right interval
+        self._events = ReorderBuffer(
+            float(self._config.get(CONF_REORDER_WINDOW, DEFAULT_REORDER_WINDOW))
+            / 1000.0
+        )
+
+        # State writes are limited in rate and to significant changes
+        min_write_interval = float(
+            self._config.get(CONF_MIN_WRITE_INTERVAL, DEFAULT_MIN_WRITE_INTERVAL)
+        )
+        self._writes = WriteGate(
+            min_write_interval,
+            float(self._config.get(CONF_WRITE_THRESHOLD, DEFAULT_WRITE_THRESHOLD)),
+        )
+        self._cancel_pending_write: CALLBACK_TYPE | None = None
+
+        # Loads priced from the same calculation step, one sensor each
+        self.consumers = ConsumerMeters(
+            self._config.get(CONF_CONSUMERS) or [], self._method
+        )
+
+        # Tariff and solar forecasts the weighted cost is projected over. The
+        # price entity itself often carries the tariff's upcoming prices.
+        self._price_forecast = self._config.get(CONF_PRICE_FORECAST) or (
+            self._config.get(CONF_GRID_IMPORT_PRICE_VALUE)
+            if self._config.get(CONF_GRID_IMPORT_PRICE_TYPE) == SOURCE_TYPE_ENTITY
+            else None
+        )
+        self._solar_forecast = self._config.get(CONF_SOLAR_FORECAST)
+        self._projection: list[dict[str, Any]] = []
+        self._projection_due = self._price_forecast is not None
+        self._projection_expires: float | None = None
+
+        # Weighted metrics besides the price of the energy used by the home
+        # and of the energy stored in the battery, from the last step with
+        # any supply
+        self.metrics: Metrics | None = None
+        self.battery_metrics: Metrics | None = None
+
+        # Sensors of the accumulated totals, the weighted metrics, the
+        # consumers' costs and the optional runtime statistics
+        self.companion_sensors: list[
+            ConsumerCostSensor | DebugSensor | MetricSensor | TotalSensor
+        ] = []
+        self._companion_writes = WriteGate(
+            max(min_write_interval, COMPANION_WRITE_INTERVAL)
+        )
+
+        # Counters of the hot path for diagnostics
+        self.stats = RuntimeStats(time.monotonic())
 
     async def async_added_to_hass(self) -> None:
         """Handle entity which will be added."""
@@ -100,191 +449,647 @@ class WeightedEnergyCostSensor(RestoreEntity, SensorEntity):
                     if old_state.state not in ["unknown", "unavailable"]
                     else 0.0
                 )
-                self._total_battery_cost = float(
+                self._engine.total_battery_cost = float(
                     old_state.attributes.get("total_battery_cost", 0.0)
                 )
             except (ValueError, TypeError):
-                self._total_battery_cost = 0.0
+                self._engine.total_battery_cost = 0.0
+
+        # Elapsed time is measured on the monotonic clock, which does not
+        # jump with NTP corrections or DST changes
+        self._engine.last_update = now = time.monotonic()
 
-        self._last_update = datetime.now()
+        # Later changes arrive with the state change events
+        refresh_entities(self._entity_index, self.hass.states.get, now)
+        refresh_entities(self.consumers.index, self.hass.states.get, now)
 
+        # The full-precision engine state supersedes the rounded attributes
+        if (extra_data := await self.async_get_last_extra_data()) is not None:
+            self._restore_engine(extra_data.as_dict(), now)
         self.async_on_remove(
             async_track_state_change_event(
-                self.hass, self._entities_to_track, self._handle_state_change
+                self.hass,
+                list(
+                    dict.fromkeys(
+                        [
+                            *self._entities_to_track,
+                            *self.consumers.index,
+                            *self._forecast_entities,
+                        ]
+                    )
+                ),
+                self._handle_state_change,
             )
         )
+        self.async_on_remove(self._async_cancel_pending_update)
+        self.async_on_remove(self._async_cancel_pending_write)
+        self.async_on_remove(self._async_cancel_tariff_change)
+        if self._update_mode != UPDATE_MODE_EVENT:
+            self.async_on_remove(
+                async_track_time_interval(
+                    self.hass, self._handle_interval, self._update_interval
+                )
+            )
         self._update_values_and_calculate()
 
+    @property
+    def extra_restore_state_data(self) -> EngineExtraStoredData:
+        """Return the engine state to be restored after a restart."""
+        # Monotonic times are stored as wall-clock times
+        shift = time.time() - time.monotonic()
+        return EngineExtraStoredData(
+            {
+                "weighted_cost": self._state,
+                **engine_data(self._engine, shift),
+                "counters": counters_data(
+                    (self._entity_index, self.consumers.index), shift
+                ),
+            }
+        )
+
+    def _restore_engine(self, data: Mapping[str, Any], now: float) -> None:
+        """Restore the engine state stored by ``extra_restore_state_data``."""
+        shift = time.monotonic() - time.time()
+        try:
+            if (weighted_cost := data.get("weighted_cost")) is not None:
+                self._state = float(weighted_cost)
+            restore_engine(self._engine, data, now, shift)
+            restore_counters(
+                (self._entity_index, self.consumers.index),
+                data.get("counters", {}),
+                now,
+                shift,
+            )
+        except (KeyError, TypeError, ValueError):
+            _LOGGER.warning(
+                "Could not restore the calculation state of %s", self.entity_id
+            )
+
+    @property
+    def engine(self) -> EngineState:
+        """Return the state of the calculation engine."""
+        return self._engine
+
+    @property
+    def config(self) -> Mapping[str, Any]:
+        """Return the configuration the sensor calculates with."""
+        return self._config
+
+    @property
+    def tracked_entities(self) -> list[str]:
+        """Return the entities this sensor calculates from."""
+        return self._entities_to_track
+
+    @property
+    def total_sensors(self) -> list[TotalSensor]:
+        """Return the sensors of the accumulated totals."""
+        return [
+            companion
+            for companion in self.companion_sensors
+            if isinstance(companion, TotalSensor)
+        ]
+
+    def diagnostics(self) -> dict[str, Any]:
+        """Return the calculation state and runtime statistics."""
+        engine = self._engine
+        now = time.monotonic()
+        return {
+            "engine": {
+                "total_battery_cost": engine.total_battery_cost,
+                "totals": asdict(engine.totals),
+                "last_inputs": (
+                    engine.last_inputs._asdict()
+                    if engine.last_inputs is not None
+                    else None
+                ),
+                "lots": engine.lots.as_list() if engine.lots is not None else None,
+                "stored_kwh": (
+                    engine.soe.stored_kwh if engine.soe is not None else None
+                ),
+                "battery_metrics": asdict(engine.metrics),
+            },
+            "stats": self.stats.as_dict(now),
+            "sources": source_diagnostics(self._entity_index, now),
+            "consumers": source_diagnostics(self.consumers.index, now),
+        }
+
+    @callback
+    def async_start_journal(self) -> float | None:
+        """Record the inputs and hours of every step from now on.
+
+        A recompute continues its replay with the steps taken while it runs.
+        Returns the wall-clock time of the last step, which the recorded
+        steps continue from, or None before the first step.
+        """
+        self._journal = []
+        if self._engine.last_update is None:
+            return None
+        return time.time() - (time.monotonic() - self._engine.last_update)
+
+    @callback
+    def async_take_journal(self) -> list[tuple[StepInputs, float]]:
+        """Stop recording steps and return the recorded ones."""
+        journal, self._journal = self._journal or [], None
+        return journal
+
+    @callback
+    def async_set_battery_cost(
+        self,
+        total_battery_cost: float,
+        totals: EnergyTotals | None = None,
+        lots: BatteryLots | None = None,
+        metrics: BatteryMetrics | None = None,
+    ) -> None:
+        """Replace the battery cost basis and totals, e.g. after a recompute."""
+        self._engine.total_battery_cost = total_battery_cost
+        if self._engine.lots is not None:
+            # Without lots the cost becomes the first lot of the next step
+            self._engine.lots.restore(lots.as_list() if lots is not None else [])
+        if totals is not None:
+            self._engine.totals = replace(totals)
+        if metrics is not None:
+            self._engine.metrics = replace(metrics)
+        self._attr_extra_state_attributes["total_battery_cost"] = round(
+            total_battery_cost, 2
+        )
+        self.async_write_ha_state()
+        if totals is not None:
+            for total in self.total_sensors:
+                total.async_update_from_hub()
+
+    @property
+    def _forecast_entities(self) -> list[str]:
+        """Return the configured forecast entities."""
+        return [
+            entity_id
+            for entity_id in (self._price_forecast, self._solar_forecast)
+            if entity_id
+        ]
+
     @callback
     def _handle_state_change(self, event):
         """Handle tracked entity state change."""
+        entity_id = event.data["entity_id"]
+        new_state = event.data["new_state"]
+        self.stats.state_changes += 1
+        if entity_id in (self._price_forecast, self._solar_forecast):
+            self._projection_due = True
+        if entity_id in self._entity_index or entity_id in self.consumers.index:
+            clock = time.monotonic()
+            if new_state is not None:
+                clock = event_time(
+                    clock, time.time(), new_state.last_updated.timestamp()
+                )
+            if (overflow := self._events.push(clock, entity_id, new_state)) is not None:
+                self._apply_event(overflow)
+        if self._update_mode == UPDATE_MODE_INTERVAL:
+            # The timer picks up the new value
+            return
+        if self._cancel_pending_update is None:
+            self._cancel_pending_update = async_call_later(
+                self.hass,
+                max(self._coalesce_window, self._events.delay),
+                self._handle_coalesced_update,
+            )
+
+    def _apply_event(self, event: Event) -> float:
+        """Update the inputs from a state change and return its time.
+
+        A change from before the last calculation step is applied at that
+        step, as the interval up to it has already been integrated.
+        """
+        timestamp, entity_id, state = event
+        last_update = self._engine.last_update
+        if last_update is not None and timestamp < last_update:
+            timestamp = last_update
+            self.stats.late_events += 1
+        update_entity(self._entity_index, entity_id, state, timestamp)
+        update_entity(self.consumers.index, entity_id, state, timestamp)
+        return timestamp
+
+    @callback
+    def _handle_coalesced_update(self, _now: datetime) -> None:
+        """Recalculate once for all state changes in the coalescing window."""
+        self._cancel_pending_update = None
+        self._update_values_and_calculate(events_only=True)
+        if (due := self._events.next_due()) is not None:
+            # Changes still held for the reorder window
+            self._cancel_pending_update = async_call_later(
+                self.hass,
+                max(due - time.monotonic(), 0.0),
+                self._handle_coalesced_update,
+            )
+
+    @callback
+    def _handle_interval(self, _now: datetime) -> None:
+        """Recalculate on the fixed cadence."""
         self._update_values_and_calculate()
 
-    def _get_kw_value(self, type_key, value_key, dt_hours):
-        """Get value and normalize to kW."""
-        t = self.entry.data.get(type_key)
-        v = self.entry.data.get(value_key)
+    @callback
+    def _handle_tariff_change(self, when: datetime) -> None:
+        """Recalculate at a price change of a tariff schedule."""
+        self._cancel_tariff_change = None
+        self._tariff_change = None
+        # Integrate up to the boundary at the old price, then show the new
+        # price right away without integrating again
+        self._update_values_and_calculate(when.timestamp())
+        self._update_values_and_calculate(integrate=False)
 
-        if t == SOURCE_TYPE_FIXED:
-            try:
-                # For fixed values, we assume it's kW if small, W if > 10.
-                val = float(v)
-                return val / 1000.0 if val > 10 else val
-            except (ValueError, TypeError):
-                return 0.0
+    @callback
+    def _async_track_tariff_change(self, next_change: float | None) -> None:
+        """Schedule a recalculation at the next price change of a schedule."""
+        if next_change == self._tariff_change:
+            return
+        self._async_cancel_tariff_change()
+        self._tariff_change = next_change
+        if next_change is not None:
+            # Calculations run the reorder window behind, so the boundary is
+            # reached that much later
+            self._cancel_tariff_change = async_track_point_in_utc_time(
+                self.hass,
+                self._handle_tariff_change,
+                dt_util.utc_from_timestamp(next_change + self._events.delay),
+            )
 
-        state = self.hass.states.get(v)
-        if not state or state.state in ["unknown", "unavailable"]:
-            return 0.0
+    @callback
+    def _async_cancel_tariff_change(self) -> None:
+        """Cancel the recalculation at the next tariff change."""
+        if self._cancel_tariff_change is not None:
+            self._cancel_tariff_change()
+            self._cancel_tariff_change = None
+            self._tariff_change = None
 
-        try:
-            val = float(state.state)
-            device_class = state.attributes.get("device_class")
-            unit = state.attributes.get(ATTR_UNIT_OF_MEASUREMENT, "")
-
-            # If it's an energy sensor, calculate rate
-            if device_class == SensorDeviceClass.ENERGY or unit.lower() in [
-                "kwh",
-                "mwh",
-            ]:
-                last_val = self._last_energy_values.get(v)
-                self._last_energy_values[v] = val
-                if last_val is not None and dt_hours > 0:
-                    delta = val - last_val
-                    if delta < 0:  # Handle reset
-                        return 0.0
-                    return delta / dt_hours
-                return 0.0
-
-            # If it's power, just convert to kW
-            if unit.lower() == "w":
-                return val / 1000.0
-            return val
-        except ValueError:
-            return 0.0
-
-    def _get_price(self, type_key, value_key):
-        """Get price value."""
-        t = self.entry.data.get(type_key)
-        v = self.entry.data.get(value_key)
-        if t == SOURCE_TYPE_FIXED:
-            try:
-                return float(v)
-            except (ValueError, TypeError):
-                return 0.0
-        state = self.hass.states.get(v)
-        if state and state.state not in ["unknown", "unavailable"]:
-            try:
-                return float(state.state)
-            except ValueError:
-                return 0.0
-        return 0.0
-
-    def _get_energy_kwh(self, type_key, value_key):
-        """Get energy in kWh."""
-        t = self.entry.data.get(type_key)
-        v = self.entry.data.get(value_key)
-        if t == SOURCE_TYPE_FIXED:
-            try:
-                return float(v)
-            except (ValueError, TypeError):
-                return 0.0
-        state = self.hass.states.get(v)
-        if state and state.state not in ["unknown", "unavailable"]:
-            try:
-                return float(state.state)
-            except ValueError:
-                return 0.0
-        return 0.0
+    @callback
+    def _async_write_if_due(self) -> None:
+        """Write the state unless it is too soon or the change is too small."""
+        if self._cancel_pending_write is not None:
+            # A trailing write is already scheduled and picks up this value
+            return
 
-    def _update_values_and_calculate(self):
-        """Update internal values and perform calculation."""
-        now = datetime.now()
-        if self._last_update is None:
-            self._last_update = now
+        if not self._writes.changed(self._state):
+            self.stats.suppressed_writes += 1
+            # The totals still grow while the weighted cost holds
+            self._async_write_companions(time.monotonic())
             return
 
-        dt = (now - self._last_update).total_seconds() / 3600.0  # hours
-        # We allow small dt for energy calculation, but it needs to be > 0
-        if dt < 0.0001:  # less than ~0.3 seconds
+        now = time.monotonic()
+        if (remaining := self._writes.wait(now)) > 0:
+            self.stats.held_writes += 1
+            self._cancel_pending_write = async_call_later(
+                self.hass, remaining, self._handle_pending_write
+            )
             return
+        self._async_write(now)
 
-        # 1. Fetch current values (kW and Price)
-        grid_kw = self._get_kw_value(
-            CONF_GRID_IMPORT_SOURCE_TYPE, CONF_GRID_IMPORT_SOURCE_VALUE, dt
-        )
-        grid_price = self._get_price(
-            CONF_GRID_IMPORT_PRICE_TYPE, CONF_GRID_IMPORT_PRICE_VALUE
-        )
-        solar_kw = self._get_kw_value(
-            CONF_SOLAR_SOURCE_TYPE, CONF_SOLAR_SOURCE_VALUE, dt
-        )
-        solar_price = self._get_price(CONF_SOLAR_PRICE_TYPE, CONF_SOLAR_PRICE_VALUE)
-        bat_pow_kw = self._get_kw_value(
-            CONF_BATTERY_POWER_SOURCE_TYPE, CONF_BATTERY_POWER_SOURCE_VALUE, dt
-        )
-        bat_energy_kwh = self._get_energy_kwh(
-            CONF_BATTERY_ENERGY_SOURCE_TYPE, CONF_BATTERY_ENERGY_SOURCE_VALUE
-        )
+    @callback
+    def _handle_pending_write(self, _now: datetime) -> None:
+        """Write the latest state once the minimum write interval has passed."""
+        self._cancel_pending_write = None
+        self._async_write(time.monotonic())
 
-        # 2. Update Battery Cost Accumulator
-        # Charging (bat_pow_kw < 0)
-        if bat_pow_kw < 0:
-            charge_kw = abs(bat_pow_kw)
-            # Source mix price
-            total_source = grid_kw + solar_kw
-            if total_source > 0.001:
-                mix_price = (
-                    grid_kw * grid_price + solar_kw * solar_price
-                ) / total_source
-                self._total_battery_cost += (charge_kw * dt) * mix_price
-
-        # 3. Determine current Battery Price
-        current_battery_price = 0.0
-        if bat_energy_kwh > 0.01:
-            current_battery_price = self._total_battery_cost / bat_energy_kwh
-
-        # 4. Discharge (bat_pow_kw > 0)
-        if bat_pow_kw > 0:
-            discharge_kw = bat_pow_kw
-            energy_removed = discharge_kw * dt
-            # Remove cost from battery proportionally
-            self._total_battery_cost -= energy_removed * current_battery_price
-            if self._total_battery_cost < 0:
-                self._total_battery_cost = 0.0
-
-        # 5. Final Calculation: Cost of supply to the home
-        # Home supply = Grid_Import + Solar + Battery_Discharge
-        bat_discharge_kw = max(0, bat_pow_kw)
-        total_supply_kw = grid_kw + solar_kw + bat_discharge_kw
-
-        if total_supply_kw > 0.001:
-            weighted_cost = (
-                grid_kw * grid_price
-                + solar_kw * solar_price
-                + bat_discharge_kw * current_battery_price
-            ) / total_supply_kw
-            self._state = round(weighted_cost, 4)
-        else:
-            # If no supply, default to grid price if available
-            if grid_price > 0:
-                self._state = round(grid_price, 4)
+    @callback
+    def _async_write(self, now: float) -> None:
+        """Write the state and record the write."""
+        self._writes.record(now, self._state)
+        self.stats.writes += 1
+        self.async_write_ha_state()
+        self._async_write_companions(now)
+
+    @callback
+    def _async_write_companions(self, now: float) -> None:
+        """Write the companion sensors unless they were written too recently.
+
+        Their totals accumulate between writes, so a skipped write only
+        delays the update until a later write of the main sensor.
+        """
+        if self._companion_writes.wait(now) > 0:
+            return
+        self._companion_writes.record(now)
+        for companion in self.companion_sensors:
+            companion.async_update_from_hub()
+
+    @callback
+    def _async_cancel_pending_write(self) -> None:
+        """Cancel a scheduled state write."""
+        if self._cancel_pending_write is not None:
+            self._cancel_pending_write()
+            self._cancel_pending_write = None
+
+    @callback
+    def _async_cancel_pending_update(self) -> None:
+        """Cancel a scheduled recalculation."""
+        if self._cancel_pending_update is not None:
+            self._cancel_pending_update()
+            self._cancel_pending_update = None
+
+    def _update_values_and_calculate(
+        self,
+        wall: float | None = None,
+        integrate: bool = True,
+        events_only: bool = False,
+    ):
+        """Update internal values and perform calculation.
+
+        State changes held for the reorder window are applied in the order
+        they were reported. In event mode each burst of them is integrated
+        up to the time it was reported; with ``events_only`` that is all,
+        otherwise the calculation is then integrated up to the current time
+        less the reorder window. Tariff schedules are looked up at the time
+        of each step, with ``wall`` (seconds since the epoch) standing for
+        the current time. Without ``integrate`` the state is recalculated
+        from the current inputs without advancing the clock.
+        """
+        started = time.perf_counter()
+        now = datetime.now()
+        clock = time.monotonic()
+        if wall is None:
+            wall = time.time()
+        stepped = None
+        for burst in bursts(self._events.release(clock), self._burst_window):
+            for event in burst:
+                timestamp = self._apply_event(event)
+            if integrate and self._update_mode != UPDATE_MODE_INTERVAL:
+                stepped = self._step(timestamp, wall - (clock - timestamp)) or stepped
+        if not events_only:
+            horizon = clock - self._events.delay
+            stepped = (
+                self._step(horizon, wall - self._events.delay, integrate) or stepped
+            )
+        if stepped is None:
+            return
+        inputs, result = stepped
+
+        if self._price_forecast is not None and (
+            self._projection_due
+            or (
+                self._projection_expires is not None
+                and time.time() >= self._projection_expires
+            )
+        ):
+            self._update_projection(inputs, result)
 
         # Update attributes for transparency
         self._attr_extra_state_attributes = {
-            "total_battery_cost": round(self._total_battery_cost, 2),
-            "battery_energy_kwh": bat_energy_kwh,
-            "battery_unit_price": round(current_battery_price, 4),
-            "grid_kw": round(grid_kw, 3),
-            "solar_kw": round(solar_kw, 3),
-            "battery_kw": round(bat_pow_kw, 3),
+            "total_battery_cost": round(result.total_battery_cost, 2),
+            "battery_energy_kwh": round(result.battery_kwh, 3),
+            "battery_unit_price": round(result.battery_unit_price, 4),
+            "grid_kw": round(inputs.grid_kw, 3),
+            "solar_kw": round(inputs.solar_kw, 3),
+            "battery_kw": round(inputs.battery_kw, 3),
+            "export_kw": round(inputs.export_kw, 3),
             "last_update": now.isoformat(),
         }
+        if self._projection:
+            self._attr_extra_state_attributes["projection"] = self._projection
 
-        self._last_update = now
-        self.async_write_ha_state()
+        self._async_write_if_due()
+        self.stats.updates += 1
+        self.stats.latency.record(time.perf_counter() - started)
+
+    def _step(
+        self, clock: float, wall: float, integrate: bool = True
+    ) -> tuple[StepInputs, StepResult] | None:
+        """Integrate up to ``clock`` and return the inputs and result.
+
+        Returns None if the step is skipped as too short.
+        """
+        if self._schedules:
+            self._async_track_tariff_change(update_schedules(self._schedules, wall))
+        if integrate:
+            first = self._engine.last_update is None
+            dt = advance(self._engine, clock)  # hours
+            if dt is None:
+                if not first:
+                    self.stats.skipped_updates += 1
+                return None
+        else:
+            dt = 0.0
+
+        # 1. Fetch current values (kW and Price)
+        inputs = read_inputs(self._sources, self._engine, clock)
+
+        # 2. Update battery cost basis and weighted cost
+        result = step(self._engine, inputs, dt, self._method)
+        if self._journal is not None:
+            self._journal.append((inputs, dt))
+        previous_state = self._state
+        if result.weighted_cost is not None:
+            self._state = round(result.weighted_cost, 4)
+        if result.metrics is not None:
+            self.metrics = result.metrics
+            self.battery_metrics = result.battery_metrics
+        if self.consumers.sources:
+            self.consumers.step(clock, dt, self._state, previous_state)
+        return inputs, result
+
+    def _update_projection(self, inputs: StepInputs, result: StepResult) -> None:
+        """Project the weighted cost over the tariff and solar forecasts.
+
+        The current load is assumed to continue. The projection is redone
+        when a forecast changes and when its first slot has passed.
+        """
+        self._projection_due = False
+        self._projection_expires = None
+        self._projection = []
+        if (price_state := self.hass.states.get(self._price_forecast)) is None:
+            return
+        prices = parse_forecast(price_state.attributes, dt_util.start_of_local_day())
+        if not prices.start.size:
+            return
+        solar_kw = None
+        if self._solar_forecast and (
+            solar_state := self.hass.states.get(self._solar_forecast)
+        ):
+            solar_kw = resample(
+                parse_forecast(solar_state.attributes), prices.start, prices.end
+            )
+
+        projection = project(
+            prices,
+            solar_kw if solar_kw is not None else np.zeros(prices.start.size),
+            load_kw=(
+                inputs.grid_kw + inputs.solar_kw + inputs.battery_kw - inputs.export_kw
+            ),
+            solar_price=solar_unit_cost(inputs),
+            battery_kwh=result.battery_kwh,
+            total_battery_cost=result.total_battery_cost,
+            now=time.time(),
+        )
+        if not projection.start.size:
+            return
+        self._projection_expires = float(projection.end[0])
+        self._projection = [
+            {
+                "start": dt_util.utc_from_timestamp(start).isoformat(),
+                "weighted_cost": round(weighted_cost, 4),
+            }
+            for start, weighted_cost in zip(
+                projection.start.tolist(), projection.weighted_cost.tolist()
+            )
+        ]
 
     @property
     def native_value(self):
         """Return the state of the sensor."""
         return self._state
+
+
+class EngineExtraStoredData(ExtraStoredData):
+    """Full-precision engine state stored with the sensor's last state."""
+
+    def __init__(self, data: dict[str, Any]) -> None:
+        """Initialize the stored data."""
+        self.data = data
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the stored data."""
+        return self.data
+
+
+class _HubCompanionSensor(SensorEntity):
+    """A sensor written by the hub after its calculations.
+
+    Subclasses look up their value with the ``value_fn`` of their entity
+    description.
+    """
+
+    entity_description: (
+        TotalSensorDescription | MetricSensorDescription | DebugSensorDescription
+    )
+    _attr_should_poll = False
+
+    def __init__(
+        self,
+        hub: WeightedEnergyCostSensor,
+        description: (
+            TotalSensorDescription | MetricSensorDescription | DebugSensorDescription
+        ),
+    ) -> None:
+        """Initialize the sensor."""
+        self.entity_description = description
+        self._hub = hub
+        self._attr_name = f"{hub.name} {description.name}"
+        self._attr_unique_id = f"{hub.unique_id}_{description.key}"
+        self._added = False
+
+    async def async_added_to_hass(self) -> None:
+        """Handle entity which will be added."""
+        await super().async_added_to_hass()
+        self._added = True
+
+    async def async_will_remove_from_hass(self) -> None:
+        """Stop receiving updates from the hub."""
+        self._added = False
+
+    @callback
+    def async_update_from_hub(self) -> None:
+        """Write the state after a calculation of the hub."""
+        if self._added:
+            self.async_write_ha_state()
+
+
+class TotalSensor(_HubCompanionSensor):
+    """One of the totals the hub's engine accumulates.
+
+    The totals are stored with the hub's engine state, so this sensor does
+    not restore anything itself.
+    """
+
+    entity_description: TotalSensorDescription
+
+    @property
+    def native_value(self) -> float:
+        """Return the accumulated total."""
+        return round(self.entity_description.value_fn(self._hub.engine.totals), 4)
+
+
+class MetricSensor(_HubCompanionSensor):
+    """One of the metrics the hub weights along with the price."""
+
+    entity_description: MetricSensorDescription
+
+    @property
+    def native_value(self) -> float | None:
+        """Return the metric, None until the hub has calculated it."""
+        if self._hub.metrics is None or self._hub.battery_metrics is None:
+            return None
+        return self.entity_description.value_fn(
+            self._hub.metrics, self._hub.battery_metrics
+        )
+
+
+class DebugSensor(_HubCompanionSensor):
+    """One of the hub's runtime statistics, counted since setup."""
+
+    entity_description: DebugSensorDescription
+    _attr_entity_category = EntityCategory.DIAGNOSTIC
+
+    @property
+    def native_value(self) -> float:
+        """Return the statistic."""
+        return self.entity_description.value_fn(self._hub.stats)
+
+
+class ConsumerCostSensor(RestoreEntity, SensorEntity):
+    """Accumulated cost of one consumer supplied at the weighted cost."""
+
+    _attr_device_class = SensorDeviceClass.MONETARY
+    _attr_state_class = SensorStateClass.TOTAL
+    _attr_native_unit_of_measurement = "€"
+    _attr_icon = "mdi:cash"
+    _attr_should_poll = False
+    _unrecorded_attributes = frozenset({"power_kw", "cost_rate"})
+
+    def __init__(
+        self, hass: HomeAssistant, hub: WeightedEnergyCostSensor, entity_id: str
+    ) -> None:
+        """Initialize the sensor."""
+        self.hass = hass
+        self._hub = hub
+        self._consumer = entity_id
+        self._meter = hub.consumers.states[entity_id]
+        consumer_state = hass.states.get(entity_id)
+        consumer_name = consumer_state.name if consumer_state else entity_id
+        self._attr_name = f"{hub.name} {consumer_name} cost"
+        self._attr_unique_id = f"{hub.unique_id}_{entity_id}_cost"
+        self._added = False
+
+    async def async_added_to_hass(self) -> None:
+        """Handle entity which will be added."""
+        await super().async_added_to_hass()
+
+        if (old_state := await self.async_get_last_state()) is not None:
+            # The hub may already have accumulated cost since startup
+            try:
+                self._meter.total_cost += float(old_state.state)
+                self._meter.energy_kwh += float(
+                    old_state.attributes.get("energy_kwh", 0.0)
+                )
+            except (ValueError, TypeError):
+                pass
+        self._added = True
+
+    async def async_will_remove_from_hass(self) -> None:
+        """Stop receiving updates from the hub."""
+        self._added = False
+
+    @callback
+    def async_update_from_hub(self) -> None:
+        """Write the state after a calculation of the hub."""
+        if self._added:
+            self.async_write_ha_state()
+
+    @property
+    def native_value(self) -> float:
+        """Return the accumulated cost."""
+        return round(self._meter.total_cost, 4)
+
+    @property
+    def extra_state_attributes(self) -> dict[str, Any]:
+        """Return the consumer's energy, power and current cost rate."""
+        return {
+            "consumer_entity": self._consumer,
+            "energy_kwh": round(self._meter.energy_kwh, 4),
+            "power_kw": round(self._meter.power_kw, 3),
+            "cost_rate": round(self._meter.cost_rate, 4),
+        }
@@ -0,0 +1,125 @@
+"""Runtime statistics of the Weighted Energy Cost Sensor.
+
+The hot path counts the state changes it receives, the recalculations it
+runs or skips and the state writes it makes, and records the duration of
+every recalculation in a histogram with fixed buckets. Recording is a few
+integer additions, so the statistics are always on. Like the engine, this
+module does not import Home Assistant.
+"""
+
+from __future__ import annotations
+
+from bisect import bisect_left
+from collections.abc import Mapping
+from dataclasses import dataclass, field
+from typing import Any
+
+from .inputs import EntitySource
+
+# Upper edges of the latency buckets in microseconds; slower updates fall
+# into a last, open bucket
+LATENCY_BUCKETS_US = (50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+
+class LatencyHistogram:
+    """Durations counted in fixed buckets, with their sum and maximum."""
+
+    __slots__ = ("_edges", "counts", "total", "max")
+
+    def __init__(self, edges_us: tuple[int, ...] = LATENCY_BUCKETS_US) -> None:
+        """Initialize an empty histogram."""
+        self._edges = [edge / 1e6 for edge in edges_us]
+        self.counts = [0] * (len(edges_us) + 1)
+        self.total = 0.0
+        self.max = 0.0
+
+    @property
+    def count(self) -> int:
+        """Return the number of recorded durations."""
+        return sum(self.counts)
+
+    def record(self, seconds: float) -> None:
+        """Count a duration in seconds."""
+        self.counts[bisect_left(self._edges, seconds)] += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def mean_us(self) -> float:
+        """Return the mean duration in microseconds."""
+        count = self.count
+        return self.total * 1e6 / count if count else 0.0
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the bucket counts keyed by their upper edge in µs."""
+        labels = [f"<={edge * 1e6:g}" for edge in self._edges]
+        labels.append(f">{self._edges[-1] * 1e6:g}")
+        return {
+            "count": self.count,
+            "mean_us": round(self.mean_us(), 1),
+            "max_us": round(self.max * 1e6, 1),
+            "buckets_us": dict(zip(labels, self.counts)),
+        }
+
+
+@dataclass(slots=True)
+class RuntimeStats:
+    """Counters of the sensor's hot path since it was set up.
+
+    ``skipped_updates`` are recalculations dropped because too little time
+    had passed since the last step, ``late_events`` state changes reported
+    before the last step and applied at it, ``held_writes`` state writes
+    delayed by the minimum write interval and ``suppressed_writes`` those
+    dropped as below the write threshold.
+    """
+
+    started: float
+    state_changes: int = 0
+    updates: int = 0
+    skipped_updates: int = 0
+    late_events: int = 0
+    writes: int = 0
+    held_writes: int = 0
+    suppressed_writes: int = 0
+    latency: LatencyHistogram = field(default_factory=LatencyHistogram)
+
+    def as_dict(self, now: float) -> dict[str, Any]:
+        """Return the counters and their rates per hour up to ``now``."""
+        hours = max(now - self.started, 1.0) / 3600.0
+        return {
+            "uptime_s": round(now - self.started, 1),
+            "state_changes": self.state_changes,
+            "updates": self.updates,
+            "skipped_updates": self.skipped_updates,
+            "late_events": self.late_events,
+            "writes": self.writes,
+            "held_writes": self.held_writes,
+            "suppressed_writes": self.suppressed_writes,
+            "updates_per_hour": round(self.updates / hours, 1),
+            "writes_per_hour": round(self.writes / hours, 1),
+            "latency": self.latency.as_dict(),
+        }
+
+
+def source_diagnostics(
+    index: Mapping[str, list[EntitySource]], now: float
+) -> dict[str, dict[str, Any]]:
+    """Return the staleness and counter resets of every tracked entity.
+
+    ``age_s`` is the time since the entity's last valid reading, None while
+    it is unavailable.
+    """
+    result: dict[str, dict[str, Any]] = {}
+    for entity_id, sources in index.items():
+        source = sources[0]
+        counter = next(
+            (source.counter for source in sources if source.counter is not None),
+            None,
+        )
+        result[entity_id] = {
+            "age_s": (
+                None if source.updated is None else round(now - source.updated, 1)
+            ),
+            "counter_resets": None if counter is None else counter.resets,
+        }
+    return result
@@ -0,0 +1,204 @@
+"""Time-of-use tariff schedules for the Weighted Energy Cost Sensor.
+
+A schedule is written as one rule per line:
+
+    [MM-DD..MM-DD] [days] HH:MM-HH:MM price
+
+The optional season limits a rule to a range of dates, which may wrap
+around the new year, and the optional days to weekdays such as ``mon-fri``
+or ``sat,sun``. A time band that ends before it starts wraps past midnight
+and covers both ends of each matching day. The first rule matching a time
+sets the price; times no rule matches are priced at 0. Lines starting with
+``#`` are comments. For example:
+
+    10-01..03-31 mon-fri 17:00-20:00 0.38
+    mon-fri 07:00-22:00 0.32
+    00:00-24:00 0.24
+
+The rules are compiled into sorted price changes per local calendar year,
+which are looked up by bisection. Like the engine, this module does not
+import Home Assistant.
+"""
+
+from __future__ import annotations
+
+import re
+from bisect import bisect_left, bisect_right
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta, timezone, tzinfo
+
+WEEKDAYS = ("mon", "tue", "wed", "thu", "fri", "sat", "sun")
+ALL_DAYS = frozenset(range(7))
+MINUTES_PER_DAY = 1440
+
+_SEASON = re.compile(r"^(\d\d)-(\d\d)\.\.(\d\d)-(\d\d)$")
+_BAND = re.compile(r"^(\d\d?):(\d\d)-(\d\d?):(\d\d)$")
+
+
+class ScheduleError(ValueError):
+    """A tariff schedule could not be parsed."""
+
+
+@dataclass(frozen=True, slots=True)
+class TariffRule:
+    """One band of a tariff schedule.
+
+    ``start`` and ``end`` are minutes of the day with ``start < end``, the
+    season is a pair of ``month * 100 + day`` dates or None for all year.
+    """
+
+    start: int
+    end: int
+    price: float
+    days: frozenset[int] = ALL_DAYS
+    season: tuple[int, int] | None = None
+
+    def applies(self, weekday: int, month_day: int) -> bool:
+        """Return whether the rule applies on a day."""
+        if weekday not in self.days:
+            return False
+        if self.season is None:
+            return True
+        first, last = self.season
+        if first <= last:
+            return first <= month_day <= last
+        return month_day >= first or month_day <= last
+
+
+def _parse_days(token: str) -> frozenset[int]:
+    """Parse weekdays like ``mon-fri`` or ``sat,sun``."""
+    days: set[int] = set()
+    for part in token.split(","):
+        first, _, last = part.partition("-")
+        try:
+            start = WEEKDAYS.index(first)
+            end = WEEKDAYS.index(last) if last else start
+        except ValueError as err:
+            raise ScheduleError(f"Unknown weekday in {token!r}") from err
+        days.update((start + i) % 7 for i in range((end - start) % 7 + 1))
+    return frozenset(days)
+
+
+def _minutes(hours: str, minutes: str) -> int:
+    """Return the minute of the day of a time, allowing 24:00."""
+    value = int(hours) * 60 + int(minutes)
+    if int(minutes) >= 60 or value > MINUTES_PER_DAY:
+        raise ScheduleError(f"Invalid time {hours}:{minutes}")
+    return value
+
+
+def parse_schedule(text: str) -> list[TariffRule]:
+    """Parse the rules of a schedule, raising ``ScheduleError`` if invalid."""
+    rules: list[TariffRule] = []
+    for line in text.splitlines():
+        tokens = line.split("#", 1)[0].split()
+        if not tokens:
+            continue
+        try:
+            price = float(tokens.pop())
+        except ValueError as err:
+            raise ScheduleError(f"Missing price in {line!r}") from err
+        if not tokens or not (band := _BAND.match(tokens.pop())):
+            raise ScheduleError(f"Missing time band in {line!r}")
+
+        season = None
+        days = ALL_DAYS
+        for token in tokens:
+            if match := _SEASON.match(token):
+                first_month, first_day, last_month, last_day = map(int, match.groups())
+                season = (first_month * 100 + first_day, last_month * 100 + last_day)
+            else:
+                days = _parse_days(token.lower())
+
+        start = _minutes(band[1], band[2])
+        end = _minutes(band[3], band[4])
+        if start < end:
+            rules.append(TariffRule(start, end, price, days, season))
+        elif start > end:
+            rules.append(TariffRule(start, MINUTES_PER_DAY, price, days, season))
+            if end:
+                rules.append(TariffRule(0, end, price, days, season))
+        else:
+            rules.append(TariffRule(0, MINUTES_PER_DAY, price, days, season))
+
+    if not rules:
+        raise ScheduleError("The schedule has no rules")
+    return rules
+
+
+class TariffSchedule:
+    """Price changes of a schedule, compiled one local year at a time."""
+
+    __slots__ = ("rules", "time_zone", "_year", "_starts", "_prices", "_end")
+
+    def __init__(
+        self, rules: list[TariffRule], time_zone: tzinfo | None = None
+    ) -> None:
+        """Initialize the schedule for the given local time zone."""
+        self.rules = rules
+        self.time_zone = time_zone or timezone.utc
+        self._year: int | None = None
+        self._starts: list[float] = []
+        self._prices: list[float] = []
+        self._end = 0.0
+
+    def lookup(self, timestamp: float) -> tuple[float, float]:
+        """Return the price at ``timestamp`` and the time of the next change.
+
+        A price applies from just after its start up to and including its
+        end, so a calculation step at a boundary integrates the interval
+        before it at the old price. The start of a year always counts as a
+        change, as each year is compiled on its own.
+        """
+        starts = self._starts
+        i = bisect_left(starts, timestamp) - 1
+        if i < 0 or timestamp > self._end:
+            # The day containing the time, with the boundary belonging to
+            # the day before
+            local = datetime.fromtimestamp(timestamp, self.time_zone)
+            if local.hour == local.minute == local.second == local.microsecond == 0:
+                local -= timedelta(days=1)
+            self._compile(local.year)
+            starts = self._starts
+            i = bisect_left(starts, timestamp) - 1
+        price = self._prices[i]
+        # The next change strictly after the time, possibly in the next year
+        j = bisect_right(starts, timestamp)
+        following = starts[j] if j < len(starts) else self._end
+        if following <= timestamp:
+            following = self.lookup(timestamp + 1.0)[1]
+        return price, following
+
+    def _compile(self, year: int) -> None:
+        """Compile the price changes of a local calendar year."""
+        if year == self._year:
+            return
+        zone = self.time_zone
+        starts: list[float] = []
+        prices: list[float] = []
+        day = date(year, 1, 1)
+        while day.year == year:
+            weekday = day.weekday()
+            month_day = day.month * 100 + day.day
+            rules = [rule for rule in self.rules if rule.applies(weekday, month_day)]
+            cuts = sorted(
+                {0, MINUTES_PER_DAY}
+                | {rule.start for rule in rules}
+                | {rule.end for rule in rules}
+            )
+            midnight = datetime(day.year, day.month, day.day, tzinfo=zone)
+            for first, last in zip(cuts, cuts[1:]):
+                price = next(
+                    (r.price for r in rules if r.start <= first and last <= r.end),
+                    0.0,
+                )
+                if not prices or prices[-1] != price:
+                    # Wall-clock arithmetic, so DST days have 23 or 25 hours
+                    starts.append((midnight + timedelta(minutes=first)).timestamp())
+                    prices.append(price)
+            day += timedelta(days=1)
+
+        self._year = year
+        self._starts = starts
+        self._prices = prices
+        self._end = datetime(year + 1, 1, 1, tzinfo=zone).timestamp()
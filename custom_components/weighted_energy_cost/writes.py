@@ -0,0 +1,38 @@
+"""Rate limits and change thresholds of the sensors' state writes.
+
+Every state write becomes a row in the recorder. A value is written only
+when it changed by at least a threshold since its last write, and at most
+once per minimum interval; a write held back by the interval is made once
+it has passed, with the value current then. Like the engine, this module
+does not import Home Assistant.
+"""
+
+from __future__ import annotations
+
+
+class WriteGate:
+    """The last write of a value and when the next one is allowed."""
+
+    __slots__ = ("min_interval", "threshold", "last_write", "written")
+
+    def __init__(self, min_interval: float = 0.0, threshold: float = 0.0) -> None:
+        """Initialize a gate that has not written yet."""
+        self.min_interval = min_interval
+        self.threshold = threshold
+        self.last_write: float | None = None
+        self.written: float | None = None
+
+    def changed(self, value: float) -> bool:
+        """Return whether ``value`` differs enough from the written one."""
+        return self.written is None or abs(value - self.written) >= self.threshold
+
+    def wait(self, now: float) -> float:
+        """Return the seconds from ``now`` until a write is allowed."""
+        if self.last_write is None:
+            return 0.0
+        return max(self.last_write + self.min_interval - now, 0.0)
+
+    def record(self, now: float, value: float | None = None) -> None:
+        """Record a write of ``value`` at ``now``."""
+        self.last_write = now
+        self.written = value
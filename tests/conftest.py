@@ -0,0 +1,13 @@
+"""Test configuration for the weighted energy cost integration."""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "tools"))
+
+from _bootstrap import register_package  # noqa: E402
+
+# The calculation modules do not depend on Home Assistant. When it is not
+# installed, they are imported without running the integration's
+# ``__init__``.
+register_package(unless_installed=True)
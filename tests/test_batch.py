@@ -0,0 +1,124 @@
+"""Tests for the vectorized batch engine."""
+
+from dataclasses import astuple
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from custom_components.weighted_energy_cost.batch import run_batch
+from custom_components.weighted_energy_cost.engine import (
+    EngineState,
+    StepInputs,
+    advance,
+    step,
+)
+
+
+def _reference(state, ts, columns, initial_cost=0.0, method="right"):
+    """Feed samples one by one through the per-event engine."""
+    cost, price, basis = [], [], []
+    weighted, unit_price = initial_cost, 0.0
+    for i, t in enumerate(ts):
+        dt = advance(state, float(t))
+        if dt is not None:
+            result = step(
+                state, StepInputs(*(float(c[i]) for c in columns)), dt, method
+            )
+            if result.weighted_cost is not None:
+                weighted = result.weighted_cost
+            unit_price = result.battery_unit_price
+        cost.append(weighted)
+        price.append(unit_price)
+        basis.append(state.total_battery_cost)
+    return np.array(cost), np.array(price), np.array(basis)
+
+
+def _samples(n, seed=1, negative_prices=False):
+    rng = np.random.default_rng(seed)
+    ts = np.cumsum(rng.choice([0.1, 0.5, 1.0, 5.0, 60.0], size=n))
+    grid = np.clip(rng.normal(1.0, 1.5, n), 0, None)
+    grid_price = rng.uniform(-0.1 if negative_prices else 0.0, 0.4, n)
+    solar = np.clip(rng.normal(1.0, 2.0, n), 0, None)
+    solar_price = np.full(n, 0.08)
+    battery = rng.normal(0.0, 3.0, n)
+    battery_kwh = rng.uniform(0.0, 0.5, n)
+    return ts, (grid, grid_price, solar, solar_price, battery, battery_kwh)
+
+
+@pytest.mark.parametrize("negative_prices", [False, True])
+@pytest.mark.parametrize("method", ["right", "left", "trapezoidal"])
+def test_batch_matches_engine(negative_prices, method):
+    ts, columns = _samples(20000, negative_prices=negative_prices)
+    reference = EngineState(total_battery_cost=0.5)
+    expected = _reference(reference, ts, columns, method=method)
+
+    state = EngineState(total_battery_cost=0.5)
+    result = run_batch(state, ts, *columns, method=method, block_size=256)
+
+    np.testing.assert_allclose(result.weighted_cost, expected[0], rtol=1e-9, atol=1e-9)
+    np.testing.assert_allclose(
+        result.battery_unit_price, expected[1], rtol=1e-9, atol=1e-9
+    )
+    np.testing.assert_allclose(
+        result.total_battery_cost, expected[2], rtol=1e-9, atol=1e-9
+    )
+    assert state.last_update == ts[result.stepped][-1]
+    assert astuple(state.totals) == pytest.approx(astuple(reference.totals))
+
+
+@pytest.mark.parametrize("method", ["right", "trapezoidal"])
+def test_batch_matches_engine_with_export(method):
+    ts, columns = _samples(5000, seed=3)
+    rng = np.random.default_rng(4)
+    export = np.clip(rng.normal(0.5, 1.5, ts.size), 0, None)
+    feed_in = rng.uniform(0.0, 0.12, ts.size)
+    reference = EngineState(total_battery_cost=0.5)
+    expected = _reference(reference, ts, (*columns, export, feed_in), method=method)
+
+    state = EngineState(total_battery_cost=0.5)
+    result = run_batch(
+        state, ts, *columns, method=method, export_kw=export, feed_in_price=feed_in
+    )
+
+    np.testing.assert_allclose(result.weighted_cost, expected[0], rtol=1e-9, atol=1e-9)
+    np.testing.assert_allclose(
+        result.total_battery_cost, expected[2], rtol=1e-9, atol=1e-9
+    )
+    assert state.last_inputs == pytest.approx(reference.last_inputs)
+    assert astuple(state.totals) == pytest.approx(astuple(reference.totals))
+
+
+def test_batch_chunks_continue_state():
+    ts, columns = _samples(5000, seed=7)
+    reference = EngineState()
+    expected = _reference(reference, ts, columns, method="trapezoidal")
+
+    state = EngineState()
+    weighted = 0.0
+    parts = []
+    for start in range(0, ts.size, 1234):
+        chunk = slice(start, start + 1234)
+        result = run_batch(
+            state,
+            ts[chunk],
+            *(c[chunk] for c in columns),
+            initial_cost=weighted,
+            method="trapezoidal",
+        )
+        weighted = result.weighted_cost[-1]
+        parts.append(result.total_battery_cost)
+
+    np.testing.assert_allclose(np.concatenate(parts), expected[2], rtol=1e-9, atol=1e-9)
+    assert state.total_battery_cost == pytest.approx(expected[2][-1])
+    assert astuple(state.totals) == pytest.approx(astuple(reference.totals))
+
+
+def test_batch_skips_short_intervals():
+    ts = np.array([0.0, 0.1, 0.2, 0.3, 0.4, 3600.0])
+    ones = np.ones(ts.size)
+    result = run_batch(
+        EngineState(), ts, ones, ones * 0.3, ones, ones * 0.1, ones * 0, ones
+    )
+    # 0.4 s after the start is the first interval long enough for a step
+    assert result.stepped.tolist() == [False, False, False, False, True, True]
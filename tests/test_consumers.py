@@ -0,0 +1,43 @@
+"""Tests for pricing consumers at the weighted cost."""
+
+from types import SimpleNamespace
+
+import pytest
+
+from custom_components.weighted_energy_cost.const import (
+    INTEGRATION_METHOD_TRAPEZOIDAL,
+)
+from custom_components.weighted_energy_cost.consumers import ConsumerMeters
+from custom_components.weighted_energy_cost.inputs import update_entity
+
+
+def _state(value, unit):
+    return SimpleNamespace(state=str(value), attributes={"unit_of_measurement": unit})
+
+
+def test_consumers_accumulate_cost():
+    meters = ConsumerMeters(["sensor.heat_pump", "sensor.ev"])
+    update_entity(meters.index, "sensor.heat_pump", _state(2000, "W"), 0.0)
+    update_entity(meters.index, "sensor.ev", _state(11, "kW"), 0.0)
+    meters.step(1800.0, 0.5, 0.30, 0.30)
+    meters.step(3600.0, 0.5, 0.10, 0.30)
+
+    heat_pump = meters.states["sensor.heat_pump"]
+    assert heat_pump.energy_kwh == pytest.approx(2.0)
+    assert heat_pump.total_cost == pytest.approx(0.3 + 0.1)
+    assert heat_pump.cost_rate == pytest.approx(0.2)
+    assert meters.states["sensor.ev"].total_cost == pytest.approx(2.2)
+
+
+def test_consumer_energy_counter_uses_average_rate():
+    meters = ConsumerMeters(["sensor.ev_energy"], INTEGRATION_METHOD_TRAPEZOIDAL)
+    update_entity(meters.index, "sensor.ev_energy", _state(100, "kWh"), 0.0)
+    update_entity(meters.index, "sensor.ev_energy", _state(100.5, "kWh"), 600.0)
+    meters.step(600.0, 0.5, 0.30, 0.30)
+    meters.step(900.0, 0.5, 0.20, 0.30)
+
+    # 0.5 kWh in 10 minutes is 3 kW, held between the counter's readings
+    ev = meters.states["sensor.ev_energy"]
+    assert ev.power_kw == pytest.approx(3.0)
+    assert ev.energy_kwh == pytest.approx(3.0)
+    assert ev.total_cost == pytest.approx(1.5 * 0.30 + 1.5 * 0.25)
@@ -0,0 +1,76 @@
+"""Tests for deriving power from energy counters."""
+
+import pytest
+
+from custom_components.weighted_energy_cost.counters import CounterRate
+
+
+def test_rate_holds_between_readings():
+    counter = CounterRate(window=900.0)
+    assert counter.rate(0.0) == 0.0
+    for minute, value in ((0, 10.0), (5, 10.1), (10, 10.2)):
+        counter.add(minute * 60.0, value)
+    # 0.2 kWh in 10 minutes, also between two 5 minute readings
+    assert counter.rate(600.0) == pytest.approx(1.2)
+    assert counter.rate(840.0) == pytest.approx(1.2)
+
+
+def test_rate_uses_sliding_window():
+    counter = CounterRate(window=600.0, samples=4)
+    for minute, value in ((0, 0.0), (5, 1.0), (10, 1.0), (15, 1.0), (20, 1.1)):
+        counter.add(minute * 60.0, value)
+    # Only the readings from minute 10 on are in the window
+    assert counter.rate(1200.0) == pytest.approx(0.6)
+
+
+def test_idle_counter_falls_off():
+    counter = CounterRate(window=600.0)
+    counter.add(0.0, 5.0)
+    counter.add(300.0, 5.5)
+    assert counter.rate(900.0) == pytest.approx(6.0)
+    assert counter.rate(1200.0) == pytest.approx(1.5)
+    assert counter.rate(36000.0) == pytest.approx(0.05)
+
+
+def test_reset_keeps_counting():
+    counter = CounterRate(window=900.0)
+    counter.add(0.0, 1000.0)
+    counter.add(300.0, 1000.5)
+    # The meter restarted from zero and counted 0.5 kWh since
+    counter.add(600.0, 0.5)
+    assert counter.rate(600.0) == pytest.approx(6.0)
+    assert counter.resets == 1
+
+
+def test_small_dip_is_not_a_reset():
+    counter = CounterRate(window=900.0)
+    counter.add(0.0, 1000.0)
+    counter.add(300.0, 1000.5)
+    # Jitter of the meter; the energy is not counted again when it recovers
+    counter.add(600.0, 1000.4)
+    assert counter.rate(600.0) == pytest.approx(3.0)
+    counter.add(900.0, 1001.0)
+    assert counter.rate(900.0) == pytest.approx(4.0)
+    assert counter.resets == 0
+
+
+def test_same_time_readings_count_once():
+    counter = CounterRate()
+    counter.add(0.0, 1.0)
+    counter.add(0.0, 1.5)
+    counter.add(3600.0, 2.5)
+    assert counter.rate(3600.0) == pytest.approx(1.0)
+
+
+def test_round_trip_keeps_readings():
+    counter = CounterRate(window=900.0, samples=4)
+    for minute, value in ((0, 5.0), (5, 5.1), (10, 0.1), (15, 0.2), (20, 0.3)):
+        counter.add(minute * 60.0, value)
+
+    restored = CounterRate.from_dict(counter.as_dict(shift=1000.0), shift=-1000.0)
+    assert restored.rate(1200.0) == pytest.approx(counter.rate(1200.0))
+    # Resets before the restart are still accounted for
+    restored.add(1500.0, 0.4)
+    counter.add(1500.0, 0.4)
+    assert restored.rate(1500.0) == pytest.approx(counter.rate(1500.0))
+    assert restored.as_dict() == counter.as_dict()
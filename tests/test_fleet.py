@@ -0,0 +1,150 @@
+"""Tests for the parallel replay of many sites."""
+
+import csv
+import json
+
+import numpy as np
+import pytest
+
+from custom_components.weighted_energy_cost.const import (
+    CONF_BATTERY_ENERGY_SOURCE_TYPE,
+    CONF_BATTERY_ENERGY_SOURCE_VALUE,
+    CONF_BATTERY_POWER_SOURCE_TYPE,
+    CONF_BATTERY_POWER_SOURCE_VALUE,
+    CONF_GRID_IMPORT_PRICE_TYPE,
+    CONF_GRID_IMPORT_PRICE_VALUE,
+    CONF_GRID_IMPORT_SOURCE_TYPE,
+    CONF_GRID_IMPORT_SOURCE_VALUE,
+    CONF_SOLAR_PRICE_TYPE,
+    CONF_SOLAR_PRICE_VALUE,
+    CONF_SOLAR_SOURCE_TYPE,
+    CONF_SOLAR_SOURCE_VALUE,
+    SOURCE_TYPE_ENTITY,
+    SOURCE_TYPE_FIXED,
+)
+from custom_components.weighted_energy_cost.fleet import (
+    FleetOptions,
+    discover_sites,
+    main,
+    run_fleet,
+)
+from custom_components.weighted_energy_cost.offline import read_npy_samples
+
+CONFIG = {
+    CONF_GRID_IMPORT_SOURCE_TYPE: SOURCE_TYPE_ENTITY,
+    CONF_GRID_IMPORT_SOURCE_VALUE: "sensor.grid",
+    CONF_GRID_IMPORT_PRICE_TYPE: SOURCE_TYPE_FIXED,
+    CONF_GRID_IMPORT_PRICE_VALUE: 0.30,
+    CONF_SOLAR_SOURCE_TYPE: SOURCE_TYPE_ENTITY,
+    CONF_SOLAR_SOURCE_VALUE: "sensor.solar",
+    CONF_SOLAR_PRICE_TYPE: SOURCE_TYPE_FIXED,
+    CONF_SOLAR_PRICE_VALUE: 0.10,
+    CONF_BATTERY_POWER_SOURCE_TYPE: SOURCE_TYPE_ENTITY,
+    CONF_BATTERY_POWER_SOURCE_VALUE: "sensor.battery",
+    CONF_BATTERY_ENERGY_SOURCE_TYPE: SOURCE_TYPE_ENTITY,
+    CONF_BATTERY_ENERGY_SOURCE_VALUE: "sensor.battery_kwh",
+}
+
+
+def _samples(n):
+    rng = np.random.default_rng(n)
+    return {
+        "timestamp": 1_700_000_000 + 10.0 * np.arange(n),
+        "grid_kw": rng.uniform(0, 3, n),
+        "grid_price": rng.uniform(0.1, 0.4, n),
+        "solar_kw": rng.uniform(0, 4, n),
+        "solar_price": np.full(n, 0.05),
+        "battery_kw": rng.uniform(-2, 2, n),
+        "battery_kwh": rng.uniform(1, 8, n),
+    }
+
+
+def _fleet(root):
+    """Create two sites with .npy columns and a CSV file, and a broken one."""
+    for name, n in (("alpha", 400), ("beta", 300)):
+        site = root / name
+        (site / "samples").mkdir(parents=True)
+        (site / "config.json").write_text(json.dumps(CONFIG))
+        for column, values in _samples(n).items():
+            np.save(site / "samples" / f"{column}.npy", values)
+
+    site = root / "gamma"
+    site.mkdir()
+    (site / "config.json").write_text(json.dumps({"data": {"config": CONFIG}}))
+    columns = _samples(200)
+    np.savetxt(
+        site / "samples.csv",
+        np.column_stack(list(columns.values())),
+        delimiter=",",
+        header=",".join(columns),
+        comments="",
+        fmt="%.10g",
+    )
+
+    site = root / "delta"
+    site.mkdir()
+    (site / "config.json").write_text(json.dumps(CONFIG))
+
+
+def test_npy_columns_are_memory_mapped(tmp_path):
+    _fleet(tmp_path)
+    chunks = list(read_npy_samples(tmp_path / "alpha" / "samples", chunk_size=150))
+    assert [chunk["timestamp"].size for chunk in chunks] == [150, 150, 100]
+    assert isinstance(chunks[0]["grid_kw"].base, np.memmap)
+
+
+def test_parallel_matches_serial(tmp_path):
+    _fleet(tmp_path)
+    sites = discover_sites(tmp_path)
+    assert [site.name for site in sites] == ["alpha", "beta", "delta", "gamma"]
+
+    serial = run_fleet(sites, workers=1)
+    parallel = run_fleet(sites, workers=2)
+    for a, b in zip(serial, parallel):
+        a.pop("elapsed_s", None)
+        b.pop("elapsed_s", None)
+    assert serial == parallel
+
+    rows = {row["site"]: row for row in parallel}
+    assert rows["alpha"]["rows"] == 400
+    assert rows["gamma"]["rows"] == 200
+    assert rows["gamma"]["grid_kwh"] > 0
+    assert "error" in rows["delta"]
+
+
+def test_malformed_config_does_not_stop_the_fleet(tmp_path):
+    _fleet(tmp_path)
+    (tmp_path / "delta" / "config.json").write_text("[1, 2]")
+    for column, values in _samples(100).items():
+        (tmp_path / "delta" / "samples").mkdir(exist_ok=True)
+        np.save(tmp_path / "delta" / "samples" / f"{column}.npy", values)
+    rows = {row["site"]: row for row in run_fleet(discover_sites(tmp_path), workers=2)}
+    assert rows["delta"]["error"].startswith("AttributeError")
+    assert rows["alpha"]["rows"] == 400
+
+
+def test_report_and_series(tmp_path):
+    _fleet(tmp_path / "fleet")
+    report = tmp_path / "report.csv"
+    series = tmp_path / "series"
+    code = main(
+        [
+            str(tmp_path / "fleet"),
+            "-o",
+            str(report),
+            "--series",
+            str(series),
+            "-j",
+            "2",
+        ]
+    )
+    # The site without data fails, the others are reported
+    assert code == 1
+    with open(report, encoding="utf-8") as file:
+        rows = list(csv.DictReader(file))
+    assert [row["site"] for row in rows] == ["alpha", "beta", "delta", "gamma"]
+    assert rows[2]["error"] and not rows[0]["error"]
+    assert float(rows[1]["cost"]) == pytest.approx(
+        run_fleet(discover_sites(tmp_path / "fleet"), FleetOptions())[1]["cost"]
+    )
+    assert len((series / "beta.csv").read_text().splitlines()) == 301
@@ -0,0 +1,102 @@
+"""Tests for the projection over tariff and solar forecasts."""
+
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from custom_components.weighted_energy_cost.forecast import (
+    parse_forecast,
+    project,
+    resample,
+)
+
+MIDNIGHT = datetime(2026, 10, 17, tzinfo=timezone.utc)
+T0 = MIDNIGHT.timestamp()
+
+
+def _slots(prices, minutes=60):
+    """Return price slots in the Nord Pool ``raw_today`` format."""
+    return {
+        "raw_today": [
+            {
+                "start": (MIDNIGHT + timedelta(minutes=minutes * i)).isoformat(),
+                "end": MIDNIGHT + timedelta(minutes=minutes * (i + 1)),
+                "value": price,
+            }
+            for i, price in enumerate(prices)
+        ]
+    }
+
+
+def test_parse_formats():
+    forecast = parse_forecast(_slots([0.2, 0.3]))
+    assert forecast.start.tolist() == [T0, T0 + 3600]
+    assert forecast.end.tolist() == [T0 + 3600, T0 + 7200]
+    assert forecast.value.tolist() == [0.2, 0.3]
+
+    # Equal slots of the day need the local start of the day
+    daily = {"today": [0.1] * 96, "tomorrow": [0.2] * 96}
+    assert parse_forecast(daily).start.size == 0
+    forecast = parse_forecast(daily, MIDNIGHT)
+    assert forecast.start.size == 192
+    assert forecast.end[0] - forecast.start[0] == 900
+    assert forecast.start[96] == T0 + 86400
+
+    # Watts without an end last until the next reading
+    watts = {"watts": {MIDNIGHT.isoformat(): 1000, "2026-10-17T01:00:00+00:00": 500}}
+    forecast = parse_forecast(watts)
+    assert forecast.value.tolist() == [1.0, 0.5]
+    assert forecast.end.tolist() == [T0 + 3600, T0 + 7200]
+
+
+def test_resample_holds_values_within_slots():
+    solar = parse_forecast({"watts": {MIDNIGHT.isoformat(): 2000}})
+    start = T0 + np.arange(0, 7200, 900.0)
+    assert resample(solar, start, start + 900).tolist() == [2.0] * 4 + [0.0] * 4
+
+
+def test_battery_covers_load_until_empty():
+    prices = parse_forecast(_slots([0.30] * 4))
+    projection = project(
+        prices,
+        np.zeros(4),
+        load_kw=1.0,
+        solar_price=0.0,
+        battery_kwh=1.5,
+        total_battery_cost=0.15,
+    )
+    # 1 kWh at 0.10 €/kWh, then half battery and half grid, then grid only
+    assert projection.weighted_cost == pytest.approx([0.10, 0.20, 0.30, 0.30])
+    assert projection.battery_kwh == pytest.approx([0.5, 0.0, 0.0, 0.0])
+
+
+def test_solar_surplus_charges_battery():
+    prices = parse_forecast(_slots([0.30] * 2))
+    projection = project(
+        prices,
+        np.array([3.0, 0.0]),
+        load_kw=1.0,
+        solar_price=0.06,
+        battery_kwh=2.0,
+        total_battery_cost=0.60,
+    )
+    # 2 kWh of solar at 0.06 €/kWh join 2 kWh at 0.30 €/kWh
+    assert projection.battery_kwh == pytest.approx([4.0, 3.0])
+    assert projection.weighted_cost == pytest.approx([0.06, 0.18])
+
+
+def test_past_slots_are_dropped():
+    prices = parse_forecast(_slots([0.2, 0.3, 0.4]))
+    projection = project(
+        prices,
+        np.zeros(3),
+        load_kw=0.0,
+        solar_price=0.0,
+        battery_kwh=0.0,
+        total_battery_cost=0.0,
+        now=T0 + 5400,
+    )
+    assert projection.start.tolist() == [T0 + 5400, T0 + 7200]
+    assert projection.weighted_cost.tolist() == [0.3, 0.4]
@@ -0,0 +1,127 @@
+"""Tests for the compiled source accessors."""
+
+from types import SimpleNamespace
+
+import pytest
+
+from custom_components.weighted_energy_cost.const import (
+    CONF_BATTERY_ENERGY_SOURCE_TYPE,
+    CONF_BATTERY_ENERGY_SOURCE_VALUE,
+    CONF_GRID_IMPORT_SOURCE_TYPE,
+    CONF_GRID_IMPORT_SOURCE_VALUE,
+    CONF_INTEGRATE_ENERGY,
+    CONF_SOLAR_SOURCE_TYPE,
+    CONF_SOLAR_SOURCE_VALUE,
+    SOURCE_TYPE_DASHBOARD,
+    SOURCE_TYPE_ENTITY,
+    SOURCE_TYPE_FIXED,
+)
+from custom_components.weighted_energy_cost.engine import create_state
+from custom_components.weighted_energy_cost.inputs import (
+    compile_source,
+    compile_sources,
+    entity_index,
+    read_inputs,
+    update_entity,
+)
+
+
+def _state(value, unit, device_class=None):
+    attributes = {"unit_of_measurement": unit}
+    if device_class:
+        attributes["device_class"] = device_class
+    return SimpleNamespace(state=str(value), attributes=attributes)
+
+
+def _source(source_type, value):
+    return compile_source(
+        {
+            CONF_GRID_IMPORT_SOURCE_TYPE: source_type,
+            CONF_GRID_IMPORT_SOURCE_VALUE: value,
+        },
+        CONF_GRID_IMPORT_SOURCE_TYPE,
+        CONF_GRID_IMPORT_SOURCE_VALUE,
+        True,
+    )
+
+
+def test_fixed_power_in_watts_is_converted():
+    assert _source(SOURCE_TYPE_FIXED, 1500).read(0.0) == (1.5, False)
+    assert _source(SOURCE_TYPE_FIXED, 2.5).read(0.0) == (2.5, False)
+    assert _source(SOURCE_TYPE_FIXED, "bad").read(0.0) == (0.0, False)
+
+
+def test_entity_source_follows_unit_changes():
+    source = _source(SOURCE_TYPE_ENTITY, "sensor.grid")
+    source.update(_state(2000, "W"), 0.0)
+    assert source.read(0.0) == (2.0, False)
+
+    source.update(_state(3, "kW"), 1.0)
+    assert source.read(1.0) == (3.0, False)
+
+    # An energy counter is turned into the average rate of its readings
+    source.update(_state(0.01, "MWh", "energy"), 2.0)
+    assert source.read(2.0) == (0.0, True)
+    source.update(_state(0.0105, "MWh", "energy"), 302.0)
+    assert source.read(400.0) == (pytest.approx(6.0), True)
+
+
+def test_dashboard_source_is_an_energy_counter():
+    source = _source(SOURCE_TYPE_DASHBOARD, "sensor.grid_energy")
+    source.update(_state(100, "Wh"), 0.0)
+    source.update(_state(200, "Wh"), 360.0)
+    assert source.read(360.0) == (pytest.approx(1.0), True)
+
+
+def test_entity_source_unavailable_reads_zero():
+    source = _source(SOURCE_TYPE_ENTITY, "sensor.grid")
+    assert source.read(0.0) == (0.0, False)
+    source.update(_state(2000, "W"), 0.0)
+    source.update(SimpleNamespace(state="unavailable", attributes={}), 1.0)
+    assert source.read(1.0) == (0.0, False)
+    source.update(None, 2.0)
+    assert source.read(2.0) == (0.0, False)
+
+
+def test_update_reaches_every_source_of_an_entity():
+    config = {
+        CONF_GRID_IMPORT_SOURCE_TYPE: SOURCE_TYPE_ENTITY,
+        CONF_GRID_IMPORT_SOURCE_VALUE: "sensor.power",
+        CONF_SOLAR_SOURCE_TYPE: SOURCE_TYPE_ENTITY,
+        CONF_SOLAR_SOURCE_VALUE: "sensor.power",
+    }
+    sources = compile_sources(config)
+    index = entity_index(sources)
+    assert list(index) == ["sensor.power"]
+    update_entity(index, "sensor.power", _state(500, "W"), 0.0)
+    update_entity(index, "sensor.other", _state(9, "W"), 0.0)
+    assert sources.grid.read(0.0) == (0.5, False)
+    assert sources.solar.read(0.0) == (0.5, False)
+
+
+def test_integrated_energy_is_reconciled_when_the_sensor_reports():
+    config = {
+        CONF_BATTERY_ENERGY_SOURCE_TYPE: SOURCE_TYPE_ENTITY,
+        CONF_BATTERY_ENERGY_SOURCE_VALUE: "sensor.battery_energy",
+        CONF_INTEGRATE_ENERGY: True,
+    }
+    sources = compile_sources(config)
+    index = entity_index(sources)
+    engine = create_state(config)
+    engine.soe.stored_kwh = 4.0
+
+    update_entity(index, "sensor.battery_energy", _state(5.0, "kWh"), 0.0)
+    read_inputs(sources, engine, 0.0)
+    assert engine.soe.reading == 5.0
+    engine.soe.reading = None
+
+    # Neither an unchanged nor an unavailable sensor is read again
+    read_inputs(sources, engine, 10.0)
+    update_entity(
+        index,
+        "sensor.battery_energy",
+        SimpleNamespace(state="unavailable", attributes={}),
+        20.0,
+    )
+    read_inputs(sources, engine, 20.0)
+    assert engine.soe.reading is None
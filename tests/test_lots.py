@@ -0,0 +1,67 @@
+"""Tests for the layered battery cost basis."""
+
+import random
+
+import pytest
+
+from custom_components.weighted_energy_cost.engine import (
+    EngineState,
+    StepInputs,
+    step,
+)
+from custom_components.weighted_energy_cost.lots import MAX_LOTS, BatteryLots
+
+
+def _charged(lots):
+    """Charge 1 kWh at 0.10 €/kWh from solar, then 1 kWh at 0.30 €/kWh from the grid."""
+    state = EngineState(lots=lots)
+    step(state, StepInputs(0, 0.30, 2.0, 0.10, -1.0, 1.0), 1.0)
+    step(state, StepInputs(2.0, 0.30, 0, 0.10, -1.0, 2.0), 1.0)
+    return state
+
+
+@pytest.mark.parametrize("lifo, expected", [(False, 0.10), (True, 0.30)])
+def test_discharge_takes_lots_in_order(lifo, expected):
+    state = _charged(BatteryLots(lifo=lifo))
+    assert round(state.total_battery_cost, 4) == 0.40
+    # 1 kWh of the 2 kWh stored is discharged to the home
+    result = step(state, StepInputs(0, 0.30, 0, 0.10, 1.0, 2.0), 1.0)
+    assert round(result.weighted_cost, 4) == expected
+    assert round(state.total_battery_cost, 4) == round(0.40 - expected, 4)
+    assert round(state.totals.battery_cost_out, 4) == expected
+
+
+def test_discharge_spreads_conversion_losses():
+    # 2 kWh charged, 1.8 kWh stored: each stored kWh carries 1/0.9 of its lot
+    state = _charged(BatteryLots())
+    result = step(state, StepInputs(0, 0.30, 0, 0.10, 0.9, 1.8), 1.0)
+    assert round(result.weighted_cost, 4) == round(0.10 / 0.9, 4)
+    assert round(state.total_battery_cost, 4) == 0.30
+
+
+def test_cost_basis_set_from_outside_becomes_first_lot():
+    state = EngineState(total_battery_cost=1.0, lots=BatteryLots())
+    result = step(state, StepInputs(0, 0.30, 0, 0, 0, 5.0), 1.0)
+    assert result.battery_unit_price == 0.20
+    assert len(state.lots) == 1
+
+
+def test_lots_stay_bounded_and_keep_their_cost():
+    rng = random.Random(1)
+    lots = BatteryLots()
+    cost = 0.0
+    for _ in range(10000):
+        price = rng.uniform(0.0, 0.4)
+        lots.add(0.1, 0.1 * price)
+        cost += 0.1 * price
+        if rng.random() < 0.3:
+            cost -= lots.remove(rng.random() * 0.5)
+        assert len(lots) <= MAX_LOTS
+    assert lots.cost == pytest.approx(cost)
+    assert lots.cost == pytest.approx(sum(c for _, c in lots.as_list()))
+
+    # Similar prices join the newest lot
+    lots.clear()
+    lots.add(1.0, 0.300)
+    lots.add(1.0, 0.302)
+    assert lots.as_list() == [[2.0, 0.602]]
@@ -0,0 +1,264 @@
+"""Tests for the offline replay of exported data."""
+
+import json
+import sqlite3
+
+import numpy as np
+import pytest
+
+from custom_components.weighted_energy_cost import offline
+from custom_components.weighted_energy_cost.const import (
+    CONF_BATTERY_ENERGY_SOURCE_TYPE,
+    CONF_BATTERY_ENERGY_SOURCE_VALUE,
+    CONF_BATTERY_POWER_SOURCE_TYPE,
+    CONF_BATTERY_POWER_SOURCE_VALUE,
+    CONF_COST_BASIS,
+    CONF_GRID_IMPORT_PRICE_TYPE,
+    CONF_GRID_IMPORT_PRICE_VALUE,
+    CONF_GRID_IMPORT_SOURCE_TYPE,
+    CONF_GRID_IMPORT_SOURCE_VALUE,
+    CONF_SOLAR_PRICE_TYPE,
+    CONF_SOLAR_PRICE_VALUE,
+    CONF_SOLAR_SOURCE_TYPE,
+    CONF_SOLAR_SOURCE_VALUE,
+    COST_BASIS_FIFO,
+    SOURCE_TYPE_DASHBOARD,
+    SOURCE_TYPE_ENTITY,
+    SOURCE_TYPE_FIXED,
+)
+from custom_components.weighted_energy_cost.offline import (
+    RecordedState,
+    RecorderReader,
+    main,
+    read_csv_events,
+    read_csv_samples,
+    replay_events,
+    replay_samples,
+)
+from custom_components.weighted_energy_cost.replay import HistoryReplay
+
+CONFIG = {
+    CONF_GRID_IMPORT_SOURCE_TYPE: SOURCE_TYPE_ENTITY,
+    CONF_GRID_IMPORT_SOURCE_VALUE: "sensor.grid",
+    CONF_GRID_IMPORT_PRICE_TYPE: SOURCE_TYPE_FIXED,
+    CONF_GRID_IMPORT_PRICE_VALUE: 0.30,
+    CONF_SOLAR_SOURCE_TYPE: SOURCE_TYPE_ENTITY,
+    CONF_SOLAR_SOURCE_VALUE: "sensor.solar",
+    CONF_SOLAR_PRICE_TYPE: SOURCE_TYPE_FIXED,
+    CONF_SOLAR_PRICE_VALUE: 0.10,
+    CONF_BATTERY_POWER_SOURCE_TYPE: SOURCE_TYPE_ENTITY,
+    CONF_BATTERY_POWER_SOURCE_VALUE: "sensor.battery",
+    CONF_BATTERY_ENERGY_SOURCE_TYPE: SOURCE_TYPE_ENTITY,
+    CONF_BATTERY_ENERGY_SOURCE_VALUE: "sensor.battery_kwh",
+}
+
+UNITS = {
+    "sensor.grid": "W",
+    "sensor.solar": "W",
+    "sensor.battery": "W",
+    "sensor.battery_kwh": "kWh",
+}
+
+
+def _history(hours=3):
+    """Return state changes every 10 minutes, ordered by entity."""
+    rows = []
+    for entity_id, unit in UNITS.items():
+        for k in range(hours * 6):
+            t = 1_700_000_000 + 600 * k + list(UNITS).index(entity_id)
+            value = {
+                "sensor.grid": 500 + 100 * (k % 4),
+                "sensor.solar": 2000 if 3 <= k < 12 else 0,
+                "sensor.battery": -800 if 3 <= k < 12 else 600,
+                "sensor.battery_kwh": 2 + 0.1 * k,
+            }[entity_id]
+            rows.append((entity_id, str(value), t, unit))
+    return rows
+
+
+def _write_history_csv(path, rows):
+    lines = ["entity_id,state,last_changed,unit_of_measurement"]
+    lines += [f"{e},{s},{t},{u}" for e, s, t, u in rows]
+    path.write_text("\n".join(lines) + "\n")
+
+
+def test_csv_events_match_the_history_replay(tmp_path):
+    rows = _history()
+    path = tmp_path / "history.csv"
+    _write_history_csv(path, rows)
+
+    events = list(read_csv_events(path))
+    assert [e[0] for e in events] == sorted(e[0] for e in events)
+
+    # The same states, sorted in memory and replayed directly
+    expected = HistoryReplay(CONFIG)
+    expected.feed(
+        (t, e, RecordedState(s, {"unit_of_measurement": u}))
+        for e, s, t, u in sorted(rows, key=lambda row: row[2])
+    )
+
+    summary = replay_events(CONFIG, read_csv_events(path), chunk_size=7)
+    assert summary.rows == len(rows)
+    assert summary.steps == expected.steps
+    assert summary.weighted_cost == expected.weighted_cost
+    assert summary.engine.totals == expected.engine.totals
+
+
+def _samples(n=500):
+    rng = np.random.default_rng(3)
+    return {
+        "timestamp": 1_700_000_000 + 10.0 * np.arange(n),
+        "grid_kw": rng.uniform(0, 3, n),
+        "grid_price": rng.uniform(0.1, 0.4, n),
+        "solar_kw": rng.uniform(0, 4, n),
+        "solar_price": np.full(n, 0.05),
+        "battery_kw": rng.uniform(-2, 2, n),
+        "battery_kwh": rng.uniform(1, 8, n),
+    }
+
+
+@pytest.mark.parametrize("config", [CONFIG, {**CONFIG, CONF_COST_BASIS: "average"}])
+def test_csv_samples_in_chunks(tmp_path, config):
+    columns = _samples()
+    path = tmp_path / "samples.csv"
+    np.savetxt(
+        path,
+        np.column_stack(list(columns.values())),
+        delimiter=",",
+        header=",".join(columns),
+        comments="",
+        fmt="%.10g",
+    )
+    whole = replay_samples(config, [columns])
+    chunked = replay_samples(config, read_csv_samples(path, chunk_size=37))
+    assert chunked.rows == whole.rows == 500
+    assert chunked.steps == whole.steps
+    assert chunked.weighted_cost == pytest.approx(whole.weighted_cost)
+    assert chunked.engine.total_battery_cost == pytest.approx(
+        whole.engine.total_battery_cost
+    )
+
+
+def test_layered_cost_basis_steps_the_samples():
+    columns = _samples(50)
+    summary = replay_samples({**CONFIG, CONF_COST_BASIS: COST_BASIS_FIFO}, [columns])
+    assert summary.steps == 49
+    assert summary.engine.lots is not None
+
+
+def _recorder(path):
+    """Create the tables of a recorder database the replay reads."""
+    db = sqlite3.connect(path)
+    db.executescript("""
+        CREATE TABLE states_meta (metadata_id INTEGER PRIMARY KEY, entity_id TEXT);
+        CREATE TABLE state_attributes (
+            attributes_id INTEGER PRIMARY KEY, shared_attrs TEXT);
+        CREATE TABLE states (
+            state_id INTEGER PRIMARY KEY, metadata_id INTEGER, state TEXT,
+            attributes_id INTEGER, last_updated_ts REAL);
+        CREATE TABLE statistics_meta (
+            id INTEGER PRIMARY KEY, statistic_id TEXT, unit_of_measurement TEXT,
+            has_mean INTEGER, has_sum INTEGER);
+        CREATE TABLE statistics (
+            id INTEGER PRIMARY KEY, metadata_id INTEGER, start_ts REAL,
+            mean REAL, sum REAL);
+        """)
+    return db
+
+
+def test_recorder_states(tmp_path):
+    path = tmp_path / "home-assistant_v2.db"
+    db = _recorder(path)
+    rows = _history(hours=30)
+    for i, entity_id in enumerate(UNITS, 1):
+        db.execute("INSERT INTO states_meta VALUES (?, ?)", (i, entity_id))
+        db.execute(
+            "INSERT INTO state_attributes VALUES (?, ?)",
+            (i, json.dumps({"unit_of_measurement": UNITS[entity_id]})),
+        )
+    ids = {entity_id: i for i, entity_id in enumerate(UNITS, 1)}
+    db.executemany(
+        "INSERT INTO states (metadata_id, state, attributes_id, last_updated_ts) "
+        "VALUES (?, ?, ?, ?)",
+        [(ids[e], s, ids[e], t) for e, s, t, _ in rows],
+    )
+    db.commit()
+    db.close()
+
+    csv_path = tmp_path / "history.csv"
+    _write_history_csv(csv_path, rows)
+    expected = replay_events(CONFIG, read_csv_events(csv_path))
+
+    config_path = tmp_path / "config.json"
+    config_path.write_text(json.dumps({"data": {"config": CONFIG}}))
+    output = tmp_path / "cost.csv"
+    assert main([str(config_path), str(path), "-o", str(output)]) == 0
+    lines = output.read_text().splitlines()
+    assert lines[0] == "start,mean,min,max"
+    # 30 hours from 22:13, the last one closed by the last state
+    assert len(lines) == 1 + 30
+
+    reader = RecorderReader(path)
+    summary = replay_events(CONFIG, reader.events(UNITS, chunk_size=5))
+    reader.close()
+    assert summary.steps == expected.steps
+    assert summary.engine.totals == expected.engine.totals
+
+
+def test_recorder_statistics(tmp_path, capsys):
+    path = tmp_path / "home-assistant_v2.db"
+    db = _recorder(path)
+    config = {
+        **CONFIG,
+        CONF_GRID_IMPORT_SOURCE_TYPE: SOURCE_TYPE_DASHBOARD,
+        CONF_GRID_IMPORT_SOURCE_VALUE: "sensor.grid_energy",
+        CONF_SOLAR_SOURCE_TYPE: SOURCE_TYPE_FIXED,
+        CONF_SOLAR_SOURCE_VALUE: 0,
+    }
+    db.executemany(
+        "INSERT INTO statistics_meta VALUES (?, ?, ?, ?, ?)",
+        [
+            (1, "sensor.grid_energy", "Wh", 0, 1),
+            (2, "sensor.battery", "W", 1, 0),
+            (3, "sensor.battery_kwh", "kWh", 1, 0),
+        ],
+    )
+    start = 1_699_999_200
+    db.executemany(
+        "INSERT INTO statistics (metadata_id, start_ts, mean, sum) VALUES (?, ?, ?, ?)",
+        [(1, start + 3600 * k, None, 2000.0 * k) for k in range(48)]
+        + [(2, start + 3600 * k, 500.0, None) for k in range(48)]
+        + [(3, start + 3600 * k, 10.0 - 0.5 * k / 48, None) for k in range(48)],
+    )
+    db.commit()
+    db.close()
+
+    config_path = tmp_path / "config.json"
+    config_path.write_text(json.dumps(config))
+    assert main([str(config_path), str(path), "--statistics", "hourly"]) == 0
+    summary = json.loads(capsys.readouterr().out)
+    assert summary["rows"] == 48
+    # 2 kWh per hour from the grid; the first sample starts the clock
+    assert summary["totals"]["grid_kwh"] == pytest.approx(2.0 * 47)
+    assert summary["totals"]["battery_kwh"] == pytest.approx(0.5 * 47)
+
+
+def test_statistics_sums_across_windows():
+    meta = {"id": 1, "unit_of_measurement": "kWh", "has_mean": 0}
+    sums = {}
+    starts, values = RecorderReader._values(
+        meta, [(1, 0.0, None, 0.0), (1, 3600.0, None, 1.0)], sums
+    )
+    assert np.isnan(values[0])
+    assert values[1] == 1.0
+    # The first row of the next window counts from the last row of this one
+    starts, values = RecorderReader._values(
+        meta, [(1, 7200.0, None, 2.0), (1, 10800.0, None, 3.0)], sums
+    )
+    assert values.tolist() == [1.0, 1.0]
+
+
+def test_recorder_statistics_in_windows(tmp_path, capsys, monkeypatch):
+    # Read 48 hours of statistics in windows of 10 hours
+    monkeypatch.setattr(offline, "STATISTICS_WINDOW", 10 * 3600.0)
+    test_recorder_statistics(tmp_path, capsys)
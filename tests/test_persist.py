@@ -0,0 +1,134 @@
+"""Tests for the calculation state stored across restarts."""
+
+from types import SimpleNamespace
+
+import pytest
+
+from custom_components.weighted_energy_cost.const import (
+    CONF_BATTERY_ENERGY_SOURCE_TYPE,
+    CONF_BATTERY_ENERGY_SOURCE_VALUE,
+    CONF_COST_BASIS,
+    CONF_GRID_IMPORT_SOURCE_TYPE,
+    CONF_GRID_IMPORT_SOURCE_VALUE,
+    CONF_INTEGRATE_ENERGY,
+    COST_BASIS_FIFO,
+    SOURCE_TYPE_ENTITY,
+)
+from custom_components.weighted_energy_cost.engine import (
+    StepInputs,
+    advance,
+    create_state,
+    step,
+)
+from custom_components.weighted_energy_cost.inputs import (
+    compile_sources,
+    entity_index,
+    update_entity,
+)
+from custom_components.weighted_energy_cost.persist import (
+    MAX_RESUME_GAP,
+    counters_data,
+    engine_data,
+    restore_counters,
+    restore_engine,
+)
+
+CONFIG = {
+    CONF_COST_BASIS: COST_BASIS_FIFO,
+    CONF_INTEGRATE_ENERGY: True,
+    CONF_GRID_IMPORT_SOURCE_TYPE: SOURCE_TYPE_ENTITY,
+    CONF_GRID_IMPORT_SOURCE_VALUE: "sensor.grid_energy",
+    CONF_BATTERY_ENERGY_SOURCE_TYPE: SOURCE_TYPE_ENTITY,
+    CONF_BATTERY_ENERGY_SOURCE_VALUE: "sensor.battery_energy",
+}
+
+# Wall-clock minus monotonic time before and after the restart
+BEFORE = 1_700_000_000.0
+AFTER = 1_699_000_000.0
+
+
+def _energy(value):
+    return SimpleNamespace(
+        state=str(value),
+        attributes={"unit_of_measurement": "kWh", "device_class": "energy"},
+    )
+
+
+def _charged_engine():
+    engine = create_state(CONFIG)
+    engine.soe.stored_kwh = 5.0
+    advance(engine, 100.0)
+    advance(engine, 3700.0)
+    # Charge 2 kW from the grid for an hour
+    step(engine, StepInputs(2.0, 0.3, 0.0, 0.1, -2.0, 5.0), 1.0)
+    return engine
+
+
+def test_engine_round_trip():
+    engine = _charged_engine()
+    data = engine_data(engine, BEFORE)
+    assert data["last_update"] == 3700.0 + BEFORE
+
+    restored = create_state(CONFIG)
+    # Restarted a minute later on a clock with another offset
+    assert restore_engine(restored, data, 3760.0 + BEFORE - AFTER, -AFTER)
+    assert restored.total_battery_cost == pytest.approx(engine.total_battery_cost)
+    assert restored.totals == engine.totals
+    assert restored.lots.as_list() == engine.lots.as_list()
+    assert restored.soe.stored_kwh == engine.soe.stored_kwh
+    assert restored.metrics == engine.metrics
+    assert restored.last_inputs == engine.last_inputs
+    assert restored.last_update == 3700.0 + BEFORE - AFTER
+
+
+def test_long_gap_is_not_resumed():
+    engine = _charged_engine()
+    data = engine_data(engine, BEFORE)
+
+    restored = create_state(CONFIG)
+    now = 3700.0 + BEFORE - AFTER + MAX_RESUME_GAP + 1
+    assert not restore_engine(restored, data, now, -AFTER)
+    # The cost basis is restored, the gap is not integrated
+    assert restored.total_battery_cost == pytest.approx(engine.total_battery_cost)
+    assert restored.last_update is None
+    assert restored.last_inputs is None
+
+    # Neither is a stored clock ahead of the current one
+    restored = create_state(CONFIG)
+    assert not restore_engine(restored, data, 3600.0 + BEFORE - AFTER, -AFTER)
+
+
+def test_lots_of_another_cost_basis():
+    data = engine_data(_charged_engine(), BEFORE)
+    data["lots"] = None
+    restored = create_state(CONFIG)
+    restore_engine(restored, data, 0.0, -AFTER)
+    assert restored.lots.as_list() == []
+    assert restored.total_battery_cost == pytest.approx(0.6)
+
+
+def test_malformed_data_raises():
+    with pytest.raises(KeyError):
+        restore_engine(create_state(CONFIG), {}, 0.0, 0.0)
+    with pytest.raises(ValueError):
+        restore_engine(create_state(CONFIG), {"total_battery_cost": "bad"}, 0.0, 0.0)
+
+
+def test_counter_round_trip():
+    index = entity_index(compile_sources(CONFIG))
+    update_entity(index, "sensor.grid_energy", _energy(10.0), 100.0)
+    update_entity(index, "sensor.grid_energy", _energy(10.5), 1000.0)
+    data = counters_data([index], BEFORE)
+    # Only energy counters are stored
+    assert list(data) == ["sensor.grid_energy"]
+    assert data["sensor.grid_energy"]["times"] == [100.0 + BEFORE, 1000.0 + BEFORE]
+
+    restored = entity_index(compile_sources(CONFIG))
+    update_entity(restored, "sensor.grid_energy", _energy(10.5), 1060.0)
+    restore_counters([restored], data, 1060.0, -BEFORE)
+    # The rate continues from the stored readings without a warm-up
+    update_entity(restored, "sensor.grid_energy", _energy(10.6), 1360.0)
+    assert restored["sensor.grid_energy"][0].read(1360.0) == (
+        pytest.approx(0.6 / (1260.0 / 3600.0)),
+        True,
+    )
@@ -0,0 +1,53 @@
+"""Tests for the event-time ordering of state changes."""
+
+from custom_components.weighted_energy_cost.reorder import (
+    MAX_EVENT_LAG,
+    ReorderBuffer,
+    bursts,
+    event_time,
+)
+
+
+def test_event_time():
+    # Reported 2 s before it was received at clock 100
+    assert event_time(100.0, 1_700_000_010.0, 1_700_000_008.0) == 98.0
+    # A reported time in the future counts as now
+    assert event_time(100.0, 1_700_000_010.0, 1_700_000_011.0) == 100.0
+    # A restored state long ago is bounded
+    assert event_time(100.0, 1_700_000_010.0, 1_600_000_000.0) == 100.0 - MAX_EVENT_LAG
+
+
+def test_release_in_reported_order():
+    buffer = ReorderBuffer(delay=2.0)
+    buffer.push(10.5, "sensor.solar", "b")
+    buffer.push(10.0, "sensor.grid", "a")
+    buffer.push(12.0, "sensor.grid", "d")
+    buffer.push(10.5, "sensor.battery", "c")
+    assert buffer.next_due() == 12.0
+
+    # Held for the delay, then released oldest first; ties keep their
+    # arrival order
+    assert buffer.release(11.9) == []
+    assert [state for _, _, state in buffer.release(12.5)] == ["a", "b", "c"]
+    assert len(buffer) == 1
+    assert buffer.next_due() == 14.0
+    assert buffer.release(14.0) == [(12.0, "sensor.grid", "d")]
+    assert buffer.next_due() is None
+
+
+def test_full_buffer_lets_the_oldest_through():
+    buffer = ReorderBuffer(delay=5.0, capacity=2)
+    assert buffer.push(2.0, "sensor.grid", "b") is None
+    assert buffer.push(3.0, "sensor.grid", "c") is None
+    assert buffer.push(1.0, "sensor.grid", "a") == (1.0, "sensor.grid", "a")
+    assert len(buffer) == 2
+
+
+def test_bursts():
+    events = [(t, "sensor.grid", None) for t in (0.0, 0.1, 0.3, 1.0, 5.0, 5.2)]
+    assert [[e[0] for e in burst] for burst in bursts(events, 0.36)] == [
+        [0.0, 0.1, 0.3],
+        [1.0],
+        [5.0, 5.2],
+    ]
+    assert list(bursts([], 1.0)) == []
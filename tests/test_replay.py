@@ -0,0 +1,124 @@
+"""Tests for replaying recorded history."""
+
+from types import SimpleNamespace
+
+import pytest
+
+from custom_components.weighted_energy_cost.const import (
+    CONF_BATTERY_ENERGY_SOURCE_TYPE,
+    CONF_BATTERY_ENERGY_SOURCE_VALUE,
+    CONF_BATTERY_POWER_SOURCE_TYPE,
+    CONF_BATTERY_POWER_SOURCE_VALUE,
+    CONF_GRID_IMPORT_PRICE_TYPE,
+    CONF_GRID_IMPORT_PRICE_VALUE,
+    CONF_GRID_IMPORT_SOURCE_TYPE,
+    CONF_GRID_IMPORT_SOURCE_VALUE,
+    CONF_SOLAR_PRICE_TYPE,
+    CONF_SOLAR_PRICE_VALUE,
+    CONF_SOLAR_SOURCE_TYPE,
+    CONF_SOLAR_SOURCE_VALUE,
+    SOURCE_TYPE_ENTITY,
+    SOURCE_TYPE_FIXED,
+)
+from custom_components.weighted_energy_cost.replay import (
+    HistoryReplay,
+    HourlyStatistics,
+)
+
+CONFIG = {
+    CONF_GRID_IMPORT_SOURCE_TYPE: SOURCE_TYPE_ENTITY,
+    CONF_GRID_IMPORT_SOURCE_VALUE: "sensor.grid_power",
+    CONF_GRID_IMPORT_PRICE_TYPE: SOURCE_TYPE_FIXED,
+    CONF_GRID_IMPORT_PRICE_VALUE: 0.30,
+    CONF_SOLAR_SOURCE_TYPE: SOURCE_TYPE_FIXED,
+    CONF_SOLAR_SOURCE_VALUE: 0,
+    CONF_SOLAR_PRICE_TYPE: SOURCE_TYPE_FIXED,
+    CONF_SOLAR_PRICE_VALUE: 0,
+    CONF_BATTERY_POWER_SOURCE_TYPE: SOURCE_TYPE_ENTITY,
+    CONF_BATTERY_POWER_SOURCE_VALUE: "sensor.battery_power",
+    CONF_BATTERY_ENERGY_SOURCE_TYPE: SOURCE_TYPE_FIXED,
+    CONF_BATTERY_ENERGY_SOURCE_VALUE: 5.0,
+}
+
+
+def _state(value, unit="W"):
+    return SimpleNamespace(state=str(value), attributes={"unit_of_measurement": unit})
+
+
+def test_replay_charges_battery_from_grid():
+    replay = HistoryReplay(CONFIG)
+    replay.feed(
+        [
+            (0.0, "sensor.grid_power", _state(2000)),
+            (0.0, "sensor.battery_power", _state(-1000)),
+            (3600.0, "sensor.grid_power", _state(2000)),
+        ]
+    )
+    # One hour of 1 kW charging from the grid at 0.30 €/kWh
+    assert replay.steps == 1
+    assert replay.engine.total_battery_cost == pytest.approx(0.30)
+    assert replay.weighted_cost == 0.30
+
+
+def test_advance_integrates_the_held_inputs():
+    replay = HistoryReplay(CONFIG)
+    replay.feed(
+        [
+            (0.0, "sensor.grid_power", _state(2000)),
+            (0.0, "sensor.battery_power", _state(-1000)),
+        ]
+    )
+    # Up to the end of the replay without a further state change
+    replay.advance(3600.0)
+    assert replay.steps == 1
+    assert replay.engine.total_battery_cost == pytest.approx(0.30)
+    assert replay.engine.totals.grid_kwh == pytest.approx(2.0)
+
+
+def test_replay_ignores_unavailable_states():
+    replay = HistoryReplay(CONFIG)
+    replay.feed(
+        [
+            (0.0, "sensor.battery_power", _state(-1000)),
+            (
+                1800.0,
+                "sensor.grid_power",
+                SimpleNamespace(state="unavailable", attributes={}),
+            ),
+        ]
+    )
+    assert replay.engine.total_battery_cost == 0.0
+
+
+def test_hourly_statistics_are_time_weighted():
+    stats = HourlyStatistics()
+    assert stats.add(0.0, 0.2) == []
+    assert stats.add(2700.0, 0.4) == []
+    rows = stats.add(5400.0, 0.1)
+    assert len(rows) == 1
+    assert rows[0].start == 0.0
+    assert rows[0].mean == pytest.approx(0.25)
+    assert (rows[0].min, rows[0].max) == (0.2, 0.4)
+
+    rows = stats.advance(3 * 3600.0)
+    assert [row.start for row in rows] == [3600.0, 7200.0]
+    assert rows[0].mean == pytest.approx(0.25)
+    assert rows[1].mean == pytest.approx(0.1)
+
+
+def test_replay_collects_hourly_totals():
+    replay = HistoryReplay(CONFIG)
+    replay.feed(
+        [
+            (0.0, "sensor.grid_power", _state(1000)),
+            (3600.0, "sensor.grid_power", _state(1000)),
+            (7200.0, "sensor.grid_power", _state(1000)),
+        ]
+    )
+    rows = replay.take_totals()
+    assert [row.start for row in rows] == [0.0, 3600.0]
+    # Totals are sampled at the end of each hour, including the last step
+    assert rows[0].totals.grid_kwh == pytest.approx(1.0)
+    assert rows[1].totals.grid_kwh == pytest.approx(2.0)
+    assert rows[1].totals.cost == pytest.approx(0.60)
+    assert replay.take_totals() == []
@@ -0,0 +1,263 @@
+"""Tests for the update scheduling of the sensor, with a stubbed hass."""
+
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("homeassistant")
+
+from custom_components.weighted_energy_cost import sensor as sensor_module  # noqa: E402
+from custom_components.weighted_energy_cost.const import (  # noqa: E402
+    CONF_BATTERY_ENERGY_SOURCE_TYPE,
+    CONF_BATTERY_ENERGY_SOURCE_VALUE,
+    CONF_BATTERY_POWER_SOURCE_TYPE,
+    CONF_BATTERY_POWER_SOURCE_VALUE,
+    CONF_COALESCE_WINDOW,
+    CONF_GRID_IMPORT_PRICE_TYPE,
+    CONF_GRID_IMPORT_PRICE_VALUE,
+    CONF_GRID_IMPORT_SOURCE_TYPE,
+    CONF_GRID_IMPORT_SOURCE_VALUE,
+    CONF_MIN_WRITE_INTERVAL,
+    CONF_NAME,
+    CONF_REORDER_WINDOW,
+    CONF_SOLAR_PRICE_TYPE,
+    CONF_SOLAR_PRICE_VALUE,
+    CONF_SOLAR_SOURCE_TYPE,
+    CONF_SOLAR_SOURCE_VALUE,
+    CONF_UPDATE_MODE,
+    CONF_WRITE_THRESHOLD,
+    SOURCE_TYPE_ENTITY,
+    SOURCE_TYPE_FIXED,
+    UPDATE_MODE_INTERVAL,
+)
+from custom_components.weighted_energy_cost.persist import MAX_RESUME_GAP  # noqa: E402
+
+DATA = {
+    CONF_NAME: "Weighted Energy Cost",
+    CONF_GRID_IMPORT_SOURCE_TYPE: SOURCE_TYPE_ENTITY,
+    CONF_GRID_IMPORT_SOURCE_VALUE: "sensor.grid",
+    CONF_GRID_IMPORT_PRICE_TYPE: SOURCE_TYPE_FIXED,
+    CONF_GRID_IMPORT_PRICE_VALUE: 0.3,
+    CONF_SOLAR_SOURCE_TYPE: SOURCE_TYPE_ENTITY,
+    CONF_SOLAR_SOURCE_VALUE: "sensor.solar",
+    CONF_SOLAR_PRICE_TYPE: SOURCE_TYPE_FIXED,
+    CONF_SOLAR_PRICE_VALUE: 0.1,
+    CONF_BATTERY_POWER_SOURCE_TYPE: SOURCE_TYPE_FIXED,
+    CONF_BATTERY_POWER_SOURCE_VALUE: 0,
+    CONF_BATTERY_ENERGY_SOURCE_TYPE: SOURCE_TYPE_FIXED,
+    CONF_BATTERY_ENERGY_SOURCE_VALUE: 0,
+}
+
+# Wall-clock minus monotonic time
+WALL = 1_700_000_000.0
+
+
+class Loop:
+    """A monotonic clock and the timers scheduled on it."""
+
+    def __init__(self) -> None:
+        self.now = 1000.0
+        self.timers = []
+
+    def call_later(self, _hass, delay, action):
+        timer = [self.now + delay, action]
+        self.timers.append(timer)
+        return lambda: self.timers.remove(timer)
+
+    def run(self, until):
+        """Fire the timers due up to ``until`` and move the clock there."""
+        while self.timers and (timer := min(self.timers))[0] <= until:
+            self.timers.remove(timer)
+            self.now = timer[0]
+            timer[1](None)
+        self.now = until
+
+
+@pytest.fixture
+def loop(monkeypatch):
+    loop = Loop()
+    monkeypatch.setattr(sensor_module, "async_call_later", loop.call_later)
+    monkeypatch.setattr(
+        sensor_module,
+        "time",
+        SimpleNamespace(
+            monotonic=lambda: loop.now,
+            time=lambda: WALL + loop.now,
+            perf_counter=lambda: 0.0,
+        ),
+    )
+    return loop
+
+
+def _sensor(loop, **options):
+    entry = SimpleNamespace(entry_id="entry", data=DATA, options=options)
+    sensor = sensor_module.WeightedEnergyCostSensor(SimpleNamespace(), entry)
+    sensor.written = []
+    sensor.async_write_ha_state = lambda: sensor.written.append(sensor.native_value)
+    # Set up as by async_added_to_hass, then run on 1 kW of grid and solar
+    # each for 10 s
+    sensor.engine.last_update = loop.now - 10.0
+    _change(sensor, loop, "sensor.grid", 1000)
+    _change(sensor, loop, "sensor.solar", 1000)
+    loop.run(loop.now + options.get(CONF_REORDER_WINDOW, 0) / 1000.0 + 1.0)
+    if options.get(CONF_UPDATE_MODE) == UPDATE_MODE_INTERVAL:
+        sensor._handle_interval(None)
+    assert sensor.written == [0.2]
+    sensor.written.clear()
+    return sensor
+
+
+def _change(sensor, loop, entity_id, watts, reported=None):
+    """Send a state change, by default reported when it is received."""
+    if reported is None:
+        reported = loop.now
+    sensor._handle_state_change(
+        SimpleNamespace(
+            data={
+                "entity_id": entity_id,
+                "new_state": SimpleNamespace(
+                    state=str(watts),
+                    attributes={"unit_of_measurement": "W"},
+                    last_updated=datetime.fromtimestamp(WALL + reported, timezone.utc),
+                ),
+            }
+        )
+    )
+
+
+def test_burst_is_coalesced(loop):
+    sensor = _sensor(loop, **{CONF_COALESCE_WINDOW: 100})
+    updates = sensor.stats.updates
+    _change(sensor, loop, "sensor.grid", 3000)
+    _change(sensor, loop, "sensor.solar", 500)
+    _change(sensor, loop, "sensor.grid", 1500)
+    # One recalculation is scheduled for the whole burst
+    assert len(loop.timers) == 1
+    assert loop.timers[0][0] == loop.now + 0.1
+
+    loop.run(loop.now + 10.0)
+    assert sensor.stats.updates == updates + 1
+    assert sensor.written == [0.25]
+    assert sensor.extra_state_attributes["grid_kw"] == 1.5
+
+
+def test_writes_are_held_and_suppressed(loop):
+    sensor = _sensor(loop, **{CONF_MIN_WRITE_INTERVAL: 60, CONF_WRITE_THRESHOLD: 0.01})
+    companion_writes = []
+    sensor.companion_sensors = [
+        SimpleNamespace(async_update_from_hub=lambda: companion_writes.append(1))
+    ]
+
+    # A change within the minimum interval is held until it has passed
+    _change(sensor, loop, "sensor.grid", 3000)
+    loop.run(loop.now + 1.0)
+    assert sensor.written == []
+    assert sensor.stats.held_writes == 1
+    _change(sensor, loop, "sensor.solar", 3000)
+    loop.run(loop.now + 60.0)
+    # Written once, with the value current then
+    assert sensor.written == [0.2]
+    assert len(companion_writes) == 1
+
+    # A change below the threshold is not written
+    _change(sensor, loop, "sensor.grid", 3100)
+    loop.run(loop.now + 120.0)
+    assert sensor.written == [0.2]
+    assert sensor.stats.suppressed_writes == 1
+
+
+def test_companions_are_written_at_most_once_a_minute(loop):
+    sensor = _sensor(loop)
+    companion_writes = []
+    sensor.companion_sensors = [
+        SimpleNamespace(async_update_from_hub=lambda: companion_writes.append(1))
+    ]
+    for watts in range(2000, 2100, 10):
+        _change(sensor, loop, "sensor.grid", watts)
+        loop.run(loop.now + 1.0)
+    # Written at setup, then not again within a minute
+    assert len(sensor.written) == 10
+    assert companion_writes == []
+
+    loop.run(loop.now + sensor_module.COMPANION_WRITE_INTERVAL)
+    _change(sensor, loop, "sensor.grid", 1000)
+    loop.run(loop.now + 1.0)
+    assert len(companion_writes) == 1
+
+
+def test_late_change_is_applied_in_reported_order(loop):
+    sensor = _sensor(loop, **{CONF_REORDER_WINDOW: 2000})
+    _change(sensor, loop, "sensor.grid", 2000)
+    # Received after the change above, but reported before it
+    loop.run(loop.now + 0.5)
+    _change(sensor, loop, "sensor.grid", 4000, reported=loop.now - 1.0)
+    # Held for the reorder window
+    assert loop.timers[0][0] == loop.now + 1.5
+    loop.run(loop.now + 1.0)
+    assert sensor.written == []
+
+    loop.run(loop.now + 10.0)
+    assert sensor.extra_state_attributes["grid_kw"] == 2.0
+    assert sensor.stats.late_events == 0
+
+
+def test_change_before_the_last_step_is_late(loop):
+    sensor = _sensor(loop)
+    _change(sensor, loop, "sensor.grid", 2000, reported=loop.now - 5.0)
+    loop.run(loop.now + 1.0)
+    assert sensor.stats.late_events == 1
+    # Applied at the last step, so the next step integrates it
+    _change(sensor, loop, "sensor.solar", 1000)
+    loop.run(loop.now + 1.0)
+    assert sensor.extra_state_attributes["grid_kw"] == 2.0
+
+
+def test_interval_mode_waits_for_the_timer(loop):
+    sensor = _sensor(loop, **{CONF_UPDATE_MODE: UPDATE_MODE_INTERVAL})
+    updates = sensor.stats.updates
+    _change(sensor, loop, "sensor.grid", 3000)
+    assert loop.timers == []
+    assert sensor.stats.updates == updates
+
+    loop.run(loop.now + 60.0)
+    sensor._handle_interval(None)
+    assert sensor.stats.updates == updates + 1
+    assert sensor.written == [0.25]
+
+
+def test_restore_resumes_within_the_gap(loop):
+    sensor = _sensor(loop)
+    data = sensor.extra_restore_state_data.as_dict()
+
+    loop.run(loop.now + 60.0)
+    restored = _sensor(loop)
+    restored.engine.last_update = None
+    restored._restore_engine(data, loop.now)
+    assert restored.engine.last_update == sensor.engine.last_update
+    assert restored.engine.last_inputs == sensor.engine.last_inputs
+
+    loop.run(loop.now + MAX_RESUME_GAP)
+    restored = _sensor(loop)
+    restored.engine.last_update = None
+    restored._restore_engine(data, loop.now)
+    assert restored.engine.last_update is None
+
+
+def test_journal_records_the_steps_of_a_recompute(loop):
+    sensor = _sensor(loop)
+    # The recompute replays up to the last step
+    assert sensor.async_start_journal() == WALL + sensor.engine.last_update
+
+    _change(sensor, loop, "sensor.grid", 3000)
+    loop.run(loop.now + 5.0)
+    journal = sensor.async_take_journal()
+    assert len(journal) == 1
+    inputs, dt = journal[0]
+    assert inputs.grid_kw == 3.0
+    assert dt == pytest.approx(1.0 / 3600.0)
+
+    # Not recorded once taken
+    _change(sensor, loop, "sensor.grid", 2000)
+    loop.run(loop.now + 5.0)
+    assert sensor.async_take_journal() == []
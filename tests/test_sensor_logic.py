@@ -1,44 +1,26 @@
 """Tests for the weighted energy cost sensor logic."""
-import pytest
-from datetime import datetime, timedelta
-from unittest.mock import MagicMock
 
-# Since we want to test the logic without full HA environment, we can extract the math.
+from custom_components.weighted_energy_cost.engine import (
+    EngineState,
+    StateOfEnergy,
+    StepInputs,
+    advance,
+    step,
+)
+
 
 def calculate_weighted_cost(
     grid_kw, grid_price, solar_kw, solar_price, bat_pow_kw, bat_energy_kwh, total_battery_cost, dt_hours
 ):
-    """Simplified logic for testing."""
-    # Charge
-    if bat_pow_kw < 0:
-        charge_kw = abs(bat_pow_kw)
-        total_source = grid_kw + solar_kw
-        if total_source > 0.001:
-            mix_price = (grid_kw * grid_price + solar_kw * solar_price) / total_source
-            total_battery_cost += (charge_kw * dt_hours) * mix_price
-    
-    current_battery_price = 0.0
-    if bat_energy_kwh > 0.01:
-        current_battery_price = total_battery_cost / bat_energy_kwh
-    
-    # Discharge
-    if bat_pow_kw > 0:
-        discharge_kw = bat_pow_kw
-        energy_removed = discharge_kw * dt_hours
-        total_battery_cost -= energy_removed * current_battery_price
-    
-    bat_discharge_kw = max(0, bat_pow_kw)
-    total_supply_kw = grid_kw + solar_kw + bat_discharge_kw
-    
-    weighted_cost = 0
-    if total_supply_kw > 0.001:
-        weighted_cost = (
-            grid_kw * grid_price +
-            solar_kw * solar_price +
-            bat_discharge_kw * current_battery_price
-        ) / total_supply_kw
-        
-    return round(weighted_cost, 4), round(total_battery_cost, 4), round(current_battery_price, 4)
+    """Run a single engine step from a given battery cost basis."""
+    state = EngineState(total_battery_cost=total_battery_cost)
+    result = step(
+        state,
+        StepInputs(grid_kw, grid_price, solar_kw, solar_price, bat_pow_kw, bat_energy_kwh),
+        dt_hours,
+    )
+    weighted_cost = result.weighted_cost if result.weighted_cost is not None else 0
+    return round(weighted_cost, 4), round(state.total_battery_cost, 4), round(result.battery_unit_price, 4)
 
 def test_pure_grid():
     cost, bat_cost, bat_price = calculate_weighted_cost(
@@ -86,3 +68,141 @@ def test_battery_discharging():
     assert bat_price == 0.25 # Since I passed 4.0 as energy
     assert cost == 0.25
     assert bat_cost == 1.0 - (1.0 * 1 * 0.25) == 0.75
+
+
+def test_battery_discharge_clamped_at_zero():
+    # Discharging more than the stored energy cannot make the cost basis negative.
+    _, bat_cost, _ = calculate_weighted_cost(
+        grid_kw=0, grid_price=0.30, solar_kw=0, solar_price=0, bat_pow_kw=5.0, bat_energy_kwh=1.0, total_battery_cost=1.0, dt_hours=1
+    )
+    assert bat_cost == 0
+
+
+def test_no_supply_keeps_previous_without_grid_price():
+    state = EngineState()
+    result = step(state, StepInputs(0, 0, 0, 0, 0, 0), 1)
+    assert result.weighted_cost is None
+    result = step(state, StepInputs(0, 0.30, 0, 0, 0, 0), 1)
+    assert result.weighted_cost == 0.30
+
+
+def test_advance_skips_short_intervals():
+    state = EngineState()
+    assert advance(state, 1000.0) is None
+    assert advance(state, 1000.1) is None
+    # The skipped interval is folded into the next one.
+    assert advance(state, 1036.0) == 0.01
+    assert state.last_update == 1036.0
+
+
+def test_trapezoidal_charging_uses_previous_sample():
+    # Charging ramps from 0 to 2 kW from the grid over one hour: 1 kWh at 0.30 €/kWh.
+    for method, expected in (("right", 0.60), ("left", 0.0), ("trapezoidal", 0.30)):
+        state = EngineState()
+        step(state, StepInputs(2.0, 0.30, 0, 0, 0.0, 5.0), 0.001, method)
+        state.total_battery_cost = 0.0
+        step(state, StepInputs(2.0, 0.30, 0, 0, -2.0, 5.0), 1.0, method)
+        assert round(state.total_battery_cost, 4) == expected
+
+
+def test_totals_defer_battery_cost_until_discharged():
+    state = EngineState()
+    # 1h: 3 kW from the grid at 0.30 €/kWh, 1 kW of it charges the battery
+    step(state, StepInputs(3.0, 0.30, 0, 0, -1.0, 1.0), 1.0)
+    # 1h: 1 kW of solar at 0.10 €/kWh and 1 kW from the battery
+    step(state, StepInputs(0, 0.30, 1.0, 0.10, 1.0, 1.0), 1.0)
+    totals = state.totals
+    assert (totals.grid_kwh, totals.solar_kwh, totals.battery_kwh) == (3.0, 1.0, 1.0)
+    assert round(totals.battery_cost_in, 4) == 0.30
+    assert round(totals.battery_cost_out, 4) == 0.30
+    # 2 kWh used from the grid, 1 kWh of solar and 1 kWh from the battery
+    assert round(totals.cost, 4) == 0.60 + 0.10 + 0.30
+
+
+def test_exported_solar_is_not_used():
+    # 3 kW of solar, 2 kW of it exported: the home uses 1 kW of solar and 1 kW of grid
+    state = EngineState()
+    result = step(state, StepInputs(1.0, 0.30, 3.0, 0.0, 0, 5.0, 2.0, 0.0), 1.0)
+    assert round(result.weighted_cost, 4) == 0.15
+    assert state.totals.solar_kwh == 1.0
+    assert state.totals.export_kwh == 2.0
+
+
+def test_feed_in_price_is_solar_opportunity_cost():
+    # Solar used at home forgoes 0.08 €/kWh of feed-in, which earns 0.16 € for the export
+    state = EngineState()
+    result = step(state, StepInputs(0, 0.30, 3.0, 0.0, 0, 5.0, 2.0, 0.08), 1.0)
+    assert round(result.weighted_cost, 4) == 0.08
+    assert round(state.totals.cost, 4) == 0.08
+    assert round(state.totals.export_revenue, 4) == 0.16
+
+
+def test_charging_takes_solar_before_grid():
+    # 1 kW of solar and 1 kW of grid charge 1.5 kW: 1 kWh of solar and 0.5 kWh of grid
+    state = EngineState()
+    result = step(state, StepInputs(1.0, 0.30, 1.0, 0.10, -1.5, 1.5), 1.0)
+    assert round(state.total_battery_cost, 4) == 0.10 + 0.15
+    # The home uses the remaining 0.5 kW of grid
+    assert round(result.weighted_cost, 4) == 0.30
+
+
+def test_integrated_energy_applies_efficiencies():
+    soe = StateOfEnergy(charge_efficiency=0.95, discharge_efficiency=0.9, stored_kwh=0.0)
+    state = EngineState(soe=soe)
+    # 2 kWh charged from the grid at 0.30 €/kWh store 1.9 kWh; the sensor reads 0
+    step(state, StepInputs(2.0, 0.30, 0, 0, -2.0, 0.0), 1.0)
+    assert round(soe.stored_kwh, 4) == 1.9
+    # Each kWh delivered draws 1/0.9 kWh from storage
+    result = step(state, StepInputs(0, 0.30, 0, 0, 0.09, 0.0), 1.0)
+    assert round(soe.stored_kwh, 4) == 1.8
+    assert round(result.battery_unit_price, 4) == round(0.60 / 1.8 / 0.9, 4)
+    assert round(state.total_battery_cost, 4) == round(0.60 - 0.60 * 0.1 / 1.8, 4)
+
+
+def test_integrated_energy_self_discharges_and_reconciles():
+    soe = StateOfEnergy(self_discharge=0.01, stored_kwh=10.0)
+    state = EngineState(soe=soe)
+    step(state, StepInputs(1.0, 0.30, 0, 0, 0, 0.0), 2.0)
+    assert round(soe.stored_kwh, 4) == round(10.0 * 0.99**2, 4)
+    soe.report(7.5, 100.0)
+    result = step(state, StepInputs(1.0, 0.30, 0, 0, 0, 7.5), 1.0)
+    assert result.battery_kwh == 7.5
+    # The same report is not applied again
+    soe.report(7.5, 100.0)
+    step(state, StepInputs(1.0, 0.30, 0, 0, 0, 7.5), 1.0)
+    assert soe.stored_kwh < 7.5
+
+
+def test_integrated_energy_adds_flows_after_the_reading():
+    soe = StateOfEnergy(stored_kwh=2.0)
+    state = EngineState(last_update=7200.0, soe=soe)
+    # Reported half way through a 2 h interval of charging at 1 kW
+    soe.report(5.0, 3600.0)
+    result = step(state, StepInputs(1.0, 0.30, 0, 0, -1.0, 5.0), 2.0)
+    assert result.battery_kwh == 6.0
+
+
+def test_metrics_are_weighted_with_the_price():
+    state = EngineState()
+    # 1 kW from the grid at 400 g/kWh and 1 kW of solar at 40 g/kWh
+    result = step(state, StepInputs(1.0, 0.30, 1.0, 0, 0, 0.0, grid_co2=400.0, solar_co2=40.0), 1.0)
+    assert result.weighted_cost == 0.15
+    assert result.metrics.co2 == 220.0
+    assert result.metrics.solar == 0.5
+    assert result.metrics.self_sufficiency == 0.5
+
+
+def test_battery_carries_co2_and_solar_share():
+    state = EngineState()
+    # Charge 2 kWh: 1 kWh of solar at 0 g/kWh, 1 kWh from the grid at 300 g/kWh
+    step(state, StepInputs(1.0, 0.30, 1.0, 0, -2.0, 2.0, grid_co2=300.0), 1.0)
+    assert state.metrics.co2 == 300.0
+    assert state.metrics.solar_kwh == 1.0
+    # Discharge 1 kWh to supply the home alone
+    result = step(state, StepInputs(0, 0.30, 0, 0, 1.0, 2.0, grid_co2=500.0), 1.0)
+    assert result.battery_metrics.co2 == 150.0
+    assert result.metrics == (150.0, 0.5, 1.0)
+    assert round(result.weighted_cost, 4) == 0.15
+    # Half of the stored energy and its metrics are gone
+    assert state.metrics.co2 == 150.0
+    assert state.metrics.charged_kwh == 1.0
@@ -0,0 +1,48 @@
+"""Tests for the runtime statistics."""
+
+from types import SimpleNamespace
+
+from custom_components.weighted_energy_cost.inputs import EntitySource, entity_index
+from custom_components.weighted_energy_cost.stats import (
+    LatencyHistogram,
+    RuntimeStats,
+    source_diagnostics,
+)
+
+
+def test_histogram_buckets():
+    histogram = LatencyHistogram((100, 1000))
+    for seconds in (0.00005, 0.0001, 0.0005, 0.002):
+        histogram.record(seconds)
+    data = histogram.as_dict()
+    # A duration on an edge counts in the bucket it closes
+    assert data["buckets_us"] == {"<=100": 2, "<=1000": 1, ">1000": 1}
+    assert data["count"] == 4
+    assert data["max_us"] == 2000.0
+    assert data["mean_us"] == 662.5
+
+
+def test_rates_per_hour():
+    stats = RuntimeStats(started=0.0, updates=120, writes=30)
+    data = stats.as_dict(1800.0)
+    assert data["updates_per_hour"] == 240.0
+    assert data["writes_per_hour"] == 60.0
+
+
+def test_source_staleness_and_counter_resets():
+    energy = {"unit_of_measurement": "kWh"}
+    sources = [EntitySource("sensor.grid", True), EntitySource("sensor.meter", True)]
+    index = entity_index(sources)
+    sources[0].update(SimpleNamespace(state="1.5", attributes={}), 10.0)
+    for timestamp, value in ((0.0, 5.0), (60.0, 5.1), (120.0, 0.1)):
+        sources[1].update(
+            SimpleNamespace(state=str(value), attributes=energy), timestamp
+        )
+
+    assert source_diagnostics(index, 130.0) == {
+        "sensor.grid": {"age_s": 120.0, "counter_resets": None},
+        "sensor.meter": {"age_s": 10.0, "counter_resets": 1},
+    }
+
+    sources[0].update(SimpleNamespace(state="unavailable", attributes={}), 140.0)
+    assert source_diagnostics(index, 150.0)["sensor.grid"]["age_s"] is None
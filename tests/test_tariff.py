@@ -0,0 +1,86 @@
+"""Tests for time-of-use tariff schedules."""
+
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
+import pytest
+
+from custom_components.weighted_energy_cost.const import (
+    CONF_GRID_IMPORT_PRICE_TYPE,
+    CONF_GRID_IMPORT_PRICE_VALUE,
+    SOURCE_TYPE_SCHEDULE,
+)
+from custom_components.weighted_energy_cost.inputs import (
+    compile_sources,
+    tracked_entities,
+    update_schedules,
+)
+from custom_components.weighted_energy_cost.tariff import (
+    ScheduleError,
+    TariffSchedule,
+    parse_schedule,
+)
+
+BERLIN = ZoneInfo("Europe/Berlin")
+SCHEDULE = """
+# Winter peak on working days
+10-01..03-31 mon-fri 17:00-20:00 0.38
+mon-fri 07:00-22:00 0.32
+00:00-24:00 0.24
+"""
+
+
+def _at(text):
+    return datetime.fromisoformat(text).replace(tzinfo=BERLIN).timestamp()
+
+
+def _lookup(schedule, text):
+    price, next_change = schedule.lookup(_at(text))
+    return price, datetime.fromtimestamp(next_change, BERLIN).isoformat()[:16]
+
+
+def test_first_matching_rule_sets_the_price():
+    schedule = TariffSchedule(parse_schedule(SCHEDULE), BERLIN)
+    # Friday in winter, Saturday, and a working day in summer
+    assert _lookup(schedule, "2026-10-16T18:00") == (0.38, "2026-10-16T20:00")
+    assert _lookup(schedule, "2026-10-17T12:00") == (0.24, "2026-10-19T07:00")
+    assert _lookup(schedule, "2026-06-16T18:00") == (0.32, "2026-06-16T22:00")
+
+
+def test_price_changes_after_the_boundary():
+    schedule = TariffSchedule(parse_schedule(SCHEDULE), BERLIN)
+    # A step at the boundary integrates the interval before it at the old price
+    assert _lookup(schedule, "2026-10-16T17:00") == (0.32, "2026-10-16T20:00")
+    assert _lookup(schedule, "2026-10-16T17:00:01") == (0.38, "2026-10-16T20:00")
+    # Years are compiled separately, so the new year is always a change
+    assert _lookup(schedule, "2026-12-31T23:00") == (0.24, "2027-01-01T00:00")
+    assert _lookup(schedule, "2027-01-01T00:00") == (0.24, "2027-01-01T07:00")
+
+
+def test_wrapping_band_and_dst():
+    schedule = TariffSchedule(
+        parse_schedule("22:00-06:00 0.20\n0:00-24:00 0.30"), BERLIN
+    )
+    assert _lookup(schedule, "2026-10-25T01:00") == (0.20, "2026-10-25T06:00")
+    # The night of the DST change lasts an hour longer
+    start, end = _at("2026-10-24T22:00"), _at("2026-10-25T06:00")
+    assert end - start == 9 * 3600
+
+
+def test_invalid_schedules():
+    for text in ("", "07:00-22:00", "0.3", "xyz 07:00-22:00 0.3", "07:00-25:00 0.3"):
+        with pytest.raises(ScheduleError):
+            parse_schedule(text)
+
+
+def test_schedule_source():
+    data = {
+        CONF_GRID_IMPORT_PRICE_TYPE: SOURCE_TYPE_SCHEDULE,
+        CONF_GRID_IMPORT_PRICE_VALUE: SCHEDULE,
+    }
+    # The schedule text is not an entity
+    assert tracked_entities(data) == []
+    sources = compile_sources(data, BERLIN)
+    next_change = update_schedules(sources, _at("2026-10-16T18:00"))
+    assert sources.grid_price.read(0.0) == (0.38, False)
+    assert next_change == _at("2026-10-16T20:00")
@@ -0,0 +1,30 @@
+"""Tests for the rate limits and change thresholds of state writes."""
+
+from custom_components.weighted_energy_cost.writes import WriteGate
+
+
+def test_threshold():
+    gate = WriteGate(threshold=0.01)
+    # The first value is always written
+    assert gate.changed(0.25)
+    gate.record(0.0, 0.25)
+    assert not gate.changed(0.259)
+    assert gate.changed(0.26)
+    assert gate.changed(0.24)
+
+
+def test_min_interval():
+    gate = WriteGate(min_interval=60.0)
+    assert gate.wait(100.0) == 0.0
+    gate.record(100.0, 0.25)
+    # Held until the interval has passed since the last write
+    assert gate.wait(130.0) == 30.0
+    assert gate.wait(160.0) == 0.0
+    assert gate.wait(200.0) == 0.0
+
+
+def test_defaults_write_every_change():
+    gate = WriteGate()
+    gate.record(100.0, 0.25)
+    assert gate.wait(100.0) == 0.0
+    assert gate.changed(0.25)
@@ -0,0 +1,35 @@
+"""Import the calculation modules without Home Assistant.
+
+The calculation modules do not depend on Home Assistant, but importing them
+through the package runs the integration's ``__init__``, which does. The
+scripts in this directory, the benchmarks and the tests therefore register
+the integration directory as a bare package first.
+"""
+
+from __future__ import annotations
+
+import importlib.util
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+PACKAGE = "custom_components.weighted_energy_cost"
+
+
+def register_package(unless_installed: bool = False) -> None:
+    """Put the repository on the path and register the bare package.
+
+    With ``unless_installed`` the package is imported normally when Home
+    Assistant is installed.
+    """
+    if str(ROOT) not in sys.path:
+        sys.path.insert(0, str(ROOT))
+    if PACKAGE in sys.modules or (
+        unless_installed and importlib.util.find_spec("homeassistant") is not None
+    ):
+        return
+    for name in ("custom_components", PACKAGE):
+        spec = importlib.util.spec_from_loader(name, loader=None, is_package=True)
+        module = importlib.util.module_from_spec(spec)
+        module.__path__ = [str(ROOT.joinpath(*name.split(".")))]
+        sys.modules[name] = module
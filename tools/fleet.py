@@ -0,0 +1,25 @@
+"""Replay the data of many sites through the Weighted Energy Cost calculation.
+
+Run from the repository root:
+
+    python tools/fleet.py FLEET [-o REPORT] [--series DIR] [-j WORKERS]
+
+FLEET holds one directory per site with the sensor's configuration in
+config.json and the site's data: a directory of .npy columns, a CSV or
+Parquet file or a copy of the recorder's home-assistant_v2.db. The sites
+are replayed in parallel and one report row per site is written to REPORT.
+Home Assistant is not required.
+"""
+
+from __future__ import annotations
+
+import sys
+
+from _bootstrap import register_package
+
+register_package()
+
+from custom_components.weighted_energy_cost.fleet import main  # noqa: E402
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,25 @@
+"""Replay exported data through the Weighted Energy Cost calculation.
+
+Run from the repository root:
+
+    python tools/replay.py CONFIG INPUT [-o OUTPUT] [--statistics hourly|5min]
+
+CONFIG is the sensor's configuration as JSON, for example the integration's
+diagnostics download. INPUT is a CSV or Parquet file of state changes or
+samples, or a copy of the recorder's home-assistant_v2.db. The cost series
+is written to OUTPUT and the totals are printed. Home Assistant is not
+required.
+"""
+
+from __future__ import annotations
+
+import sys
+
+from _bootstrap import register_package
+
+register_package()
+
+from custom_components.weighted_energy_cost.offline import main  # noqa: E402
+
+if __name__ == "__main__":
+    sys.exit(main())